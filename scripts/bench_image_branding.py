@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import statistics
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from ua_news_bot.media.image_editor import add_branding_to_image, clear_branding_cache
+
+LOGO_PATH = "data/images/smart_news_ua_logo.png"
+TEXT = "Smart News UA"
+MAX_DIMENSION = 2560
+ROUNDS = 5
+
+# Typical sizes seen in the Suspilne CDN / wire photos.
+FIXTURE_SIZES = [
+    ("thumb", 800, 450),
+    ("article", 1200, 800),
+    ("full-hd", 1920, 1080),
+    ("telegram-max", 2560, 1440),
+    ("press-4k", 4000, 2667),
+    ("press-6k", 6000, 4000),
+]
+
+
+def _make_fixture(width: int, height: int) -> bytes:
+    # Smooth, photo-like content: upscaled coarse noise compresses like a real photo.
+    coarse = Image.effect_noise((max(1, width // 16), max(1, height // 16)), 80)
+    image = coarse.convert("RGB").resize((width, height), Image.BICUBIC)
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def _time_branding(image_bytes: bytes, *, cold: bool, max_dimension: int | None = None) -> float:
+    samples: list[float] = []
+    for _ in range(ROUNDS):
+        if cold:
+            clear_branding_cache()
+        started = time.perf_counter()
+        add_branding_to_image(
+            image_bytes=image_bytes,
+            watermark_text=TEXT,
+            logo_path=LOGO_PATH,
+            max_dimension=max_dimension,
+        )
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    print(
+        f"{'fixture':<14}{'size':>12}{'cold ms':>10}{'cached ms':>11}{'speedup':>9}"
+        f"{'capped ms':>11}"
+    )
+    for name, width, height in FIXTURE_SIZES:
+        image_bytes = _make_fixture(width, height)
+        cold = _time_branding(image_bytes, cold=True)
+        warm = _time_branding(image_bytes, cold=False)
+        capped = _time_branding(image_bytes, cold=False, max_dimension=MAX_DIMENSION)
+        print(
+            f"{name:<14}{f'{width}x{height}':>12}"
+            f"{cold * 1000:>10.1f}{warm * 1000:>11.1f}{cold / warm:>8.2f}x"
+            f"{capped * 1000:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
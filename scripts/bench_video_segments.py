@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from ua_news_bot.media.media_info import probe_media
+from ua_news_bot.media.video_editor import add_branding_to_video_file, segment_count
+
+LOGO_PATH = "data/images/smart_news_ua_logo.png"
+TEXT = "Smart News UA"
+MAX_BYTES = 45 * 1024 * 1024
+
+
+async def _time_branding(video_path: str, segments: int) -> tuple[float, int]:
+    started = time.perf_counter()
+    output = await add_branding_to_video_file(
+        input_video_path=video_path,
+        watermark_text=TEXT,
+        logo_path=LOGO_PATH,
+        max_bytes=MAX_BYTES,
+        segments=segments,
+    )
+    elapsed = time.perf_counter() - started
+    size = Path(output).stat().st_size
+    Path(output).unlink(missing_ok=True)
+    return elapsed, size
+
+
+async def main() -> None:
+    if len(sys.argv) < 2:
+        print("usage: python scripts/bench_video_segments.py <video.mp4> [segments ...]")
+        return
+
+    video_path = sys.argv[1]
+    counts = [int(n) for n in sys.argv[2:]] or [1, 2, 4, os.cpu_count() or 1]
+    info = await probe_media(video_path)
+    print(f"input: {info.width}x{info.height} {info.duration:.1f}s cores={os.cpu_count()}")
+
+    print(f"{'segments':>9}{'used':>6}{'seconds':>10}{'speedup':>9}{'size MB':>9}")
+    baseline: float | None = None
+    for requested in counts:
+        elapsed, size = await _time_branding(video_path, requested)
+        baseline = baseline or elapsed
+        print(
+            f"{requested:>9}{segment_count(info.duration, requested):>6}"
+            f"{elapsed:>10.1f}{baseline / elapsed:>8.2f}x{size / (1024 * 1024):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
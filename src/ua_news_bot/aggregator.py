@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from ua_news_bot.dedup import SeenStore
 from ua_news_bot.models import NewsItem
+from ua_news_bot.polling import FeedPollScheduler
 from ua_news_bot.sources.base import NewsSource
 
 
@@ -10,14 +11,30 @@ async def fetch_all_latest(
     *,
     per_source_limit: int = 30,
     dedup: SeenStore | None = None,
+    poll_scheduler: FeedPollScheduler | None = None,
 ) -> list[NewsItem]:
     """
     Fetches latest items from all sources, optionally deduplicating by URL.
     No filtering by topic/category.
+    With a `poll_scheduler`, only sources that are due are fetched and every
+    poll is recorded so the scheduler can learn the feed's cadence.
     """
     all_items: list[NewsItem] = []
     for src in sources:
-        items = await src.fetch_latest(limit=per_source_limit)
+        if poll_scheduler is not None and not poll_scheduler.is_due(src.name):
+            continue
+        try:
+            items = await src.fetch_latest(limit=per_source_limit)
+        except Exception:
+            if poll_scheduler is not None:
+                poll_scheduler.record_error(src.name)
+            raise
+        if poll_scheduler is not None:
+            poll_scheduler.record(
+                src.name,
+                [item.published_at for item in items],
+                not_modified=src.not_modified,
+            )
         all_items.extend(items)
 
     if dedup is None:
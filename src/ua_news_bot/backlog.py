@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import UTC
+
+from ua_news_bot.models import NewsItem
+from ua_news_bot.work_queue import STATE_FETCHED, WorkItem
+
+# Score multipliers for what the feed says about an item's media.
+MEDIA_BONUS_VIDEO = 0.5
+MEDIA_BONUS_PHOTO = 0.25
+
+
+def item_age_seconds(work: WorkItem, now: float) -> float:
+    """Age by the feed's published time, or by queue time if the feed has none."""
+    published_at = work.item.published_at
+    if published_at is None:
+        return max(0.0, now - work.queued_at)
+    # feedparser timestamps are naive UTC.
+    if published_at.tzinfo is None:
+        published_at = published_at.replace(tzinfo=UTC)
+    return max(0.0, now - published_at.timestamp())
+
+
+def backlog_score(
+    work: WorkItem,
+    now: float,
+    *,
+    half_life_seconds: float,
+    source_weights: dict[str, float],
+) -> float:
+    """
+    Higher is better. Recency halves every `half_life_seconds`, items with a
+    video or photo get a bonus, and the result is scaled by the source weight.
+    """
+    recency = 0.5 ** (item_age_seconds(work, now) / half_life_seconds)
+    if work.item.video_urls:
+        media = MEDIA_BONUS_VIDEO
+    elif work.item.image_urls:
+        media = MEDIA_BONUS_PHOTO
+    else:
+        media = 0.0
+    return source_weights.get(work.item.source.value, 1.0) * recency * (1.0 + media)
+
+
+@dataclass
+class DrainPlan:
+    # Items to work on this cycle: unfinished ones first, then the best waiting.
+    post: list[WorkItem] = field(default_factory=list)
+    # Left for later cycles, best first.
+    waiting: list[WorkItem] = field(default_factory=list)
+    # Older than the freshness window; dropped without posting.
+    expired: list[WorkItem] = field(default_factory=list)
+
+
+def plan_drain(
+    pending: list[WorkItem],
+    now: float,
+    *,
+    budget: int,
+    max_age_seconds: float,
+    source_weights: dict[str, float],
+    priority: Callable[[NewsItem], int],
+) -> DrainPlan:
+    """
+    Splits the queue's pending items for one cycle. Items that already went
+    past `fetched` are always resumed; up to `budget` posts in total are
+    taken, by `priority` (lower first) and then by score.
+    """
+    plan = DrainPlan()
+    backlog: list[tuple[int, float, WorkItem]] = []
+    for work in pending:
+        if work.state != STATE_FETCHED:
+            plan.post.append(work)
+        elif item_age_seconds(work, now) > max_age_seconds:
+            plan.expired.append(work)
+        else:
+            score = backlog_score(
+                work,
+                now,
+                half_life_seconds=max_age_seconds / 2,
+                source_weights=source_weights,
+            )
+            backlog.append((priority(work.item), -score, work))
+
+    # Stable sort: equal scores keep queue order.
+    backlog.sort(key=lambda x: (x[0], x[1]))
+    ordered = [work for _, _, work in backlog]
+    take = max(0, budget - len(plan.post))
+    plan.post.extend(ordered[:take])
+    plan.waiting = ordered[take:]
+    return plan
@@ -1,20 +1,51 @@
 from __future__ import annotations
 
+import json
 import os
+import socket
 
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
 
+class ChannelTarget(BaseModel):
+    """
+    One Telegram chat a post is published to.
+    Fields are fully resolved: empty overrides already inherit the global values.
+    """
+
+    chat_id: str
+    channel_cta_text: str = ""
+    channel_cta_url: str = ""
+    watermark_text: str = "Smart News UA"
+    watermark_logo_path: str = "data/images/smart_news_ua_logo.png"
+
+
+# Bot API upload limits: 50 MB via api.telegram.org, 2000 MB via a local server.
+CLOUD_DEFAULT_MAX_VIDEO_UPLOAD_MB = 45
+LOCAL_DEFAULT_MAX_VIDEO_UPLOAD_MB = 1950
+DEFAULT_TELEGRAM_API_BASE_URL = "https://api.telegram.org"
+
+
 class Settings(BaseModel):
     telegram_bot_token: str
     telegram_chat_id: str
 
+    telegram_api_base_url: str = DEFAULT_TELEGRAM_API_BASE_URL
+    telegram_local_mode: bool = False
+
     max_posts_per_run: int = 1
+    max_posts_per_hour: int = 0
+    backlog_max_age_minutes: int = 180
+    backlog_source_weights: dict[str, float] = {}
     dry_run: bool = True
     ai_enabled: bool = False
 
     poll_interval_seconds: int = 60
+    adaptive_polling: bool = True
+    feed_poll_min_seconds: int = 30
+    feed_poll_max_seconds: int = 600
+    feed_poll_jitter: float = 0.1
 
     init_skip_existing: bool = False
     init_post_latest: bool = False
@@ -22,6 +53,9 @@ class Settings(BaseModel):
     dedup_db_path: str = "data/seen.sqlite3"
     reset_dedup_on_start: bool = False
     dry_run_mark_seen: bool = True
+    work_queue_max_attempts: int = 3
+    worker_id: str = "local"
+    claim_lease_seconds: float = 300.0
 
     ai_provider: str = "gemini"
     gemini_api_key: str | None = None
@@ -44,17 +78,62 @@ class Settings(BaseModel):
     watermark_video_logo_scale: float = 0.06
     watermark_video_text_scale: float = 0.022
 
+    image_max_dimension: int = 2560
+    image_target_kb: int = 500
+    image_min_ssim: float = 0.95
+    image_progressive: bool = True
+
+    media_cache_dir: str = "data/media_cache"
+    media_cache_max_mb: int = 1024
+    # Downloaded sources are fetched again after this long (0 = until evicted).
+    media_cache_raw_ttl_hours: int = 24
+
     ytdlp_enabled: bool = False
     ytdlp_bin: str = "yt-dlp"
+    ytdlp_in_process: bool = False
 
     video_source_text: str = "🎥 Відео: Суспільне"
 
     telegram_media_caption_limit: int = 1024
     telegram_max_media_images: int = 4
     max_video_upload_mb: int = 45
+    max_video_download_mb: int = 180
+    max_image_download_mb: int = 20
+    video_stream_branding: bool = False
+    video_fit_upload_limit: bool = True
+    video_two_pass: bool = False
+    video_parallel_segments: int = 1
+    video_max_concurrent_jobs: int = 1
+    video_nice: int = 0
+    video_cpu_affinity: list[int] = []
+    video_stall_timeout_seconds: float = 60.0
+    media_prefetch_items: int = 2
+
+    telegram_max_retries: int = 3
+    telegram_max_retry_after_seconds: int = 60
+    telegram_reuse_file_ids: bool = True
+
+    telegram_global_messages_per_second: float = 30.0
+    telegram_chat_messages_per_minute: float = 20.0
+    telegram_chat_burst: int = 3
+    breaking_news_keywords: str = "терміново,блискавка"
+    publish_deadline_seconds: float = 0.0
+    breaking_publish_deadline_seconds: float = 0.0
+
+    extra_channels: list[ChannelTarget] = []
 
     media_debug: bool = True
 
+    def channel_targets(self) -> list[ChannelTarget]:
+        primary = ChannelTarget(
+            chat_id=self.telegram_chat_id,
+            channel_cta_text=self.channel_cta_text,
+            channel_cta_url=self.channel_cta_url,
+            watermark_text=self.watermark_text,
+            watermark_logo_path=self.watermark_logo_path,
+        )
+        return [primary, *self.extra_channels]
+
 
 def _parse_bool(value: str | None, default: bool) -> bool:
     if value is None:
@@ -76,6 +155,88 @@ def _parse_float(value: str | None, default: float) -> float:
         return default
 
 
+def _parse_cpu_list(value: str | None) -> list[int]:
+    """Parses a taskset-style CPU list: "0-3,6" -> [0, 1, 2, 3, 6]."""
+    cpus: set[int] = set()
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        if not first.isdigit() or (sep and not last.isdigit()):
+            raise ValueError(f"VIDEO_CPU_AFFINITY has an invalid entry: {part!r}")
+        cpus.update(range(int(first), int(last if sep else first) + 1))
+    return sorted(cpus)
+
+
+def _parse_source_weights(value: str | None) -> dict[str, float]:
+    """Parses "Суспільне=1.5,Other=0.5" -> {"Суспільне": 1.5, "Other": 0.5}."""
+    weights: dict[str, float] = {}
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, raw_weight = part.rpartition("=")
+        weight = _parse_float(raw_weight, -1.0) if sep else -1.0
+        if not name.strip() or weight < 0:
+            raise ValueError(f"BACKLOG_SOURCE_WEIGHTS has an invalid entry: {part!r}")
+        weights[name.strip()] = weight
+    return weights
+
+
+def _parse_extra_channels(
+    value: str | None,
+    *,
+    primary_chat_id: str,
+    channel_cta_text: str,
+    channel_cta_url: str,
+    watermark_text: str,
+    watermark_logo_path: str,
+) -> list[ChannelTarget]:
+    """
+    TELEGRAM_EXTRA_CHANNELS is a JSON list. Each entry is either a chat id string
+    or an object with `chat_id` and optional `cta_text`, `cta_url`,
+    `watermark_text`, `watermark_logo_path` overrides. A chat may appear only
+    once, the primary TELEGRAM_CHAT_ID included, or it would get every post twice.
+    """
+    raw = (value or "").strip()
+    if not raw:
+        return []
+
+    try:
+        entries = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"TELEGRAM_EXTRA_CHANNELS is not valid JSON: {e}") from e
+    if not isinstance(entries, list):
+        raise ValueError("TELEGRAM_EXTRA_CHANNELS must be a JSON list")
+
+    channels: list[ChannelTarget] = []
+    chat_ids = {primary_chat_id.strip()}
+    for entry in entries:
+        if isinstance(entry, str | int):
+            entry = {"chat_id": str(entry)}
+        if not isinstance(entry, dict) or not str(entry.get("chat_id") or "").strip():
+            raise ValueError(f"TELEGRAM_EXTRA_CHANNELS entry without chat_id: {entry!r}")
+        chat_id = str(entry["chat_id"]).strip()
+        if chat_id in chat_ids:
+            raise ValueError(f"TELEGRAM_EXTRA_CHANNELS repeats chat {chat_id!r}")
+        chat_ids.add(chat_id)
+
+        channels.append(
+            ChannelTarget(
+                chat_id=chat_id,
+                channel_cta_text=(entry.get("cta_text") or channel_cta_text).strip(),
+                channel_cta_url=(entry.get("cta_url") or channel_cta_url).strip(),
+                watermark_text=(entry.get("watermark_text") or watermark_text).strip(),
+                watermark_logo_path=(
+                    entry.get("watermark_logo_path") or watermark_logo_path
+                ).strip(),
+            )
+        )
+
+    return channels
+
+
 def load_settings() -> Settings:
     load_dotenv()
 
@@ -95,11 +256,31 @@ def load_settings() -> Settings:
     if max_posts < 0:
         max_posts = 0
 
+    max_posts_per_hour_raw = (os.getenv("MAX_POSTS_PER_HOUR") or "").strip()
+    max_posts_per_hour = int(max_posts_per_hour_raw) if max_posts_per_hour_raw.isdigit() else 0
+
+    backlog_max_age_raw = (os.getenv("BACKLOG_MAX_AGE_MINUTES") or "").strip()
+    backlog_max_age_minutes = int(backlog_max_age_raw) if backlog_max_age_raw.isdigit() else 180
+    if backlog_max_age_minutes < 1:
+        backlog_max_age_minutes = 1
+    backlog_source_weights = _parse_source_weights(os.getenv("BACKLOG_SOURCE_WEIGHTS"))
+
     poll_raw = os.getenv("POLL_INTERVAL_SECONDS", "").strip()
     poll_interval = int(poll_raw) if poll_raw.isdigit() else 60
     if poll_interval < 10:
         poll_interval = 10
 
+    adaptive_polling = _parse_bool(os.getenv("ADAPTIVE_POLLING"), default=True)
+    feed_poll_min_raw = (os.getenv("FEED_POLL_MIN_SECONDS") or "").strip()
+    feed_poll_min_seconds = int(feed_poll_min_raw) if feed_poll_min_raw.isdigit() else 30
+    if feed_poll_min_seconds < 10:
+        feed_poll_min_seconds = 10
+    feed_poll_max_raw = (os.getenv("FEED_POLL_MAX_SECONDS") or "").strip()
+    feed_poll_max_seconds = int(feed_poll_max_raw) if feed_poll_max_raw.isdigit() else 600
+    if feed_poll_max_seconds < feed_poll_min_seconds:
+        feed_poll_max_seconds = feed_poll_min_seconds
+    feed_poll_jitter = min(0.5, max(0.0, _parse_float(os.getenv("FEED_POLL_JITTER"), 0.1)))
+
     dry_run = _parse_bool(os.getenv("DRY_RUN"), default=True)
     ai_enabled = _parse_bool(os.getenv("AI_ENABLED"), default=False)
 
@@ -109,6 +290,16 @@ def load_settings() -> Settings:
     dedup_db_path = (os.getenv("DEDUP_DB_PATH") or "").strip() or "data/seen.sqlite3"
     reset_dedup_on_start = _parse_bool(os.getenv("RESET_DEDUP_ON_START"), default=False)
     dry_run_mark_seen = _parse_bool(os.getenv("DRY_RUN_MARK_SEEN"), default=True)
+    work_queue_max_attempts_raw = (os.getenv("WORK_QUEUE_MAX_ATTEMPTS") or "").strip()
+    work_queue_max_attempts = (
+        int(work_queue_max_attempts_raw) if work_queue_max_attempts_raw.isdigit() else 3
+    )
+    if work_queue_max_attempts < 1:
+        work_queue_max_attempts = 1
+    worker_id = (os.getenv("WORKER_ID") or "").strip() or f"{socket.gethostname()}:{os.getpid()}"
+    claim_lease_seconds = _parse_float(os.getenv("CLAIM_LEASE_SECONDS"), 300.0)
+    if claim_lease_seconds < 30:
+        claim_lease_seconds = 30.0
 
     ai_provider = (os.getenv("AI_PROVIDER") or "gemini").strip() or "gemini"
     gemini_api_key = (os.getenv("GEMINI_API_KEY") or "").strip() or None
@@ -137,8 +328,36 @@ def load_settings() -> Settings:
     watermark_video_logo_scale = _parse_float(os.getenv("WATERMARK_VIDEO_LOGO_SCALE"), 0.06)
     watermark_video_text_scale = _parse_float(os.getenv("WATERMARK_VIDEO_TEXT_SCALE"), 0.022)
 
+    # Telegram recompresses photos to 2560px max; 0 disables downscaling.
+    image_max_dimension_raw = (os.getenv("IMAGE_MAX_DIMENSION") or "").strip()
+    image_max_dimension = (
+        int(image_max_dimension_raw) if image_max_dimension_raw.isdigit() else 2560
+    )
+    if 0 < image_max_dimension < 320:
+        image_max_dimension = 320
+
+    # Per-image byte budget for branded JPEGs; 0 keeps a fixed quality 95.
+    image_target_kb_raw = (os.getenv("IMAGE_TARGET_KB") or "").strip()
+    image_target_kb = int(image_target_kb_raw) if image_target_kb_raw.isdigit() else 500
+    if 0 < image_target_kb < 50:
+        image_target_kb = 50
+
+    image_min_ssim = _parse_float(os.getenv("IMAGE_MIN_SSIM"), 0.95)
+    if not 0 <= image_min_ssim <= 1:
+        image_min_ssim = 0.95
+    image_progressive = _parse_bool(os.getenv("IMAGE_PROGRESSIVE"), default=True)
+
+    media_cache_dir = (os.getenv("MEDIA_CACHE_DIR") or "").strip() or "data/media_cache"
+    media_cache_max_mb_raw = (os.getenv("MEDIA_CACHE_MAX_MB") or "").strip()
+    media_cache_max_mb = int(media_cache_max_mb_raw) if media_cache_max_mb_raw.isdigit() else 1024
+    media_cache_raw_ttl_raw = (os.getenv("MEDIA_CACHE_RAW_TTL_HOURS") or "").strip()
+    media_cache_raw_ttl_hours = (
+        int(media_cache_raw_ttl_raw) if media_cache_raw_ttl_raw.isdigit() else 24
+    )
+
     ytdlp_enabled = _parse_bool(os.getenv("YTDLP_ENABLED"), default=False)
     ytdlp_bin = (os.getenv("YTDLP_BIN") or "").strip() or "yt-dlp"
+    ytdlp_in_process = _parse_bool(os.getenv("YTDLP_IN_PROCESS"), default=False)
 
     video_source_text = (os.getenv("VIDEO_SOURCE_TEXT") or "").strip() or "🎥 Відео: Суспільне"
 
@@ -154,25 +373,147 @@ def load_settings() -> Settings:
     if telegram_max_media_images > 10:
         telegram_max_media_images = 10
 
+    telegram_api_base_url = (os.getenv("TELEGRAM_API_BASE_URL") or "").strip().rstrip(
+        "/"
+    ) or DEFAULT_TELEGRAM_API_BASE_URL
+    # Opt-in even with a custom endpoint: behind a plain proxy file:// paths
+    # would not resolve and the 1950 MB cap would be rejected.
+    telegram_local_mode = _parse_bool(os.getenv("TELEGRAM_LOCAL_MODE"), default=False)
+
+    default_max_video_upload_mb = (
+        LOCAL_DEFAULT_MAX_VIDEO_UPLOAD_MB
+        if telegram_local_mode
+        else CLOUD_DEFAULT_MAX_VIDEO_UPLOAD_MB
+    )
     max_video_upload_mb_raw = (os.getenv("MAX_VIDEO_UPLOAD_MB") or "").strip()
-    max_video_upload_mb = int(max_video_upload_mb_raw) if max_video_upload_mb_raw.isdigit() else 45
+    max_video_upload_mb = (
+        int(max_video_upload_mb_raw)
+        if max_video_upload_mb_raw.isdigit()
+        else default_max_video_upload_mb
+    )
     if max_video_upload_mb < 5:
         max_video_upload_mb = 5
 
+    # Sources are re-encoded while branding, so they may be larger than the upload cap.
+    max_video_download_mb_raw = (os.getenv("MAX_VIDEO_DOWNLOAD_MB") or "").strip()
+    max_video_download_mb = (
+        int(max_video_download_mb_raw)
+        if max_video_download_mb_raw.isdigit()
+        else max_video_upload_mb * 4
+    )
+    if max_video_download_mb < max_video_upload_mb:
+        max_video_download_mb = max_video_upload_mb
+
+    video_stream_branding = _parse_bool(os.getenv("VIDEO_STREAM_BRANDING"), default=False)
+    video_fit_upload_limit = _parse_bool(os.getenv("VIDEO_FIT_UPLOAD_LIMIT"), default=True)
+    video_two_pass = _parse_bool(os.getenv("VIDEO_TWO_PASS"), default=False)
+    video_parallel_segments_raw = (os.getenv("VIDEO_PARALLEL_SEGMENTS") or "").strip()
+    video_parallel_segments = (
+        int(video_parallel_segments_raw) if video_parallel_segments_raw.isdigit() else 1
+    )
+
+    video_max_concurrent_jobs_raw = (os.getenv("VIDEO_MAX_CONCURRENT_JOBS") or "").strip()
+    video_max_concurrent_jobs = (
+        int(video_max_concurrent_jobs_raw) if video_max_concurrent_jobs_raw.isdigit() else 1
+    )
+    if video_max_concurrent_jobs < 1:
+        video_max_concurrent_jobs = 1
+
+    media_prefetch_items_raw = (os.getenv("MEDIA_PREFETCH_ITEMS") or "").strip()
+    media_prefetch_items = (
+        int(media_prefetch_items_raw) if media_prefetch_items_raw.isdigit() else 2
+    )
+
+    video_nice_raw = (os.getenv("VIDEO_NICE") or "").strip()
+    video_nice = int(video_nice_raw) if video_nice_raw.isdigit() else 0
+    if video_nice > 19:
+        video_nice = 19
+
+    video_cpu_affinity = _parse_cpu_list(os.getenv("VIDEO_CPU_AFFINITY"))
+    video_stall_timeout_seconds = _parse_float(os.getenv("VIDEO_STALL_TIMEOUT_SECONDS"), 60.0)
+    if video_stall_timeout_seconds < 5:
+        video_stall_timeout_seconds = 5.0
+
+    max_image_download_mb_raw = (os.getenv("MAX_IMAGE_DOWNLOAD_MB") or "").strip()
+    max_image_download_mb = (
+        int(max_image_download_mb_raw) if max_image_download_mb_raw.isdigit() else 20
+    )
+    if max_image_download_mb < 1:
+        max_image_download_mb = 1
+
+    max_retries_raw = (os.getenv("TELEGRAM_MAX_RETRIES") or "").strip()
+    telegram_max_retries = int(max_retries_raw) if max_retries_raw.isdigit() else 3
+    if telegram_max_retries > 10:
+        telegram_max_retries = 10
+
+    max_retry_after_raw = (os.getenv("TELEGRAM_MAX_RETRY_AFTER_SECONDS") or "").strip()
+    telegram_max_retry_after_seconds = (
+        int(max_retry_after_raw) if max_retry_after_raw.isdigit() else 60
+    )
+
+    telegram_reuse_file_ids = _parse_bool(os.getenv("TELEGRAM_REUSE_FILE_IDS"), default=True)
+
+    telegram_global_messages_per_second = _parse_float(
+        os.getenv("TELEGRAM_GLOBAL_MESSAGES_PER_SECOND"), 30.0
+    )
+    if telegram_global_messages_per_second <= 0:
+        telegram_global_messages_per_second = 30.0
+
+    telegram_chat_messages_per_minute = _parse_float(
+        os.getenv("TELEGRAM_CHAT_MESSAGES_PER_MINUTE"), 20.0
+    )
+    if telegram_chat_messages_per_minute <= 0:
+        telegram_chat_messages_per_minute = 20.0
+
+    chat_burst_raw = (os.getenv("TELEGRAM_CHAT_BURST") or "").strip()
+    telegram_chat_burst = int(chat_burst_raw) if chat_burst_raw.isdigit() else 3
+    if telegram_chat_burst < 1:
+        telegram_chat_burst = 1
+
+    breaking_news_keywords = (
+        os.getenv("BREAKING_NEWS_KEYWORDS") or ""
+    ).strip() or "терміново,блискавка"
+
+    publish_deadline_seconds = max(0.0, _parse_float(os.getenv("PUBLISH_DEADLINE_SECONDS"), 0.0))
+    breaking_publish_deadline_seconds = max(
+        0.0, _parse_float(os.getenv("BREAKING_PUBLISH_DEADLINE_SECONDS"), 0.0)
+    )
+
+    extra_channels = _parse_extra_channels(
+        os.getenv("TELEGRAM_EXTRA_CHANNELS"),
+        primary_chat_id=chat_id,
+        channel_cta_text=channel_cta_text,
+        channel_cta_url=channel_cta_url,
+        watermark_text=watermark_text,
+        watermark_logo_path=watermark_logo_path,
+    )
+
     media_debug = _parse_bool(os.getenv("MEDIA_DEBUG"), default=True)
 
     return Settings(
         telegram_bot_token=token,
         telegram_chat_id=chat_id,
+        telegram_api_base_url=telegram_api_base_url,
+        telegram_local_mode=telegram_local_mode,
         max_posts_per_run=max_posts,
+        max_posts_per_hour=max_posts_per_hour,
+        backlog_max_age_minutes=backlog_max_age_minutes,
+        backlog_source_weights=backlog_source_weights,
         dry_run=dry_run,
         ai_enabled=ai_enabled,
         poll_interval_seconds=poll_interval,
+        adaptive_polling=adaptive_polling,
+        feed_poll_min_seconds=feed_poll_min_seconds,
+        feed_poll_max_seconds=feed_poll_max_seconds,
+        feed_poll_jitter=feed_poll_jitter,
         init_skip_existing=init_skip_existing,
         init_post_latest=init_post_latest,
         dedup_db_path=dedup_db_path,
         reset_dedup_on_start=reset_dedup_on_start,
         dry_run_mark_seen=dry_run_mark_seen,
+        work_queue_max_attempts=work_queue_max_attempts,
+        worker_id=worker_id,
+        claim_lease_seconds=claim_lease_seconds,
         ai_provider=ai_provider,
         gemini_api_key=gemini_api_key,
         gemini_api_keys=gemini_api_keys,
@@ -189,11 +530,40 @@ def load_settings() -> Settings:
         watermark_image_text_scale=watermark_image_text_scale,
         watermark_video_logo_scale=watermark_video_logo_scale,
         watermark_video_text_scale=watermark_video_text_scale,
+        image_max_dimension=image_max_dimension,
+        image_target_kb=image_target_kb,
+        image_min_ssim=image_min_ssim,
+        image_progressive=image_progressive,
+        media_cache_dir=media_cache_dir,
+        media_cache_max_mb=media_cache_max_mb,
+        media_cache_raw_ttl_hours=media_cache_raw_ttl_hours,
         ytdlp_enabled=ytdlp_enabled,
         ytdlp_bin=ytdlp_bin,
+        ytdlp_in_process=ytdlp_in_process,
         video_source_text=video_source_text,
         telegram_media_caption_limit=telegram_media_caption_limit,
         telegram_max_media_images=telegram_max_media_images,
         max_video_upload_mb=max_video_upload_mb,
+        max_video_download_mb=max_video_download_mb,
+        max_image_download_mb=max_image_download_mb,
+        video_stream_branding=video_stream_branding,
+        video_fit_upload_limit=video_fit_upload_limit,
+        video_two_pass=video_two_pass,
+        video_parallel_segments=video_parallel_segments,
+        video_max_concurrent_jobs=video_max_concurrent_jobs,
+        video_nice=video_nice,
+        video_cpu_affinity=video_cpu_affinity,
+        video_stall_timeout_seconds=video_stall_timeout_seconds,
+        media_prefetch_items=media_prefetch_items,
+        telegram_max_retries=telegram_max_retries,
+        telegram_max_retry_after_seconds=telegram_max_retry_after_seconds,
+        telegram_reuse_file_ids=telegram_reuse_file_ids,
+        telegram_global_messages_per_second=telegram_global_messages_per_second,
+        telegram_chat_messages_per_minute=telegram_chat_messages_per_minute,
+        telegram_chat_burst=telegram_chat_burst,
+        breaking_news_keywords=breaking_news_keywords,
+        publish_deadline_seconds=publish_deadline_seconds,
+        breaking_publish_deadline_seconds=breaking_publish_deadline_seconds,
+        extra_channels=extra_channels,
         media_debug=media_debug,
     )
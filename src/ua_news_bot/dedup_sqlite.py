@@ -13,6 +13,11 @@ class SQLiteSeenStore:
     - `has(url)` checks if URL was seen.
     - `mark_seen(url)` stores URL as seen.
     We mark URLs as seen ONLY after we actually post (or intentionally skip).
+
+    Several workers can share one database: `claim(url, owner, lease)` hands an
+    unseen URL to exactly one of them until the lease expires. The owner keeps
+    it with `renew`, and ends with `mark_done` or, to give it back, `release`.
+    A crashed worker's claim simply expires.
     """
 
     def __init__(self, db_path: str = "data/seen.sqlite3") -> None:
@@ -28,6 +33,15 @@ class SQLiteSeenStore:
             )
             """
         )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS claims (
+                url TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
         self._conn.commit()
 
     def has(self, url: str) -> bool:
@@ -42,5 +56,63 @@ class SQLiteSeenStore:
         )
         self._conn.commit()
 
+    def reset(self) -> int:
+        """Forgets every seen URL (claims are kept). Returns how many were removed."""
+        cur = self._conn.execute("DELETE FROM seen")
+        self._conn.commit()
+        return cur.rowcount
+
+    def claim(self, url: str, owner: str, lease_seconds: float) -> bool:
+        """
+        Claims an unseen URL for `owner`. Returns False if it was seen or
+        another owner holds an unexpired lease. Claiming again as the same
+        owner extends the lease.
+        """
+        now = time()
+        # One statement, so the seen check and the claim are atomic across processes.
+        cur = self._conn.execute(
+            """
+            INSERT INTO claims (url, owner, expires_at)
+            SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM seen WHERE url = ?)
+            ON CONFLICT (url) DO UPDATE SET
+                owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE claims.owner = excluded.owner OR claims.expires_at <= ?
+            """,
+            (url, owner, now + lease_seconds, url, now),
+        )
+        self._conn.commit()
+        return cur.rowcount > 0
+
+    def renew(self, url: str, owner: str, lease_seconds: float) -> bool:
+        """Extends the lease. Returns False if `owner` no longer holds the claim."""
+        now = time()
+        cur = self._conn.execute(
+            "UPDATE claims SET expires_at = ? WHERE url = ? AND owner = ? AND expires_at > ?",
+            (now + lease_seconds, url, owner, now),
+        )
+        self._conn.commit()
+        return cur.rowcount > 0
+
+    def claimed_by_other(self, url: str, owner: str) -> bool:
+        """True if another owner holds an unexpired claim on the URL."""
+        cur = self._conn.execute(
+            "SELECT 1 FROM claims WHERE url = ? AND owner != ? AND expires_at > ?",
+            (url, owner, time()),
+        )
+        return cur.fetchone() is not None
+
+    def release(self, url: str, owner: str) -> None:
+        self._conn.execute("DELETE FROM claims WHERE url = ? AND owner = ?", (url, owner))
+        self._conn.commit()
+
+    def mark_done(self, url: str, owner: str) -> None:
+        """Marks the URL seen and drops the claim in one transaction."""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO seen (url, seen_at) VALUES (?, ?)",
+                (url, int(time())),
+            )
+            self._conn.execute("DELETE FROM claims WHERE url = ? AND owner = ?", (url, owner))
+
     def close(self) -> None:
         self._conn.close()
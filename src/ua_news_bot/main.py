@@ -2,26 +2,77 @@ from __future__ import annotations
 
 import asyncio
 import html
+import json
+import os
 import re
 import tempfile
+import time
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Collection
+from contextlib import nullcontext
+from datetime import UTC, datetime
+from io import BytesIO
 from pathlib import Path
+from typing import Any
+
+import httpx
+from PIL import Image
 
 from ua_news_bot.aggregator import fetch_all_latest
-from ua_news_bot.config import load_settings
+from ua_news_bot.backlog import DrainPlan, plan_drain
+from ua_news_bot.config import ChannelTarget, load_settings
 from ua_news_bot.dedup_sqlite import SQLiteSeenStore
 from ua_news_bot.formatter import format_telegram_post
-from ua_news_bot.media.downloader import download_bytes, download_image_bytes
+from ua_news_bot.media.disk_cache import MediaDiskCache, branded_key, raw_key
+from ua_news_bot.media.downloader import download_image_bytes, download_to_file, open_download
 from ua_news_bot.media.image_editor import add_branding_to_image
-from ua_news_bot.media.video_editor import add_branding_to_video_file
-from ua_news_bot.media.video_resolver import resolve_video_for_item
-from ua_news_bot.media.ytdlp_downloader import download_video_with_ytdlp
+from ua_news_bot.media.media_info import MediaInfo, probe_media
+from ua_news_bot.media.video_editor import (
+    add_branding_to_video_file,
+    add_branding_to_video_stream,
+)
+from ua_news_bot.media.video_jobs import ProcessControls, VideoJobManager
+from ua_news_bot.media.video_resolver import (
+    ResolvedVideo,
+    page_cache_stats,
+    resolve_video_for_item,
+    scan_article_page,
+)
+from ua_news_bot.media.ytdlp_downloader import (
+    download_video_with_ytdlp,
+    extract_info_with_ytdlp,
+    format_for_budget,
+    get_in_process_ytdlp,
+)
+from ua_news_bot.polling import FeedPollScheduler
+from ua_news_bot.published_messages import (
+    MEDIA_PLACEHOLDER,
+    MEDIA_SWAPPED,
+    PendingMessage,
+    SQLitePublishedMessageStore,
+)
+from ua_news_bot.send_scheduler import PRIORITY_BREAKING, PRIORITY_NORMAL, SendScheduler
+from ua_news_bot.sources.base import NewsSource
 from ua_news_bot.sources.suspilne import SuspilneSource
 from ua_news_bot.telegram_client import TelegramAPIError, TelegramClient
+from ua_news_bot.telegram_file_ids import SQLiteFileIdStore, hash_bytes, hash_file_async
+from ua_news_bot.work_queue import (
+    STATE_EXPIRED,
+    STATE_FETCHED,
+    STATE_SENT,
+    STATE_SKIPPED,
+    TERMINAL_STATES,
+    SQLiteWorkQueue,
+)
 
 _B_RE = re.compile(r"<b>.*?</b>", re.DOTALL)
 _TAG_BALANCE_TAGS = ["b", "i", "u", "blockquote", "tg-spoiler"]
 _SOURCE_LINE_RE = re.compile(r"\n\nДжерело:.*$", re.DOTALL)
 
+# Card posted in place of a late video when the article has no og:image.
+PLACEHOLDER_CARD_SIZE = (1280, 720)
+PLACEHOLDER_CARD_COLOR = (24, 24, 28)
+
 
 def _build_ai_input(title: str, summary: str | None) -> str:
     summary = (summary or "").strip()
@@ -121,167 +172,1309 @@ def _is_413_error(exc: Exception) -> bool:
 async def _send_media_with_safe_caption(
     *,
     tg: TelegramClient,
+    scheduler: SendScheduler,
     chat_id: str,
     media_kind: str,
     media_payload,
     text: str,
     caption_limit: int,
-) -> None:
+    priority: int = PRIORITY_NORMAL,
+    video_info: MediaInfo | None = None,
+) -> Any:
+    """Returns the result of the media send (a message, or a list for albums)."""
     caption, remainder = _split_media_caption_and_remainder(text, caption_limit)
 
     if media_kind == "photo":
-        await tg.send_photo(chat_id, media_payload, caption)
+        cost = 1
+
+        async def send_media() -> Any:
+            return await tg.send_photo(chat_id, media_payload, caption)
+
     elif media_kind == "album":
-        await tg.send_media_group(chat_id, media_payload, caption)
+        cost = len(media_payload)
+
+        async def send_media() -> Any:
+            return await tg.send_media_group(chat_id, media_payload, caption)
+
     elif media_kind == "video":
-        await tg.send_video(chat_id, media_payload, caption)
+        cost = 1
+
+        async def send_media() -> Any:
+            return await tg.send_video(
+                chat_id,
+                media_payload,
+                caption,
+                duration=video_info.duration if video_info else None,
+                width=video_info.width if video_info else None,
+                height=video_info.height if video_info else None,
+            )
+
     else:
         raise ValueError(f"Unsupported media_kind: {media_kind}")
 
-    if remainder:
-        await tg.send_message(chat_id, remainder)
+    # The overflow text is coalesced into the same scheduler job so it is paced
+    # together with its media and nothing else is posted in between.
+    async def send_job() -> Any:
+        message = await send_media()
+        if remainder:
+            await tg.send_message(chat_id, remainder)
+        return message
+
+    return await scheduler.submit(
+        chat_id,
+        send_job,
+        cost=cost + (1 if remainder else 0),
+        priority=priority,
+    )
+
+
+async def _send_text(
+    *,
+    tg: TelegramClient,
+    scheduler: SendScheduler,
+    chat_id: str,
+    text: str,
+    priority: int = PRIORITY_NORMAL,
+) -> None:
+    await scheduler.submit(
+        chat_id,
+        lambda: tg.send_message(chat_id, text),
+        priority=priority,
+    )
+
 
+def _item_priority(item, settings) -> int:
+    keywords = [x.strip().casefold() for x in settings.breaking_news_keywords.split(",")]
+    title = item.title.casefold()
+    if any(k and k in title for k in keywords):
+        return PRIORITY_BREAKING
+    return PRIORITY_NORMAL
+
+
+BrandingKey = tuple[str, str]
+
+
+def _branding_key(target: ChannelTarget) -> BrandingKey:
+    return (target.watermark_text, target.watermark_logo_path)
+
+
+def _image_branding_params(settings, target: ChannelTarget) -> dict:
+    logo_file = Path(target.watermark_logo_path)
+    return {
+        "kind": "image",
+        "watermark_text": target.watermark_text,
+        "logo_path": target.watermark_logo_path,
+        "logo_mtime_ns": logo_file.stat().st_mtime_ns if logo_file.exists() else 0,
+        "logo_scale": settings.watermark_image_logo_scale,
+        "text_scale": settings.watermark_image_text_scale,
+        "margin": settings.watermark_margin,
+        "max_dimension": settings.image_max_dimension,
+        "target_kb": settings.image_target_kb,
+        "min_ssim": settings.image_min_ssim,
+        "progressive": settings.image_progressive,
+    }
+
+
+def _video_branding_params(settings, target: ChannelTarget) -> dict:
+    logo_file = Path(target.watermark_logo_path)
+    return {
+        "kind": "video",
+        "watermark_text": target.watermark_text,
+        "logo_path": target.watermark_logo_path,
+        "logo_mtime_ns": logo_file.stat().st_mtime_ns if logo_file.exists() else 0,
+        "logo_scale": settings.watermark_video_logo_scale,
+        "text_scale": settings.watermark_video_text_scale,
+        "margin": settings.watermark_margin,
+        "max_mb": settings.max_video_upload_mb if settings.video_fit_upload_limit else None,
+        "two_pass": settings.video_two_pass,
+    }
+
+
+async def _download_image(
+    image_url: str,
+    referer: str,
+    settings,
+    cache: MediaDiskCache | None,
+) -> bytes | None:
+    cached = cache.get_bytes(raw_key(image_url)) if cache else None
+    if cached is not None:
+        return cached
 
-async def _prepare_media_photos(item, settings) -> list[bytes]:
+    try:
+        content = await download_image_bytes(
+            image_url,
+            referer=referer,
+            max_bytes=settings.max_image_download_mb * 1024 * 1024,
+        )
+    except Exception as e:
+        _media_log(settings, f"[MEDIA] image download failed for {image_url}: {e}")
+        return None
+
+    if cache:
+        cache.put_bytes(raw_key(image_url), content)
+    return content
+
+
+async def _download_media_images(item, settings, cache: MediaDiskCache | None) -> list[bytes]:
     if not item.image_urls:
         return []
 
-    prepared: list[bytes] = []
+    downloaded: list[bytes] = []
     for image_url in item.image_urls[: settings.telegram_max_media_images]:
+        content = await _download_image(image_url, item.url, settings, cache)
+        if content is not None:
+            downloaded.append(content)
+
+    return downloaded
+
+
+async def _placeholder_image(item, settings, cache: MediaDiskCache | None) -> bytes:
+    """
+    Still posted while the item's video is not ready yet: the article's
+    og:image when it has one, otherwise a plain dark card. Both get the usual
+    logo and watermark text.
+    """
+    try:
+        scan = await scan_article_page(item.url)
+    except Exception as e:
+        _media_log(settings, f"[MEDIA] article html fetch failed: {e}")
+        scan = None
+
+    if scan is not None and scan.og_image:
+        content = await _download_image(scan.og_image, item.url, settings, cache)
+        if content is not None:
+            return content
+
+    card = BytesIO()
+    Image.new("RGB", PLACEHOLDER_CARD_SIZE, PLACEHOLDER_CARD_COLOR).save(card, "JPEG", quality=90)
+    return card.getvalue()
+
+
+def _brand_images(
+    images: list[bytes],
+    settings,
+    target: ChannelTarget,
+    cache: MediaDiskCache | None,
+) -> list[bytes]:
+    params = _image_branding_params(settings, target)
+
+    prepared: list[bytes] = []
+    for content in images:
+        key = branded_key(hash_bytes(content), params) if cache else ""
+        cached = cache.get_bytes(key) if cache else None
+        if cached is not None:
+            prepared.append(cached)
+            continue
+
         try:
-            content = await download_image_bytes(image_url, referer=item.url)
             branded = add_branding_to_image(
                 image_bytes=content,
-                watermark_text=settings.watermark_text,
-                logo_path=settings.watermark_logo_path,
+                watermark_text=target.watermark_text,
+                logo_path=target.watermark_logo_path,
                 logo_scale=settings.watermark_image_logo_scale,
                 text_scale=settings.watermark_image_text_scale,
                 margin=settings.watermark_margin,
+                max_dimension=settings.image_max_dimension or None,
+                max_bytes=settings.image_target_kb * 1024 or None,
+                min_ssim=settings.image_min_ssim or None,
+                progressive=settings.image_progressive,
             )
-            prepared.append(branded.getvalue())
         except Exception as e:
-            _media_log(settings, f"[MEDIA] image prepare failed for {image_url}: {e}")
+            _media_log(settings, f"[MEDIA] image branding failed: {e}")
+            continue
+
+        if cache:
+            cache.put_bytes(key, branded.getvalue())
+        prepared.append(branded.getvalue())
 
     return prepared
 
 
-async def _brand_video_file(input_video_path: str, settings) -> str:
+def _process_controls(settings) -> ProcessControls:
+    return ProcessControls(
+        nice=settings.video_nice,
+        cpu_affinity=frozenset(settings.video_cpu_affinity),
+        stall_timeout=settings.video_stall_timeout_seconds,
+    )
+
+
+async def _brand_video_file(
+    input_video_path: str,
+    settings,
+    target: ChannelTarget,
+    media_info: MediaInfo | None = None,
+) -> str:
     return await add_branding_to_video_file(
         input_video_path=input_video_path,
-        watermark_text=settings.watermark_text,
-        logo_path=settings.watermark_logo_path,
+        watermark_text=target.watermark_text,
+        logo_path=target.watermark_logo_path,
         logo_scale=settings.watermark_video_logo_scale,
         text_scale=settings.watermark_video_text_scale,
         margin=settings.watermark_margin,
         ffmpeg_bin=settings.ffmpeg_bin,
         ffprobe_bin=settings.ffprobe_bin,
+        max_bytes=settings.max_video_upload_mb * 1024 * 1024
+        if settings.video_fit_upload_limit
+        else None,
+        two_pass=settings.video_two_pass,
+        media_info=media_info,
+        segments=settings.video_parallel_segments or os.cpu_count() or 1,
+        controls=_process_controls(settings),
     )
 
 
-async def _prepare_direct_video_from_url(video_url: str, referer: str, settings) -> str | None:
-    temp_input_path: str | None = None
-    branded_path: str | None = None
+async def _download_direct_video(
+    video_url: str,
+    referer: str,
+    settings,
+    cache: MediaDiskCache | None,
+) -> str | None:
+    cached = await cache.get_file_async(raw_key(video_url), suffix=".mp4") if cache else None
+    if cached:
+        return cached
+
+    temp_input = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
+    temp_input.close()
+    try:
+        await download_to_file(
+            video_url,
+            temp_input.name,
+            referer=referer,
+            timeout=120.0,
+            max_bytes=settings.max_video_download_mb * 1024 * 1024,
+        )
+    except Exception as e:
+        _media_log(settings, f"[MEDIA] direct video download failed: {e}")
+        return None
+
+    if cache:
+        await cache.put_file_async(
+            raw_key(video_url), temp_input.name, await hash_file_async(temp_input.name)
+        )
+    return temp_input.name
+
+
+async def _download_ytdlp_video(
+    video_url: str,
+    settings,
+    cache: MediaDiskCache | None,
+) -> str | None:
+    if not settings.ytdlp_enabled:
+        return None
+
+    cached = await cache.get_file_async(raw_key(video_url), suffix=".mp4") if cache else None
+    if cached:
+        return cached
 
+    max_upload_bytes = settings.max_video_upload_mb * 1024 * 1024
+    max_download_bytes = settings.max_video_download_mb * 1024 * 1024
     try:
-        content, content_type = await download_bytes(video_url, referer=referer, timeout=120.0)
-        if not content_type.startswith("video/"):
-            _media_log(settings, f"[MEDIA] direct video skipped: content-type={content_type}")
-            return None
+        if settings.ytdlp_in_process:
+            downloaded = await get_in_process_ytdlp().download(
+                video_url,
+                max_upload_bytes=max_upload_bytes,
+                max_download_bytes=max_download_bytes,
+            )
+        else:
+            # The height cap needs the duration: extract first, then download
+            # from that info without a second extraction.
+            controls = _process_controls(settings)
+            info = await extract_info_with_ytdlp(
+                video_url, ytdlp_bin=settings.ytdlp_bin, controls=controls
+            )
+            downloaded = await download_video_with_ytdlp(
+                video_url,
+                ytdlp_bin=settings.ytdlp_bin,
+                controls=controls,
+                format_selector=format_for_budget(
+                    info.get("duration"), max_upload_bytes, max_download_bytes
+                ),
+                max_filesize=max_download_bytes,
+                info=info,
+            )
+    except Exception as e:
+        _media_log(settings, f"[MEDIA] yt-dlp video download failed: {e}")
+        return None
+
+    if cache:
+        await cache.put_file_async(
+            raw_key(video_url), downloaded, await hash_file_async(downloaded)
+        )
+    return downloaded
 
-        temp_input = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-        temp_input.write(content)
-        temp_input.close()
-        temp_input_path = temp_input.name
 
-        branded_path = await _brand_video_file(temp_input_path, settings)
-        if _video_is_too_large(branded_path, settings.max_video_upload_mb):
+async def _download_resolved_video(
+    resolved: ResolvedVideo,
+    referer: str,
+    settings,
+    cache: MediaDiskCache | None,
+) -> str | None:
+    if resolved.kind == "direct":
+        return await _download_direct_video(resolved.url, referer, settings, cache)
+
+    if resolved.kind == "youtube":
+        return await _download_ytdlp_video(resolved.url, settings, cache)
+
+    return None
+
+
+def _check_branded_size(branded_path: str, settings) -> str | None:
+    if _video_is_too_large(branded_path, settings.max_video_upload_mb):
+        size_mb = Path(branded_path).stat().st_size / (1024 * 1024)
+        _media_log(
+            settings,
+            f"[MEDIA] video too large: {size_mb:.1f} MB > {settings.max_video_upload_mb} MB",
+        )
+        Path(branded_path).unlink(missing_ok=True)
+        return None
+    return branded_path
+
+
+class _StreamFallback(Exception):
+    def __init__(self, source_path: str | None = None) -> None:
+        super().__init__(source_path)
+        # The whole source, saved while streaming; None means download it again.
+        self.source_path = source_path
+
+
+class _SourceTee:
+    """
+    Passes the downloaded chunks on to ffmpeg and writes them to `path` as they
+    go, so a file-based fallback reuses the bytes instead of downloading again.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], path: str) -> None:
+        self._chunks = chunks
+        self._file = open(path, "wb")
+        self.complete = False
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        async for chunk in self._chunks:
+            self._file.write(chunk)
+            yield chunk
+        self.complete = True
+
+    async def finish(self) -> bool:
+        """Reads what ffmpeg left unread; True if the whole source is on disk."""
+        try:
+            async for _ in self.chunks():
+                pass
+        except Exception:
+            return False
+        finally:
+            self.close()
+        return self.complete
+
+    def close(self) -> None:
+        self._file.close()
+
+
+async def _brand_direct_video_streamed(
+    video_url: str,
+    referer: str,
+    settings,
+    target: ChannelTarget,
+    cache: MediaDiskCache | None,
+) -> tuple[str | None, str | None]:
+    """
+    Downloads and brands a direct video in one pass (HTTP body -> ffmpeg stdin)
+    and returns (branded, source). The source is saved while streaming, so
+    other watermarks and fallbacks do not download it again; it is None on a
+    cache hit. Returns (None, None) if the source is unusable (content-type,
+    size cap) and raises `_StreamFallback` if the stream could not be
+    transcoded, e.g. an mp4 that needs seeking, or came out over the upload
+    limit, so the caller retries through the saved file with a budgeted encode.
+    """
+    # No source bytes exist before the transcode, so the branded entry is keyed by URL.
+    key = (
+        branded_key(
+            f"url-{hash_bytes(video_url.encode())}", _video_branding_params(settings, target)
+        )
+        if cache
+        else ""
+    )
+    cached = await cache.get_file_async(key, suffix=".mp4") if cache else None
+    if cached:
+        if not _video_is_too_large(cached, settings.max_video_upload_mb):
+            return cached, None
+        Path(cached).unlink(missing_ok=True)
+
+    source = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
+    source.close()
+    has_source = False
+    tee: _SourceTee | None = None
+    try:
+        async with open_download(
+            video_url,
+            referer=referer,
+            timeout=120.0,
+            max_bytes=settings.max_video_download_mb * 1024 * 1024,
+        ) as (_, chunks):
+            tee = _SourceTee(chunks, source.name)
+            try:
+                branded_path = await add_branding_to_video_stream(
+                    tee.chunks(),
+                    watermark_text=target.watermark_text,
+                    logo_path=target.watermark_logo_path,
+                    logo_scale=settings.watermark_video_logo_scale,
+                    text_scale=settings.watermark_video_text_scale,
+                    margin=settings.watermark_margin,
+                    ffmpeg_bin=settings.ffmpeg_bin,
+                    controls=_process_controls(settings),
+                )
+            except (ValueError, httpx.HTTPError):
+                raise
+            except Exception as e:
+                _media_log(
+                    settings, f"[MEDIA] streamed video branding failed, using temp file: {e}"
+                )
+                has_source = await tee.finish()
+                raise _StreamFallback(source.name if has_source else None) from e
+            has_source = await tee.finish()
+    except (ValueError, httpx.HTTPError) as e:
+        _media_log(settings, f"[MEDIA] direct video download failed: {e}")
+        return None, None
+    finally:
+        if tee is not None:
+            tee.close()
+        if not has_source:
+            Path(source.name).unlink(missing_ok=True)
+
+    source_path = source.name if has_source else None
+    if cache and source_path:
+        await cache.put_file_async(
+            raw_key(video_url), source_path, await hash_file_async(source_path)
+        )
+
+    if _video_is_too_large(branded_path, settings.max_video_upload_mb):
+        # The stream is encoded at a fixed quality with no duration to plan a
+        # bitrate from; the file path re-encodes it to fit the upload budget.
+        size_mb = Path(branded_path).stat().st_size / (1024 * 1024)
+        _media_log(
+            settings,
+            f"[MEDIA] streamed video too large: {size_mb:.1f} MB > "
+            f"{settings.max_video_upload_mb} MB, re-encoding to fit",
+        )
+        Path(branded_path).unlink(missing_ok=True)
+        raise _StreamFallback(source_path)
+
+    if cache:
+        await cache.put_file_async(key, branded_path, await hash_file_async(branded_path))
+    return branded_path, source_path
+
+
+async def _brand_video_checked(
+    input_video_path: str,
+    settings,
+    target: ChannelTarget,
+    cache: MediaDiskCache | None,
+) -> str | None:
+    key = (
+        branded_key(
+            await hash_file_async(input_video_path), _video_branding_params(settings, target)
+        )
+        if cache
+        else ""
+    )
+    branded_path: str | None = await cache.get_file_async(key, suffix=".mp4") if cache else None
+
+    try:
+        if branded_path is None:
+            info = await probe_media(input_video_path, settings.ffprobe_bin)
+            if not info.is_usable:
+                _media_log(settings, f"[MEDIA] video skipped, no usable video stream: {info}")
+                return None
+            branded_path = await _brand_video_file(input_video_path, settings, target, info)
+            if cache:
+                await cache.put_file_async(key, branded_path, await hash_file_async(branded_path))
+
             size_mb = Path(branded_path).stat().st_size / (1024 * 1024)
             _media_log(
                 settings,
-                f"[MEDIA] direct video too large: {size_mb:.1f} MB > {settings.max_video_upload_mb} MB",
+                f"[MEDIA] branded video {size_mb:.1f} MB of {settings.max_video_upload_mb} MB "
+                f"budget ({size_mb / settings.max_video_upload_mb:.0%})",
             )
-            Path(branded_path).unlink(missing_ok=True)
-            return None
 
-        return branded_path
+        return _check_branded_size(branded_path, settings)
     except Exception as e:
-        _media_log(settings, f"[MEDIA] direct video prepare failed: {e}")
+        _media_log(settings, f"[MEDIA] video branding failed: {e}")
         if branded_path:
             Path(branded_path).unlink(missing_ok=True)
         return None
-    finally:
-        if temp_input_path:
-            Path(temp_input_path).unlink(missing_ok=True)
 
 
-async def _prepare_ytdlp_video(video_url: str, settings) -> str | None:
-    if not settings.ytdlp_enabled:
-        return None
+class _ItemMedia:
+    """
+    Media of one news item shared by all target channels.
+    Sources are downloaded once; branding runs once per distinct watermark, so
+    channels with the same watermark get identical bytes and reuse the file_id.
+    """
+
+    def __init__(
+        self,
+        item,
+        settings,
+        cache: MediaDiskCache | None = None,
+        video_jobs: VideoJobManager | None = None,
+    ) -> None:
+        self._item = item
+        self._settings = settings
+        self._cache = cache
+        self._video_jobs = video_jobs
+        self._raw_images: list[bytes] | None = None
+        self._resolved_video: ResolvedVideo | None = None
+        self._video_resolved = False
+        self._stream_failed = False
+        self._raw_video_path: str | None = None
+        self._video_downloaded = False
+        self._photos: dict[BrandingKey, list[bytes]] = {}
+        self._videos: dict[BrandingKey, str | None] = {}
+        self._video_tasks: dict[BrandingKey, asyncio.Task[str | None]] = {}
+        # Download and branding of one item run one at a time, so concurrent
+        # targets never start a second download of the same source.
+        self._video_lock = asyncio.Lock()
+        self._placeholder: bytes | None = None
+
+    async def photos_for(self, target: ChannelTarget) -> list[bytes]:
+        if self._raw_images is None:
+            self._raw_images = await _download_media_images(self._item, self._settings, self._cache)
+
+        key = _branding_key(target)
+        if key not in self._photos:
+            self._photos[key] = _brand_images(self._raw_images, self._settings, target, self._cache)
+        return self._photos[key]
+
+    async def _resolve_video(self) -> ResolvedVideo | None:
+        if not self._video_resolved:
+            # Flagged after the await: a preempted job resolves again next time.
+            self._resolved_video = await resolve_video_for_item(self._item)
+            self._video_resolved = True
+            if self._resolved_video:
+                _media_log(
+                    self._settings,
+                    f"[MEDIA] resolved video kind={self._resolved_video.kind} "
+                    f"url={self._resolved_video.url}",
+                )
+        return self._resolved_video
+
+    async def video_for(self, target: ChannelTarget) -> str | None:
+        return await self.video_task(target)
+
+    def video_task(
+        self, target: ChannelTarget, *, background: bool = False
+    ) -> asyncio.Task[str | None]:
+        """
+        The preparation of the target's video as a task shared by every caller,
+        so a publish deadline can stop waiting for it without cancelling it.
+        A `background` task (prefetch) that was preempted is started again.
+        """
+        key = _branding_key(target)
+        task = self._video_tasks.get(key)
+        if task is None or task.cancelled():
+            task = asyncio.create_task(self._video_job(target, background))
+            self._video_tasks[key] = task
+        return task
+
+    async def _video_job(self, target: ChannelTarget, background: bool) -> str | None:
+        if _branding_key(target) in self._videos:
+            return self._videos[_branding_key(target)]
+
+        job = (
+            self._video_jobs.job(self._item.url, background=background)
+            if self._video_jobs is not None
+            else nullcontext()
+        )
+        async with self._video_lock, job:
+            return await self._prepare_video(target)
 
-    temp_downloaded: str | None = None
-    branded_path: str | None = None
+    async def placeholder_for(self, target: ChannelTarget) -> bytes | None:
+        if self._placeholder is None:
+            self._placeholder = await _placeholder_image(self._item, self._settings, self._cache)
 
-    try:
-        temp_downloaded = await download_video_with_ytdlp(
-            video_url,
-            ytdlp_bin=settings.ytdlp_bin,
+        branded = _brand_images([self._placeholder], self._settings, target, self._cache)
+        return branded[0] if branded else None
+
+    async def _prepare_video(self, target: ChannelTarget) -> str | None:
+        key = _branding_key(target)
+
+        resolved = await self._resolve_video()
+        if resolved is None:
+            return None
+
+        if (
+            self._settings.video_stream_branding
+            and resolved.kind == "direct"
+            and not self._video_downloaded
+            and not self._stream_failed
+        ):
+            try:
+                branded, source = await _brand_direct_video_streamed(
+                    resolved.url, self._item.url, self._settings, target, self._cache
+                )
+            except _StreamFallback as e:
+                self._stream_failed = True
+                if e.source_path:
+                    self._video_downloaded = True
+                    self._raw_video_path = e.source_path
+            else:
+                if source:
+                    self._video_downloaded = True
+                    self._raw_video_path = source
+                self._videos[key] = branded
+                return branded
+
+        if not self._video_downloaded:
+            self._raw_video_path = await _download_resolved_video(
+                resolved, self._item.url, self._settings, self._cache
+            )
+            self._video_downloaded = True
+
+        if self._raw_video_path is None:
+            return None
+
+        self._videos[key] = await _brand_video_checked(
+            self._raw_video_path, self._settings, target, self._cache
         )
-        branded_path = await _brand_video_file(temp_downloaded, settings)
-        if _video_is_too_large(branded_path, settings.max_video_upload_mb):
-            size_mb = Path(branded_path).stat().st_size / (1024 * 1024)
+        return self._videos[key]
+
+    def artifacts(self) -> dict[str, str]:
+        """Branded videos by branding key, for the work queue."""
+        return {json.dumps(list(key)): path for key, path in self._videos.items() if path}
+
+    def restore(self, artifacts: dict[str, str]) -> None:
+        """Reuses branded videos recorded before a restart, if the files still exist."""
+        for raw_key_json, path in artifacts.items():
+            if Path(path).exists():
+                key = tuple(json.loads(raw_key_json))
+                self._videos[key] = path
+
+    def cleanup(self, keep: Collection[str] = ()) -> None:
+        """Cancels video work and deletes its files, except the `keep` paths."""
+        for task in self._video_tasks.values():
+            task.cancel()
+        for path in (self._raw_video_path, *self._videos.values()):
+            if path and path not in keep:
+                Path(path).unlink(missing_ok=True)
+
+
+class MediaPrefetcher:
+    """
+    Prepares the media of upcoming items in the background while the current
+    item is enhanced, waits for the send rate limit or uploads, so an item's
+    photos or branded video are usually ready when its turn comes.
+
+    Items are prepared one at a time, in posting order; video work goes through
+    the shared `VideoJobManager` as background jobs, so foreground video work
+    preempts it. At most `max_items` items are kept; prepared items that are
+    no longer scheduled are dropped with their temp files.
+    """
+
+    def __init__(
+        self,
+        settings,
+        cache: MediaDiskCache | None,
+        video_jobs: VideoJobManager | None,
+        max_items: int,
+    ) -> None:
+        self._settings = settings
+        self._cache = cache
+        self._video_jobs = video_jobs
+        self._max_items = max_items
+        self._entries: dict[str, tuple[_ItemMedia, asyncio.Task[None]]] = {}
+        self._slot = asyncio.Semaphore(1)
+        self._stats: Counter[str] = Counter()
+
+    def has(self, item) -> bool:
+        return item.url in self._entries
+
+    def schedule(self, items) -> None:
+        wanted = items[: self._max_items]
+        wanted_urls = {item.url for item in wanted}
+        for url in [url for url in self._entries if url not in wanted_urls]:
+            self._discard(*self._entries.pop(url))
+
+        for item in wanted:
+            if item.url in self._entries:
+                continue
+            media = _ItemMedia(item, self._settings, self._cache, self._video_jobs)
+            self._entries[item.url] = (media, asyncio.create_task(self._prefetch(item, media)))
+
+    async def _prefetch(self, item, media: _ItemMedia) -> None:
+        async with self._slot:
+            started = time.monotonic()
+            try:
+                for target in self._settings.channel_targets():
+                    if await media.photos_for(target):
+                        continue
+                    video = media.video_task(target, background=True)
+                    await asyncio.wait([video])
+                    if video.cancelled():
+                        self._stats["preempted"] += 1
+                        _media_log(self._settings, f"[PREFETCH] {item.url} preempted")
+                        return
+                    video.result()
+            except Exception as e:
+                self._stats["failed"] += 1
+                _media_log(self._settings, f"[PREFETCH] {item.url} failed: {e}")
+                return
+
+            self._stats["prepared"] += 1
             _media_log(
-                settings,
-                f"[MEDIA] yt-dlp video too large: {size_mb:.1f} MB > {settings.max_video_upload_mb} MB",
+                self._settings,
+                f"[PREFETCH] {item.url} ready in {time.monotonic() - started:.1f}s",
             )
-            Path(branded_path).unlink(missing_ok=True)
+
+    async def take(self, item) -> _ItemMedia | None:
+        """
+        Hands over the prefetched media of `item` (the caller cleans it up),
+        waiting for a prefetch still in progress. None if it was not scheduled.
+        """
+        entry = self._entries.pop(item.url, None)
+        if entry is None:
+            self._stats["miss"] += 1
             return None
 
-        return branded_path
+        media, task = entry
+        self._stats["hit" if task.done() else "wait"] += 1
+        try:
+            await asyncio.wait([task])
+        except asyncio.CancelledError:
+            self._discard(media, task)
+            raise
+        return media
+
+    @staticmethod
+    def _discard(media: _ItemMedia, task: asyncio.Task[None]) -> None:
+        task.cancel()
+        task.add_done_callback(lambda _: media.cleanup())
+
+    async def aclose(self) -> None:
+        entries = list(self._entries.values())
+        self._entries.clear()
+        for media, task in entries:
+            self._discard(media, task)
+        await asyncio.gather(*(task for _, task in entries), return_exceptions=True)
+
+    def format_stats(self) -> str:
+        s = self._stats
+        return (
+            f"pending={len(self._entries)} prepared={s['prepared']} failed={s['failed']} "
+            f"preempted={s['preempted']} hit={s['hit']} wait={s['wait']} miss={s['miss']}"
+        )
+
+
+async def _probe_for_send(video_path: str, settings) -> MediaInfo | None:
+    try:
+        return await probe_media(video_path, settings.ffprobe_bin)
     except Exception as e:
-        _media_log(settings, f"[MEDIA] yt-dlp video prepare failed: {e}")
-        if branded_path:
-            Path(branded_path).unlink(missing_ok=True)
+        _media_log(settings, f"[MEDIA] ffprobe of branded video failed: {e}")
         return None
-    finally:
-        if temp_downloaded:
-            Path(temp_downloaded).unlink(missing_ok=True)
 
 
-async def _prepare_media_video(item, settings) -> str | None:
-    resolved = await resolve_video_for_item(item)
-    if not resolved:
+def _publish_deadline(item, settings) -> float | None:
+    """monotonic() time by which the item must be posted; None waits for media."""
+    if _item_priority(item, settings) == PRIORITY_BREAKING:
+        budget = settings.breaking_publish_deadline_seconds
+    else:
+        budget = settings.publish_deadline_seconds
+    if settings.dry_run or budget <= 0:
         return None
+    return time.monotonic() + budget
+
+
+async def _media_by_deadline(
+    media: _ItemMedia,
+    target: ChannelTarget,
+    deadline: float | None,
+) -> tuple[list[bytes], str | None, bool]:
+    """
+    Returns (photos, video_path, video_pending). When the video is not ready by
+    `deadline`, photos holds a placeholder and video_pending is True: the post
+    goes out now and `LateVideoSwaps` puts the video in later.
+    """
+    photos = await media.photos_for(target)
+    if photos:
+        return photos, None, False
+    if deadline is None:
+        return [], await media.video_for(target), False
+
+    task = media.video_task(target)
+    remaining = deadline - time.monotonic()
+    if remaining > 0:
+        await asyncio.wait([task], timeout=remaining)
+    if task.done():
+        return [], task.result(), False
+
+    placeholder = await media.placeholder_for(target)
+    if placeholder is None:
+        return [], await task, False
+    return [placeholder], None, True
+
+
+class LateVideoSwaps:
+    """
+    Posts that went out with a placeholder photo because their video missed
+    the publish deadline. Each swap waits for the item's video task and then
+    replaces the photo through editMessageMedia; if no video comes, the caption
+    drops the video note. The item's media is cleaned up after its last swap.
+    """
+
+    def __init__(
+        self,
+        tg: TelegramClient,
+        scheduler: SendScheduler,
+        settings,
+        store: SQLitePublishedMessageStore | None = None,
+    ) -> None:
+        self._tg = tg
+        self._scheduler = scheduler
+        self._settings = settings
+        self._store = store
+        self._tasks: dict[_ItemMedia, set[asyncio.Task[None]]] = {}
+        self._stats: Counter[str] = Counter()
+
+    def add(self, media: _ItemMedia, target: ChannelTarget, swap: PendingMessage) -> None:
+        if self._store is not None:
+            self._store.record(swap)
+        self._start(media, target, swap)
+
+    def resume(
+        self,
+        cache: MediaDiskCache | None = None,
+        video_jobs: VideoJobManager | None = None,
+    ) -> int:
+        """Restarts the swaps still pending in the store after a restart."""
+        if self._store is None:
+            return 0
+        targets = {target.chat_id: target for target in self._settings.channel_targets()}
+        media_by_url: dict[str, _ItemMedia] = {}
+        resumed = 0
+        for swap in self._store.pending():
+            target = targets.get(swap.chat_id)
+            if target is None:
+                # The chat is no longer configured: nothing to brand the video for.
+                self._done(swap, MEDIA_PLACEHOLDER)
+                continue
+            media = media_by_url.get(swap.item.url)
+            if media is None:
+                media = _ItemMedia(swap.item, self._settings, cache, video_jobs)
+                media_by_url[swap.item.url] = media
+            self._start(media, target, swap)
+            resumed += 1
+        return resumed
+
+    def _start(self, media: _ItemMedia, target: ChannelTarget, swap: PendingMessage) -> None:
+        task = asyncio.create_task(self._swap(media, target, swap))
+        self._tasks.setdefault(media, set()).add(task)
+        task.add_done_callback(lambda done: self._finish(media, done))
+
+    def owns(self, media: _ItemMedia) -> bool:
+        return media in self._tasks
+
+    def _finish(self, media: _ItemMedia, task: asyncio.Task[None]) -> None:
+        tasks = self._tasks.get(media)
+        if tasks is None:
+            return
+        tasks.discard(task)
+        if not tasks:
+            del self._tasks[media]
+            media.cleanup()
+
+    async def _swap(self, media: _ItemMedia, target: ChannelTarget, swap: PendingMessage) -> None:
+        started = time.monotonic()
+        try:
+            video_path = await media.video_for(target)
+            if video_path:
+                info = await _probe_for_send(video_path, self._settings)
+                await self._scheduler.submit(
+                    swap.chat_id,
+                    lambda: self._tg.edit_message_video(
+                        swap.chat_id,
+                        swap.message_id,
+                        video_path,
+                        swap.caption,
+                        duration=info.duration if info else None,
+                        width=info.width if info else None,
+                        height=info.height if info else None,
+                    ),
+                    priority=swap.priority,
+                )
+                self._done(swap, MEDIA_SWAPPED)
+                print(
+                    f"[LATE] video swapped into {swap.chat_id}/{swap.message_id} "
+                    f"{time.monotonic() - started:.1f}s after the post"
+                )
+                return
+        except Exception as e:
+            print(f"[LATE] video swap failed for {swap.item.url}: {type(e).__name__}: {e}")
 
-    _media_log(settings, f"[MEDIA] resolved video kind={resolved.kind} url={resolved.url}")
+        print(f"[LATE] no video for {swap.item.url}, placeholder kept in {swap.chat_id}")
+        self._done(swap, MEDIA_PLACEHOLDER)
+        if swap.caption_without_video and swap.caption_without_video != swap.caption:
+            try:
+                await self._scheduler.submit(
+                    swap.chat_id,
+                    lambda: self._tg.edit_message_caption(
+                        swap.chat_id, swap.message_id, swap.caption_without_video
+                    ),
+                    priority=swap.priority,
+                )
+            except Exception as e:
+                print(f"[LATE] caption edit failed for {swap.item.url}: {type(e).__name__}: {e}")
+
+    def _done(self, swap: PendingMessage, media_state: str) -> None:
+        self._stats[media_state] += 1
+        if self._store is not None:
+            self._store.set_media_state(swap.chat_id, swap.message_id, media_state)
+
+    async def aclose(self) -> None:
+        tasks = [task for tasks in self._tasks.values() for task in tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def format_stats(self) -> str:
+        pending = sum(len(tasks) for tasks in self._tasks.values())
+        return (
+            f"pending={pending} swapped={self._stats[MEDIA_SWAPPED]} "
+            f"placeholder={self._stats[MEDIA_PLACEHOLDER]}"
+        )
 
-    if resolved.kind == "direct":
-        return await _prepare_direct_video_from_url(resolved.url, item.url, settings)
 
-    if resolved.kind == "youtube":
-        return await _prepare_ytdlp_video(resolved.url, settings)
+async def _send_placeholder_post(
+    *,
+    tg: TelegramClient,
+    scheduler: SendScheduler,
+    settings,
+    late_swaps: LateVideoSwaps,
+    media: _ItemMedia,
+    item,
+    target: ChannelTarget,
+    text: str,
+    text_without_video: str,
+    photo: bytes,
+    priority: int,
+) -> None:
+    limit = settings.telegram_media_caption_limit
+    message = await _send_media_with_safe_caption(
+        tg=tg,
+        scheduler=scheduler,
+        chat_id=target.chat_id,
+        media_kind="photo",
+        media_payload=photo,
+        text=text,
+        caption_limit=limit,
+        priority=priority,
+    )
+    if not isinstance(message, dict) or "message_id" not in message:
+        return
+
+    caption, remainder = _split_media_caption_and_remainder(text, limit)
+    plain_caption, plain_remainder = _split_media_caption_and_remainder(text_without_video, limit)
+    late_swaps.add(
+        media,
+        target,
+        PendingMessage(
+            item=item,
+            chat_id=target.chat_id,
+            message_id=message["message_id"],
+            caption=caption,
+            caption_without_video=(
+                plain_caption if remainder is None and plain_remainder is None else None
+            ),
+            priority=priority,
+        ),
+    )
 
-    return None
+
+class PublishLatency:
+    """Seconds from the feed's published_at to the item's first visible post."""
+
+    def __init__(self, window: int = 500) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, published_at: datetime | None) -> float | None:
+        if published_at is None:
+            return None
+        # feedparser timestamps are naive UTC.
+        now = datetime.now(UTC)
+        if published_at.tzinfo is None:
+            now = now.replace(tzinfo=None)
+        latency = max(0.0, (now - published_at).total_seconds())
+        self._samples.append(latency)
+        return latency
+
+    def format_stats(self) -> str:
+        if not self._samples:
+            return "posts=0"
+        ordered = sorted(self._samples)
+        median = ordered[len(ordered) // 2]
+        return f"posts={len(ordered)} p50={median:.0f}s max={ordered[-1]:.0f}s"
+
+
+async def _send_post(
+    *,
+    tg: TelegramClient,
+    scheduler: SendScheduler,
+    settings,
+    chat_id: str,
+    text: str,
+    photos: list[bytes],
+    video_path: str | None,
+    text_on_413: str,
+    priority: int,
+) -> None:
+    if len(photos) > 1:
+        await _send_media_with_safe_caption(
+            tg=tg,
+            scheduler=scheduler,
+            chat_id=chat_id,
+            media_kind="album",
+            media_payload=photos,
+            text=text,
+            caption_limit=settings.telegram_media_caption_limit,
+            priority=priority,
+        )
+    elif len(photos) == 1:
+        await _send_media_with_safe_caption(
+            tg=tg,
+            scheduler=scheduler,
+            chat_id=chat_id,
+            media_kind="photo",
+            media_payload=photos[0],
+            text=text,
+            caption_limit=settings.telegram_media_caption_limit,
+            priority=priority,
+        )
+    elif video_path:
+        try:
+            await _send_media_with_safe_caption(
+                tg=tg,
+                scheduler=scheduler,
+                chat_id=chat_id,
+                media_kind="video",
+                media_payload=video_path,
+                text=text,
+                caption_limit=settings.telegram_media_caption_limit,
+                priority=priority,
+                video_info=await _probe_for_send(video_path, settings),
+            )
+        except TelegramAPIError as send_err:
+            if not _is_413_error(send_err):
+                raise
+            print("[MEDIA] video upload too large for Telegram, sending text only")
+            await _send_text(
+                tg=tg,
+                scheduler=scheduler,
+                chat_id=chat_id,
+                text=text_on_413,
+                priority=priority,
+            )
+    else:
+        await _send_text(
+            tg=tg,
+            scheduler=scheduler,
+            chat_id=chat_id,
+            text=text,
+            priority=priority,
+        )
+
+
+def _print_dry_run_post(
+    settings,
+    *,
+    label: str,
+    target: ChannelTarget,
+    show_chat: bool,
+    text: str,
+    photos: list[bytes],
+    video_path: str | None,
+) -> None:
+    chat_line = f"chat_id={target.chat_id}\n" if show_chat else ""
+    print(f"\n--- DRY RUN {label} ---\n{chat_line}{text}\n")
+
+    if len(photos) > 1:
+        media_line = f"album prepared with branding ({len(photos)} images)"
+    elif len(photos) == 1:
+        media_line = "photo prepared with branding"
+    elif video_path:
+        if settings.media_debug:
+            size_mb = Path(video_path).stat().st_size / (1024 * 1024)
+            media_line = f"video prepared with branding ({size_mb:.1f} MB)"
+        else:
+            media_line = "video prepared with branding"
+    else:
+        return
+
+    if settings.media_debug:
+        cap, rest = _split_media_caption_and_remainder(
+            text,
+            settings.telegram_media_caption_limit,
+        )
+        print(
+            "--- DRY RUN MEDIA ---\n"
+            f"{media_line}\n"
+            f"caption_len={len(cap)} overflow={'yes' if rest else 'no'}\n"
+        )
+    else:
+        print(f"--- DRY RUN MEDIA ---\n{media_line}\n")
+
+
+def _plan_backlog(queue: SQLiteWorkQueue, settings) -> DrainPlan:
+    """This cycle's share of the queue, within MAX_POSTS_PER_RUN and MAX_POSTS_PER_HOUR."""
+    now = time.time()
+    budget = settings.max_posts_per_run
+    if settings.max_posts_per_hour:
+        sent_last_hour = queue.sent_since(now - 3600)
+        budget = min(budget, max(0, settings.max_posts_per_hour - sent_last_hour))
+    return plan_drain(
+        queue.pending(),
+        now,
+        budget=budget,
+        max_age_seconds=settings.backlog_max_age_minutes * 60,
+        source_weights=settings.backlog_source_weights,
+        priority=lambda item: _item_priority(item, settings),
+    )
+
+
+def _claim_backlog(
+    queue: SQLiteWorkQueue, dedup: SQLiteSeenStore, plan: DrainPlan, settings
+) -> tuple[list, int]:
+    """
+    Claims items in plan order until this cycle's share is filled, so workers
+    sharing the queue split the backlog instead of all trying the same top items.
+    Returns the claimed items and the number of already done rows it closed.
+    """
+    claimed = []
+    closed = 0
+    for work in plan.post + plan.waiting:
+        if len(claimed) >= len(plan.post):
+            break
+        url = work.item.url
+        if dedup.claim(url, settings.worker_id, settings.claim_lease_seconds):
+            claimed.append(work.item)
+        elif dedup.has(url):
+            # Seen but not finished: the process stopped between the two commits.
+            queue.finish(url, STATE_SENT if work.delivered else STATE_SKIPPED)
+            print(f"[QUEUE] {url} was already done, closing it")
+            closed += 1
+        else:
+            print(f"[CLAIM] {url} is taken by another worker")
+    return claimed, closed
+
+
+def _backlog_heads(queue: SQLiteWorkQueue, dedup: SQLiteSeenStore, settings) -> list:
+    """
+    Items this worker most likely claims next cycle, for warming up media
+    during the sleep: its share of the plan, skipping items other workers hold.
+    """
+    plan = _plan_backlog(queue, settings)
+    heads = [
+        work.item
+        for work in plan.post + plan.waiting
+        if not dedup.claimed_by_other(work.item.url, settings.worker_id)
+    ]
+    return heads[: len(plan.post)]
+
+
+class ClaimLease:
+    """Renews an item claim in the background while the item is worked on."""
+
+    def __init__(self, dedup: SQLiteSeenStore, url: str, owner: str, lease_seconds: float) -> None:
+        self._dedup = dedup
+        self._url = url
+        self._owner = owner
+        self._lease_seconds = lease_seconds
+        self.lost = False
+        self._task = asyncio.create_task(self._renew())
+
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(self._lease_seconds / 3)
+            if not self._dedup.renew(self._url, self._owner, self._lease_seconds):
+                print(f"[CLAIM] lease on {self._url} expired, another worker may take it")
+                self.lost = True
+                return
+
+    async def release(self) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._dedup.release(self._url, self._owner)
+
+
+def _mark_delivered(
+    delivered: set[str],
+    chat_id: str,
+    item,
+    publish_latency: PublishLatency | None,
+    queue: SQLiteWorkQueue | None = None,
+) -> None:
+    if queue is not None:
+        queue.mark_delivered(item.url, chat_id)
+    # The first chat that shows the item counts for the publish latency.
+    if not delivered and publish_latency is not None:
+        publish_latency.record(item.published_at)
+    delivered.add(chat_id)
 
 
 async def run_once(
     *,
     tg: TelegramClient,
+    scheduler: SendScheduler,
     settings,
     dedup: SQLiteSeenStore,
+    media_cache: MediaDiskCache | None = None,
+    video_jobs: VideoJobManager | None = None,
+    prefetcher: MediaPrefetcher | None = None,
+    late_swaps: LateVideoSwaps | None = None,
+    publish_latency: PublishLatency | None = None,
+    work_queue: SQLiteWorkQueue | None = None,
+    sources: list[NewsSource] | None = None,
+    poll_scheduler: FeedPollScheduler | None = None,
 ) -> int:
-    sources = [SuspilneSource()]
-    items = await fetch_all_latest(sources, per_source_limit=30, dedup=None)
+    # Sources kept across cycles remember their validators for 304s.
+    sources = sources if sources is not None else [SuspilneSource()]
+    items = await fetch_all_latest(
+        sources, per_source_limit=30, dedup=None, poll_scheduler=poll_scheduler
+    )
+
+    # Dry runs leave no trace in the queue.
+    queue = work_queue if not settings.dry_run else None
 
     candidates = [x for x in items if not dedup.has(x.url)]
-    to_post = candidates[: settings.max_posts_per_run]
+    if queue is None:
+        to_post = candidates[: settings.max_posts_per_run]
+        for it in candidates[settings.max_posts_per_run :]:
+            dedup.mark_seen(it.url)
+        print(
+            f"[FETCH] fetched={len(items)} candidates={len(candidates)} "
+            f"will_post={len(to_post)} "
+            f"skipped_backlog={max(0, len(candidates) - len(to_post))}"
+        )
+    else:
+        # Overflow waits in the queue for later cycles instead of being dropped.
+        queued = sum(queue.enqueue(it) for it in candidates)
+        plan = _plan_backlog(queue, settings)
+        for work in plan.expired:
+            queue.finish(work.item.url, STATE_EXPIRED)
+            dedup.mark_seen(work.item.url)
+        resumed = sum(work.state != STATE_FETCHED for work in plan.post)
+        if resumed:
+            print(f"[QUEUE] resuming {resumed} unfinished items")
+        to_post, closed = _claim_backlog(queue, dedup, plan, settings)
+        print(
+            f"[FETCH] fetched={len(items)} new={queued} will_post={len(to_post)} "
+            f"backlog={len(plan.post) + len(plan.waiting) - len(to_post) - closed} "
+            f"expired={len(plan.expired)}"
+        )
 
-    for it in candidates[settings.max_posts_per_run :]:
-        dedup.mark_seen(it.url)
+    # Stable sort: breaking news first, backlog / feed order otherwise.
+    to_post.sort(key=lambda x: _item_priority(x, settings))
 
-    print(
-        f"[FETCH] fetched={len(items)} candidates={len(candidates)} "
-        f"will_post={len(to_post)} skipped_backlog={max(0, len(candidates) - len(to_post))}"
-    )
+    if prefetcher is not None and to_post:
+        # The first item is prepared in the foreground right away, unless it
+        # was already warmed up during the sleep.
+        prefetcher.schedule(to_post if prefetcher.has(to_post[0]) else to_post[1:])
 
     if not to_post:
         return 0
@@ -307,8 +1500,26 @@ async def run_once(
             )
         )
 
+    targets = settings.channel_targets()
+    show_chat = len(targets) > 1
+
     sent = 0
     for item in to_post:
+        lease = None
+        if not settings.dry_run:
+            # Claiming again as the owner extends a claim taken while planning.
+            if not dedup.claim(item.url, settings.worker_id, settings.claim_lease_seconds):
+                print(f"[CLAIM] {item.url} is taken by another worker")
+                continue
+            lease = ClaimLease(dedup, item.url, settings.worker_id, settings.claim_lease_seconds)
+        # Read after claiming: another worker may have moved the item on meanwhile.
+        work = queue.get(item.url) if queue is not None else None
+        if work is not None and work.state in TERMINAL_STATES:
+            if lease is not None:
+                await lease.release()
+            continue
+
+        priority = _item_priority(item, settings)
         rss_post = format_telegram_post(item)
         rss_debug_post = _append_cta(
             rss_post,
@@ -316,7 +1527,21 @@ async def run_once(
             settings.channel_cta_url,
         )
 
-        branded_video_path: str | None = None
+        media = (await prefetcher.take(item) if prefetcher is not None else None) or _ItemMedia(
+            item, settings, media_cache, video_jobs
+        )
+        # Chats that already got this item; the fallback path never reposts to them.
+        delivered: set[str] = set(work.delivered) if work else set()
+        if work is not None and work.in_flight:
+            print(f"[QUEUE] send to {work.in_flight} was interrupted, not resending {item.url}")
+            delivered.add(work.in_flight)
+        if work is not None and work.artifacts:
+            media.restore(work.artifacts)
+        # Files the queue row points at; the next attempt reuses them.
+        recorded = dict(work.artifacts) if work is not None else {}
+        # Late videos need somewhere to be swapped in; without it media is awaited.
+        deadline = _publish_deadline(item, settings) if late_swaps is not None else None
+        finished = queue is None
 
         try:
             if settings.dry_run:
@@ -329,7 +1554,10 @@ async def run_once(
                 if settings.media_debug and item.video_urls:
                     print(f"--- DRY RUN VIDEO URL ---\n{item.video_urls[0]}\n")
 
-            if enhancer is not None:
+            if work is not None and work.state != STATE_FETCHED:
+                # Enhanced before a restart: the stored text saves the AI call.
+                text = work.ai_text or _remove_source_line(rss_post)
+            elif enhancer is not None:
                 ai_input = _build_ai_input(item.title, item.summary)
                 ai_text = enhancer.enhance(ai_input)
 
@@ -337,6 +1565,9 @@ async def run_once(
                     print("[AI] SKIP classified as ad/marketing")
                     if settings.dry_run_mark_seen:
                         dedup.mark_seen(item.url)
+                    if queue is not None:
+                        queue.finish(item.url, STATE_SKIPPED)
+                        finished = True
                     continue
 
                 if _ai_output_is_bad(ai_text):
@@ -347,219 +1578,208 @@ async def run_once(
                     raise ValueError("AI output failed quality gate")
 
                 text = ai_text.strip()
+                if queue is not None:
+                    queue.set_enhanced(item.url, text)
             else:
                 text = _remove_source_line(rss_post)
+                if queue is not None:
+                    queue.set_enhanced(item.url, None)
+
+            prepared = {
+                target.chat_id: await _media_by_deadline(media, target, deadline)
+                for target in targets
+                if target.chat_id not in delivered
+            }
+            if queue is not None:
+                recorded = media.artifacts()
+                queue.set_media_ready(item.url, recorded)
+            if lease is not None and lease.lost:
+                finished = True
+                continue
 
-            photo_bytes_list = await _prepare_media_photos(item, settings)
-            if not photo_bytes_list:
-                branded_video_path = await _prepare_media_video(item, settings)
+            for target in targets:
+                if target.chat_id not in prepared:
+                    continue
+                photos, video_path, video_pending = prepared[target.chat_id]
+
+                post_text = text
+                if video_path or video_pending:
+                    post_text = _append_video_source_text(post_text, settings.video_source_text)
+                post_text = _append_cta(
+                    post_text,
+                    target.channel_cta_text,
+                    target.channel_cta_url,
+                )
 
-            if branded_video_path:
-                text = _append_video_source_text(text, settings.video_source_text)
+                if settings.dry_run:
+                    _print_dry_run_post(
+                        settings,
+                        label="AI POST",
+                        target=target,
+                        show_chat=show_chat,
+                        text=post_text,
+                        photos=photos,
+                        video_path=video_path,
+                    )
+                    continue
 
-            text = _append_cta(
-                text,
-                settings.channel_cta_text,
-                settings.channel_cta_url,
-            )
+                if queue is not None:
+                    queue.begin_send(item.url, target.chat_id)
+                if video_pending:
+                    await _send_placeholder_post(
+                        tg=tg,
+                        scheduler=scheduler,
+                        settings=settings,
+                        late_swaps=late_swaps,
+                        media=media,
+                        item=item,
+                        target=target,
+                        text=post_text,
+                        text_without_video=_append_cta(
+                            text, target.channel_cta_text, target.channel_cta_url
+                        ),
+                        photo=photos[0],
+                        priority=priority,
+                    )
+                    _mark_delivered(delivered, target.chat_id, item, publish_latency, queue)
+                    continue
+
+                fallback_media_text = _append_cta(
+                    _remove_source_line(rss_post),
+                    target.channel_cta_text,
+                    target.channel_cta_url,
+                )
+                await _send_post(
+                    tg=tg,
+                    scheduler=scheduler,
+                    settings=settings,
+                    chat_id=target.chat_id,
+                    text=post_text,
+                    photos=photos,
+                    video_path=video_path,
+                    text_on_413=fallback_media_text,
+                    priority=priority,
+                )
+                _mark_delivered(delivered, target.chat_id, item, publish_latency, queue)
 
             if settings.dry_run:
-                print(f"\n--- DRY RUN AI POST ---\n{text}\n")
-                if len(photo_bytes_list) > 1:
-                    if settings.media_debug:
-                        cap, rest = _split_media_caption_and_remainder(
-                            text,
-                            settings.telegram_media_caption_limit,
-                        )
-                        print(
-                            "--- DRY RUN MEDIA ---\n"
-                            f"album prepared with branding ({len(photo_bytes_list)} images)\n"
-                            f"caption_len={len(cap)} overflow={'yes' if rest else 'no'}\n"
-                        )
-                    else:
-                        print(
-                            "--- DRY RUN MEDIA ---\n"
-                            f"album prepared with branding ({len(photo_bytes_list)} images)\n"
-                        )
-                elif len(photo_bytes_list) == 1:
-                    if settings.media_debug:
-                        cap, rest = _split_media_caption_and_remainder(
-                            text,
-                            settings.telegram_media_caption_limit,
-                        )
-                        print(
-                            "--- DRY RUN MEDIA ---\n"
-                            "photo prepared with branding\n"
-                            f"caption_len={len(cap)} overflow={'yes' if rest else 'no'}\n"
-                        )
-                    else:
-                        print("--- DRY RUN MEDIA ---\nphoto prepared with branding\n")
-                elif branded_video_path:
-                    if settings.media_debug:
-                        size_mb = Path(branded_video_path).stat().st_size / (1024 * 1024)
-                        cap, rest = _split_media_caption_and_remainder(
-                            text,
-                            settings.telegram_media_caption_limit,
-                        )
-                        print(
-                            "--- DRY RUN MEDIA ---\n"
-                            f"video prepared with branding ({size_mb:.1f} MB)\n"
-                            f"caption_len={len(cap)} overflow={'yes' if rest else 'no'}\n"
-                        )
-                    else:
-                        print("--- DRY RUN MEDIA ---\nvideo prepared with branding\n")
                 if settings.dry_run_mark_seen:
                     dedup.mark_seen(item.url)
-                if branded_video_path:
-                    Path(branded_video_path).unlink(missing_ok=True)
+                continue
+
+            dedup.mark_done(item.url, settings.worker_id)
+            if queue is not None:
+                queue.finish(item.url, STATE_SENT)
+                finished = True
+            sent += 1
+
+        except Exception as e:
+            print(f"[AI/FALLBACK] {type(e).__name__}: {e}")
+            if lease is not None and lease.lost:
+                finished = True
                 continue
 
             try:
-                if len(photo_bytes_list) > 1:
-                    await _send_media_with_safe_caption(
-                        tg=tg,
-                        chat_id=settings.telegram_chat_id,
-                        media_kind="album",
-                        media_payload=photo_bytes_list,
-                        text=text,
-                        caption_limit=settings.telegram_media_caption_limit,
-                    )
-                elif len(photo_bytes_list) == 1:
-                    await _send_media_with_safe_caption(
-                        tg=tg,
-                        chat_id=settings.telegram_chat_id,
-                        media_kind="photo",
-                        media_payload=photo_bytes_list[0],
-                        text=text,
-                        caption_limit=settings.telegram_media_caption_limit,
-                    )
-                elif branded_video_path:
-                    await _send_media_with_safe_caption(
-                        tg=tg,
-                        chat_id=settings.telegram_chat_id,
-                        media_kind="video",
-                        media_payload=branded_video_path,
-                        text=text,
-                        caption_limit=settings.telegram_media_caption_limit,
+                for target in targets:
+                    if target.chat_id in delivered:
+                        continue
+
+                    photos, video_path, video_pending = await _media_by_deadline(
+                        media, target, deadline
                     )
-                else:
-                    await tg.send_message(settings.telegram_chat_id, text)
-            except TelegramAPIError as send_err:
-                if branded_video_path and _is_413_error(send_err):
-                    print("[MEDIA] video upload too large for Telegram, falling back")
-                    fallback_media_text = _remove_source_line(rss_post)
-                    fallback_media_text = _append_cta(
-                        fallback_media_text,
-                        settings.channel_cta_text,
-                        settings.channel_cta_url,
+
+                    plain_text = _remove_source_line(rss_post)
+                    fallback_text = plain_text
+                    if video_path or video_pending:
+                        fallback_text = _append_video_source_text(
+                            fallback_text,
+                            settings.video_source_text,
+                        )
+                    fallback_text = _append_cta(
+                        fallback_text,
+                        target.channel_cta_text,
+                        target.channel_cta_url,
                     )
 
-                    if len(photo_bytes_list) > 1:
-                        await _send_media_with_safe_caption(
-                            tg=tg,
-                            chat_id=settings.telegram_chat_id,
-                            media_kind="album",
-                            media_payload=photo_bytes_list,
-                            text=fallback_media_text,
-                            caption_limit=settings.telegram_media_caption_limit,
+                    if settings.dry_run:
+                        _print_dry_run_post(
+                            settings,
+                            label="FALLBACK POST",
+                            target=target,
+                            show_chat=show_chat,
+                            text=fallback_text,
+                            photos=photos,
+                            video_path=video_path,
                         )
-                    elif len(photo_bytes_list) == 1:
-                        await _send_media_with_safe_caption(
+                        continue
+
+                    if queue is not None:
+                        queue.begin_send(item.url, target.chat_id)
+                    if video_pending:
+                        await _send_placeholder_post(
                             tg=tg,
-                            chat_id=settings.telegram_chat_id,
-                            media_kind="photo",
-                            media_payload=photo_bytes_list[0],
-                            text=fallback_media_text,
-                            caption_limit=settings.telegram_media_caption_limit,
+                            scheduler=scheduler,
+                            settings=settings,
+                            late_swaps=late_swaps,
+                            media=media,
+                            item=item,
+                            target=target,
+                            text=fallback_text,
+                            text_without_video=_append_cta(
+                                plain_text, target.channel_cta_text, target.channel_cta_url
+                            ),
+                            photo=photos[0],
+                            priority=priority,
                         )
-                    else:
-                        await tg.send_message(settings.telegram_chat_id, fallback_media_text)
-                else:
-                    raise
-
-            dedup.mark_seen(item.url)
-            sent += 1
-
-        except Exception as e:
-            print(f"[AI/FALLBACK] {type(e).__name__}: {e}")
-
-            photo_bytes_list = await _prepare_media_photos(item, settings)
-            if not photo_bytes_list and branded_video_path is None:
-                branded_video_path = await _prepare_media_video(item, settings)
+                        _mark_delivered(delivered, target.chat_id, item, publish_latency, queue)
+                        continue
 
-            fallback_text = _remove_source_line(rss_post)
-            if branded_video_path:
-                fallback_text = _append_video_source_text(
-                    fallback_text,
-                    settings.video_source_text,
-                )
-            fallback_text = _append_cta(
-                fallback_text,
-                settings.channel_cta_text,
-                settings.channel_cta_url,
-            )
+                    await _send_post(
+                        tg=tg,
+                        scheduler=scheduler,
+                        settings=settings,
+                        chat_id=target.chat_id,
+                        text=fallback_text,
+                        photos=photos,
+                        video_path=video_path,
+                        text_on_413=fallback_text,
+                        priority=priority,
+                    )
+                    _mark_delivered(delivered, target.chat_id, item, publish_latency, queue)
 
-            try:
                 if settings.dry_run:
-                    print(f"\n--- DRY RUN FALLBACK POST ---\n{fallback_text}\n")
-                    if len(photo_bytes_list) > 1:
-                        print(
-                            "--- DRY RUN MEDIA ---\n"
-                            f"album prepared with branding ({len(photo_bytes_list)} images)\n"
-                        )
-                    elif len(photo_bytes_list) == 1:
-                        print("--- DRY RUN MEDIA ---\nphoto prepared with branding\n")
-                    elif branded_video_path:
-                        print("--- DRY RUN MEDIA ---\nvideo prepared with branding\n")
                     if settings.dry_run_mark_seen:
                         dedup.mark_seen(item.url)
                     continue
 
-                if len(photo_bytes_list) > 1:
-                    await _send_media_with_safe_caption(
-                        tg=tg,
-                        chat_id=settings.telegram_chat_id,
-                        media_kind="album",
-                        media_payload=photo_bytes_list,
-                        text=fallback_text,
-                        caption_limit=settings.telegram_media_caption_limit,
-                    )
-                elif len(photo_bytes_list) == 1:
-                    await _send_media_with_safe_caption(
-                        tg=tg,
-                        chat_id=settings.telegram_chat_id,
-                        media_kind="photo",
-                        media_payload=photo_bytes_list[0],
-                        text=fallback_text,
-                        caption_limit=settings.telegram_media_caption_limit,
-                    )
-                elif branded_video_path:
-                    try:
-                        await _send_media_with_safe_caption(
-                            tg=tg,
-                            chat_id=settings.telegram_chat_id,
-                            media_kind="video",
-                            media_payload=branded_video_path,
-                            text=fallback_text,
-                            caption_limit=settings.telegram_media_caption_limit,
-                        )
-                    except TelegramAPIError as send_err:
-                        if _is_413_error(send_err):
-                            print("[MEDIA] fallback video also too large, sending text only")
-                            await tg.send_message(settings.telegram_chat_id, fallback_text)
-                        else:
-                            raise
-                else:
-                    await tg.send_message(settings.telegram_chat_id, fallback_text)
-
-                dedup.mark_seen(item.url)
+                dedup.mark_done(item.url, settings.worker_id)
+                if queue is not None:
+                    queue.finish(item.url, STATE_SENT)
+                    finished = True
                 sent += 1
             except Exception as inner_e:
                 print(f"[ERR] {type(inner_e).__name__}: {inner_e}")
+                if queue is not None:
+                    # The queue knows the delivered chats, so the next attempt
+                    # only sends to the rest.
+                    if queue.record_failure(item.url, f"{type(inner_e).__name__}: {inner_e}"):
+                        print(f"[QUEUE] giving up on {item.url}")
+                        dedup.mark_seen(item.url)
+                        finished = True
+                elif delivered:
+                    # Retrying would duplicate the post in chats that already have it.
+                    print(f"[ERR] partial fan-out, delivered to {sorted(delivered)}")
+                    dedup.mark_seen(item.url)
 
         finally:
-            if branded_video_path:
-                Path(branded_video_path).unlink(missing_ok=True)
+            # Media with a pending late video is cleaned up after its swap.
+            owned = late_swaps is not None and late_swaps.owns(media)
+            if not owned:
+                # Unfinished queued items keep only the files recorded in
+                # the queue; unrecorded downloads and video work are dropped.
+                media.cleanup(keep=() if finished else set(recorded.values()))
+            if lease is not None:
+                await lease.release()
 
     return sent
 
@@ -571,40 +1791,131 @@ async def run_forever() -> None:
         f"[CFG] dry_run={settings.dry_run} "
         f"max_posts_per_run={settings.max_posts_per_run} "
         f"poll_interval_seconds={settings.poll_interval_seconds} "
-        f"ai_enabled={settings.ai_enabled} ai_provider={settings.ai_provider}"
+        f"ai_enabled={settings.ai_enabled} ai_provider={settings.ai_provider} "
+        f"channels={[t.chat_id for t in settings.channel_targets()]}"
+    )
+    print(
+        f"[TG] api={settings.telegram_api_base_url} local_mode={settings.telegram_local_mode} "
+        f"max_video_upload_mb={settings.max_video_upload_mb}"
     )
 
     if settings.ai_enabled and settings.ai_provider == "gemini":
         print(f"[AI] model={settings.gemini_model}")
 
-    if settings.reset_dedup_on_start:
-        try:
-            Path(settings.dedup_db_path).unlink(missing_ok=True)
-            print(f"[DEDUP] reset: deleted {settings.dedup_db_path}")
-        except Exception as e:
-            print(f"[DEDUP] reset failed: {type(e).__name__}: {e}")
-
-    tg = TelegramClient(settings.telegram_bot_token)
+    file_ids = (
+        SQLiteFileIdStore(settings.dedup_db_path) if settings.telegram_reuse_file_ids else None
+    )
+    scheduler = SendScheduler(
+        global_per_second=settings.telegram_global_messages_per_second,
+        chat_per_minute=settings.telegram_chat_messages_per_minute,
+        chat_burst=settings.telegram_chat_burst,
+    )
+    tg = TelegramClient(
+        settings.telegram_bot_token,
+        base_url=settings.telegram_api_base_url,
+        local_mode=settings.telegram_local_mode,
+        max_retries=settings.telegram_max_retries,
+        max_retry_after=settings.telegram_max_retry_after_seconds,
+        file_ids=file_ids,
+        on_retry_after=scheduler.pause,
+    )
     dedup = SQLiteSeenStore(settings.dedup_db_path)
+    work_queue = SQLiteWorkQueue(settings.dedup_db_path, settings.work_queue_max_attempts)
+    if settings.reset_dedup_on_start:
+        # The file also holds the work queue, claims, pending swaps and file_ids:
+        # only finished items are forgotten, unfinished ones keep their delivered chats.
+        forgotten = dedup.reset()
+        finished = work_queue.forget_finished()
+        print(f"[DEDUP] reset: forgot {forgotten} seen urls and {finished} finished items")
+    media_cache = (
+        MediaDiskCache(
+            settings.media_cache_dir,
+            settings.media_cache_max_mb * 1024 * 1024,
+            raw_ttl_seconds=settings.media_cache_raw_ttl_hours * 3600,
+        )
+        if settings.media_cache_max_mb
+        else None
+    )
+    video_jobs = VideoJobManager(settings.video_max_concurrent_jobs)
+    published = SQLitePublishedMessageStore(settings.dedup_db_path)
+    late_swaps = LateVideoSwaps(tg, scheduler, settings, published)
+    if not settings.dry_run:
+        resumed_swaps = late_swaps.resume(media_cache, video_jobs)
+        if resumed_swaps:
+            print(f"[LATE] resuming {resumed_swaps} pending video swaps")
+    publish_latency = PublishLatency()
+    prefetcher = (
+        MediaPrefetcher(settings, media_cache, video_jobs, settings.media_prefetch_items)
+        if settings.media_prefetch_items
+        else None
+    )
+    sources: list[NewsSource] = [SuspilneSource()]
+    poll_scheduler = (
+        FeedPollScheduler(
+            settings.feed_poll_min_seconds,
+            settings.feed_poll_max_seconds,
+            settings.feed_poll_jitter,
+        )
+        if settings.adaptive_polling
+        else None
+    )
 
     try:
         while True:
             try:
                 sent = await run_once(
                     tg=tg,
+                    scheduler=scheduler,
                     settings=settings,
                     dedup=dedup,
+                    media_cache=media_cache,
+                    video_jobs=video_jobs,
+                    prefetcher=prefetcher,
+                    late_swaps=late_swaps,
+                    publish_latency=publish_latency,
+                    work_queue=work_queue,
+                    sources=sources,
+                    poll_scheduler=poll_scheduler,
                 )
                 if settings.dry_run:
                     print("[DONE] dry-run cycle ✅")
                 else:
                     print(f"[POST] sent={sent} ✅")
+                    print(f"[SEND] {scheduler.format_stats()}")
+                    print(f"[LATENCY] {publish_latency.format_stats()}")
+                    print(f"[LATE] {late_swaps.format_stats()}")
+                    print(f"[QUEUE] {work_queue.format_stats()}")
+                if media_cache is not None:
+                    print(f"[CACHE] {media_cache.format_stats()}")
+                print(f"[CACHE] {page_cache_stats()}")
+                print(f"[VIDEO] jobs {video_jobs.format_stats()}")
+                if prefetcher is not None:
+                    print(f"[PREFETCH] {prefetcher.format_stats()}")
+                if poll_scheduler is not None:
+                    print(f"[POLL] {poll_scheduler.format_stats()}")
             except Exception as e:
                 print(f"[ERR] {type(e).__name__}: {e}")
 
-            await asyncio.sleep(settings.poll_interval_seconds)
+            if prefetcher is not None and not settings.dry_run:
+                prefetcher.schedule(_backlog_heads(work_queue, dedup, settings))
+            sleep_seconds = settings.poll_interval_seconds
+            if poll_scheduler is not None:
+                # Cycles (backlog, retries) still run every POLL_INTERVAL_SECONDS;
+                # feeds that are not due are skipped without a request.
+                sleep_seconds = min(sleep_seconds, max(1.0, poll_scheduler.seconds_until_next()))
+            await asyncio.sleep(sleep_seconds)
     finally:
+        if prefetcher is not None:
+            await prefetcher.aclose()
+        await late_swaps.aclose()
+        published.close()
+        work_queue.close()
         dedup.close()
+        await tg.aclose()
+        if file_ids is not None:
+            file_ids.close()
+        if media_cache is not None:
+            media_cache.close()
 
 
 def main() -> None:
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from time import time
+from typing import Any
+
+
+def branding_params_digest(params: dict[str, Any]) -> str:
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def raw_key(url: str) -> str:
+    return f"raw:{url}"
+
+
+def branded_key(raw_hash: str, params: dict[str, Any]) -> str:
+    return f"branded:{raw_hash}:{branding_params_digest(params)}"
+
+
+class MediaDiskCache:
+    """
+    Content-addressed media cache on disk.
+
+    Blobs are stored once by sha256 under `<root>/blobs/`, and a SQLite index
+    maps lookup keys to blob hashes:
+    - `raw:<url>` for downloaded sources,
+    - `branded:<raw sha256>:<params digest>` for branding outputs.
+
+    Writes go to a temp file and are renamed into place, so a crash never
+    leaves a partial blob. When the total size exceeds `max_bytes`, the least
+    recently used blobs (and keys pointing at them) are evicted. `raw:` keys
+    older than `raw_ttl_seconds` are misses, so a source that changed behind
+    the same URL is downloaded again (0 = keep until evicted).
+
+    Videos are large: async code uses `get_file_async` / `put_file_async`,
+    which copy in a worker thread. The index is shared under a lock.
+    """
+
+    def __init__(
+        self,
+        root: str = "data/media_cache",
+        max_bytes: int = 1024 * 1024 * 1024,
+        raw_ttl_seconds: float = 0.0,
+    ) -> None:
+        self._root = Path(root)
+        self._blobs = self._root / "blobs"
+        self._blobs.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._raw_ttl_seconds = raw_ttl_seconds
+        self._stats: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self._root / "index.sqlite3", check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS keys (
+                key TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                stored_at REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access);
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(keys)")}
+        if "stored_at" not in columns:
+            # Indexes from older versions: their keys count as stored at 0.
+            self._conn.execute("ALTER TABLE keys ADD COLUMN stored_at REAL NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self._blobs / content_hash[:2] / content_hash
+
+    def _namespace(self, key: str) -> str:
+        return key.split(":", 1)[0]
+
+    def _lookup(self, key: str) -> Path | None:
+        with self._lock:
+            return self._lookup_locked(key)
+
+    def _lookup_locked(self, key: str) -> Path | None:
+        row = self._conn.execute(
+            "SELECT hash, stored_at FROM keys WHERE key = ?",
+            (key,),
+        ).fetchone()
+        namespace = self._namespace(key)
+        if row is None:
+            self._stats[f"{namespace}_miss"] += 1
+            return None
+
+        if namespace == "raw" and self._raw_ttl_seconds and row[1] < time() - self._raw_ttl_seconds:
+            # The blob stays for branded keys; unreferenced blobs age out by LRU.
+            self._conn.execute("DELETE FROM keys WHERE key = ?", (key,))
+            self._conn.commit()
+            self._stats["raw_expired"] += 1
+            self._stats[f"{namespace}_miss"] += 1
+            return None
+
+        path = self._blob_path(row[0])
+        if not path.exists():
+            self._conn.execute("DELETE FROM keys WHERE hash = ?", (row[0],))
+            self._conn.execute("DELETE FROM blobs WHERE hash = ?", (row[0],))
+            self._conn.commit()
+            self._stats[f"{namespace}_miss"] += 1
+            return None
+
+        self._conn.execute(
+            "UPDATE blobs SET last_access = ? WHERE hash = ?",
+            (time(), row[0]),
+        )
+        self._conn.commit()
+        self._stats[f"{namespace}_hit"] += 1
+        return path
+
+    def _store(self, key: str, content_hash: str, size: int) -> None:
+        with self._lock:
+            now = time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs (hash, size, last_access) VALUES (?, ?, ?)",
+                (content_hash, size, now),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO keys (key, hash, stored_at) VALUES (?, ?, ?)",
+                (key, content_hash, now),
+            )
+            self._conn.commit()
+            self._evict(keep=content_hash)
+
+    def _write_atomic(self, content_hash: str, write) -> None:
+        target = self._blob_path(content_hash)
+        if target.exists():
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=target.parent, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(temp_path, target)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def _evict(self, keep: str) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT hash, size FROM blobs WHERE hash != ? ORDER BY last_access",
+            (keep,),
+        ).fetchall()
+        for content_hash, size in rows:
+            if total <= self._max_bytes:
+                break
+            self._blob_path(content_hash).unlink(missing_ok=True)
+            self._conn.execute("DELETE FROM keys WHERE hash = ?", (content_hash,))
+            self._conn.execute("DELETE FROM blobs WHERE hash = ?", (content_hash,))
+            total -= size
+            self._stats["evicted"] += 1
+        self._conn.commit()
+
+    def get_bytes(self, key: str) -> bytes | None:
+        path = self._lookup(key)
+        return path.read_bytes() if path else None
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        content_hash = hashlib.sha256(data).hexdigest()
+        self._write_atomic(content_hash, lambda f: f.write(data))
+        self._store(key, content_hash, len(data))
+        return content_hash
+
+    def get_file(self, key: str, suffix: str = "") -> str | None:
+        """
+        Returns a temp copy of the cached file. The caller owns and deletes it,
+        the cached blob itself is never handed out.
+        """
+        path = self._lookup(key)
+        if path is None:
+            return None
+
+        temp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        temp.close()
+        try:
+            # Hard link when possible (same filesystem), copy otherwise.
+            Path(temp.name).unlink()
+            os.link(path, temp.name)
+        except FileNotFoundError:
+            # Evicted by a concurrent put since the lookup.
+            return None
+        except OSError:
+            try:
+                shutil.copyfile(path, temp.name)
+            except FileNotFoundError:
+                Path(temp.name).unlink(missing_ok=True)
+                return None
+        return temp.name
+
+    async def get_file_async(self, key: str, suffix: str = "") -> str | None:
+        """`get_file` in a worker thread, for use on the event loop."""
+        return await asyncio.to_thread(self.get_file, key, suffix)
+
+    def put_file(self, key: str, source_path: str, content_hash: str | None = None) -> str:
+        """`content_hash` is the file's sha256 if the caller already has it."""
+        if content_hash is None:
+            with open(source_path, "rb") as f:
+                content_hash = hashlib.file_digest(f, "sha256").hexdigest()
+
+        def write(out) -> None:
+            with open(source_path, "rb") as src:
+                shutil.copyfileobj(src, out, length=1024 * 1024)
+
+        self._write_atomic(content_hash, write)
+        self._store(key, content_hash, Path(source_path).stat().st_size)
+        return content_hash
+
+    async def put_file_async(
+        self, key: str, source_path: str, content_hash: str | None = None
+    ) -> str:
+        """`put_file` (copy, rename and eviction) in a worker thread."""
+        return await asyncio.to_thread(self.put_file, key, source_path, content_hash)
+
+    def stats(self) -> dict[str, int]:
+        return dict(self._stats)
+
+    def format_stats(self) -> str:
+        s = self._stats
+        return (
+            f"raw hit={s['raw_hit']} miss={s['raw_miss']} "
+            f"branded hit={s['branded_hit']} miss={s['branded_miss']} "
+            f"raw_expired={s['raw_expired']} evicted={s['evicted']}"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+
 import httpx
 
 DEFAULT_USER_AGENT = (
@@ -8,11 +12,43 @@ DEFAULT_USER_AGENT = (
     "Chrome/122.0.0.0 Safari/537.36"
 )
 
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+class DownloadTooLargeError(ValueError):
+    pass
+
+
+def _content_type(resp: httpx.Response) -> str:
+    return resp.headers.get("content-type", "").split(";")[0].strip().lower()
+
+
+def _check_declared_size(resp: httpx.Response, url: str, max_bytes: int | None) -> None:
+    if max_bytes is None:
+        return
+    declared = resp.headers.get("content-length", "").strip()
+    if declared.isdigit() and int(declared) > max_bytes:
+        raise DownloadTooLargeError(
+            f"{url} declares {int(declared)} bytes, limit is {max_bytes} bytes"
+        )
+
+
+async def _read_capped(resp: httpx.Response, url: str, max_bytes: int | None) -> bytes:
+    chunks: list[bytes] = []
+    received = 0
+    async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+        received += len(chunk)
+        if max_bytes is not None and received > max_bytes:
+            raise DownloadTooLargeError(f"{url} exceeded {max_bytes} bytes while downloading")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
 
 async def download_bytes(
     url: str,
     timeout: float = 30.0,
     referer: str | None = None,
+    max_bytes: int | None = None,
 ) -> tuple[bytes, str]:
     headers = {
         "User-Agent": DEFAULT_USER_AGENT,
@@ -22,17 +58,19 @@ async def download_bytes(
         headers["Referer"] = referer
 
     async with httpx.AsyncClient(timeout=timeout, follow_redirects=True, headers=headers) as client:
-        resp = await client.get(url)
-        resp.raise_for_status()
+        async with client.stream("GET", url) as resp:
+            resp.raise_for_status()
+            _check_declared_size(resp, url, max_bytes)
+            content = await _read_capped(resp, url, max_bytes)
 
-    content_type = resp.headers.get("content-type", "").split(";")[0].strip().lower()
-    return resp.content, content_type
+    return content, _content_type(resp)
 
 
 async def download_image_bytes(
     url: str,
     referer: str | None = None,
     timeout: float = 30.0,
+    max_bytes: int | None = None,
 ) -> bytes:
     headers = {
         "User-Agent": DEFAULT_USER_AGENT,
@@ -42,11 +80,92 @@ async def download_image_bytes(
         headers["Referer"] = referer
 
     async with httpx.AsyncClient(timeout=timeout, follow_redirects=True, headers=headers) as client:
-        resp = await client.get(url)
-        resp.raise_for_status()
+        async with client.stream("GET", url) as resp:
+            resp.raise_for_status()
+
+            # Headers are checked before any byte of the body is read.
+            content_type = _content_type(resp)
+            if not content_type.startswith("image/"):
+                raise ValueError(f"URL did not return image content-type: {content_type}")
+            _check_declared_size(resp, url, max_bytes)
+
+            return await _read_capped(resp, url, max_bytes)
+
+
+@asynccontextmanager
+async def open_download(
+    url: str,
+    *,
+    referer: str | None = None,
+    timeout: float = 120.0,
+    max_bytes: int | None = None,
+    content_type_prefix: str = "video/",
+) -> AsyncIterator[tuple[str, AsyncIterator[bytes]]]:
+    """
+    Opens a streaming GET and yields `(content_type, chunks)`.
 
-    content_type = resp.headers.get("content-type", "").split(";")[0].strip().lower()
-    if not content_type.startswith("image/"):
-        raise ValueError(f"URL did not return image content-type: {content_type}")
+    Content-type and Content-Length are checked from the headers before the
+    body is read; `max_bytes` is also enforced while iterating `chunks`, for
+    servers that send no or a wrong length.
+    """
+    headers = {
+        "User-Agent": DEFAULT_USER_AGENT,
+        "Accept": "*/*",
+    }
+    if referer:
+        headers["Referer"] = referer
+
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True, headers=headers) as client:
+        async with client.stream("GET", url) as resp:
+            resp.raise_for_status()
+
+            content_type = _content_type(resp)
+            if not content_type.startswith(content_type_prefix):
+                raise ValueError(
+                    f"URL did not return {content_type_prefix} content-type: {content_type}"
+                )
+            _check_declared_size(resp, url, max_bytes)
+
+            async def chunks() -> AsyncIterator[bytes]:
+                received = 0
+                async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    received += len(chunk)
+                    if max_bytes is not None and received > max_bytes:
+                        raise DownloadTooLargeError(
+                            f"{url} exceeded {max_bytes} bytes while downloading"
+                        )
+                    yield chunk
+
+            yield content_type, chunks()
+
+
+async def download_to_file(
+    url: str,
+    path: str,
+    *,
+    referer: str | None = None,
+    timeout: float = 120.0,
+    max_bytes: int | None = None,
+    content_type_prefix: str = "video/",
+) -> str:
+    """
+    Streams the response body straight into `path` and returns its content-type.
+    On any error the partial file is removed.
+    """
+    target = Path(path)
+    try:
+        async with open_download(
+            url,
+            referer=referer,
+            timeout=timeout,
+            max_bytes=max_bytes,
+            content_type_prefix=content_type_prefix,
+        ) as (content_type, chunks):
+            with target.open("wb") as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
 
-    return resp.content
+    return content_type
@@ -1,16 +1,98 @@
 from __future__ import annotations
 
+import math
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
 from typing import Literal
 
 from PIL import Image, ImageDraw, ImageFont
 
+from ua_news_bot.media.jpeg_encoder import encode_jpeg_to_budget
+
 BASE_DIR = Path(__file__).resolve().parents[3]
 DEFAULT_FONT_PATH = (
     BASE_DIR / "data" / "assets" / "fonts" / "sf-pro-display" / "SFPRODISPLAYREGULAR.OTF"
 )
 
+TEXT_SHADOW_FILL = (0, 0, 0, 160)
+TEXT_FILL = (255, 255, 255, 215)
+TEXT_SHADOW_OFFSET = 2
+
+# Branding assets are cached by their final pixel size, which already buckets
+# image widths (e.g. every 1200-1216px photo gets the same 72px logo), so only
+# the paste and composite run per image.
+
+
+@lru_cache(maxsize=32)
+def _load_font(font_file: str, font_size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    try:
+        return ImageFont.truetype(font_file, font_size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=64)
+def _render_text_sprite(
+    watermark_text: str,
+    font_file: str,
+    font_size: int,
+) -> tuple[Image.Image, tuple[int, int]]:
+    """
+    Returns the text with its drop shadow on a transparent sprite, plus the
+    offset of the sprite relative to the text anchor.
+    """
+    font = _load_font(font_file, font_size)
+    left, top, right, bottom = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox(
+        (0, 0), watermark_text, font=font
+    )
+
+    sprite = Image.new(
+        "RGBA",
+        (right - left + TEXT_SHADOW_OFFSET, bottom - top + TEXT_SHADOW_OFFSET),
+        (0, 0, 0, 0),
+    )
+    draw = ImageDraw.Draw(sprite)
+    draw.text(
+        (-left + TEXT_SHADOW_OFFSET, -top + TEXT_SHADOW_OFFSET),
+        watermark_text,
+        font=font,
+        fill=TEXT_SHADOW_FILL,
+    )
+    draw.text((-left, -top), watermark_text, font=font, fill=TEXT_FILL)
+    return sprite, (left, top)
+
+
+@lru_cache(maxsize=32)
+def _load_scaled_logo(
+    logo_path: str,
+    mtime_ns: int,
+    logo_w: int,
+    logo_opacity: float,
+) -> Image.Image:
+    # mtime_ns is part of the cache key so a replaced logo file is picked up.
+    logo = Image.open(logo_path).convert("RGBA")
+
+    ratio = logo.height / logo.width
+    logo_h = int(logo_w * ratio)
+    logo = logo.resize((logo_w, logo_h), Image.LANCZOS)
+
+    alpha = logo.getchannel("A")
+    alpha = alpha.point([int(p * logo_opacity) for p in range(256)])
+    logo.putalpha(alpha)
+
+    # Same pixels the logo used to get when pasted with itself as mask onto a
+    # transparent full-frame layer, so the look does not change.
+    sprite = Image.new("RGBA", logo.size, (0, 0, 0, 0))
+    sprite.paste(logo, (0, 0), logo)
+    return sprite
+
+
+def clear_branding_cache() -> None:
+    _load_font.cache_clear()
+    _render_text_sprite.cache_clear()
+    _load_scaled_logo.cache_clear()
+
 
 def _get_position(
     img_w: int,
@@ -29,6 +111,50 @@ def _get_position(
     return mapping.get(position, (margin, margin))
 
 
+def _decode_downscaled(image: Image.Image, max_dimension: int) -> Image.Image:
+    """
+    Shrinks the image so its long side fits max_dimension, using only cheap steps:
+    JPEG draft mode (libjpeg decodes at 1/2, 1/4 or 1/8 scale directly) and an
+    integer `reduce()`. No fractional resample, so the result lands between
+    max_dimension / 2 and max_dimension.
+
+    Must be called before the image is loaded.
+    """
+    factor = math.ceil(max(image.size) / max_dimension)
+    if factor <= 1:
+        return image
+
+    # draft() picks the largest power-of-two scale <= width/requested (floored),
+    # so the request has to be floored as well or it falls back to full size.
+    image.draft(None, (image.width // factor, image.height // factor))
+
+    remaining = math.ceil(max(image.size) / max_dimension)
+    if remaining > 1:
+        # reduce() only supports a few modes; palette, 1-bit and 16-bit images
+        # (common for PNG / GIF thumbnails) are converted first.
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGB")
+        image = image.reduce(remaining)
+    return image
+
+
+def _composite_region(image: Image.Image, sprite: Image.Image, xy: tuple[int, int]) -> None:
+    """
+    Blends an RGBA sprite onto an RGB image in place.
+    Only the sprite's bounding box (clipped to the image) is converted and blended.
+    """
+    x, y = xy
+    left, top = max(0, x), max(0, y)
+    right = min(image.width, x + sprite.width)
+    bottom = min(image.height, y + sprite.height)
+    if right <= left or bottom <= top:
+        return
+
+    region = image.crop((left, top, right, bottom)).convert("RGBA")
+    region.alpha_composite(sprite.crop((left - x, top - y, right - x, bottom - y)))
+    image.paste(region.convert("RGB"), (left, top))
+
+
 def add_branding_to_image(
     image_bytes: bytes,
     watermark_text: str,
@@ -40,22 +166,23 @@ def add_branding_to_image(
     logo_scale: float = 0.06,
     text_scale: float = 0.022,
     margin: int = 32,
+    max_dimension: int | None = None,
+    max_bytes: int | None = None,
+    min_ssim: float | None = 0.95,
+    progressive: bool = True,
 ) -> BytesIO:
-    image = Image.open(BytesIO(image_bytes)).convert("RGBA")
-    layer = Image.new("RGBA", image.size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(layer)
+    image = Image.open(BytesIO(image_bytes))
+    if max_dimension:
+        image = _decode_downscaled(image, max_dimension)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
 
     font_file = Path(font_path) if font_path else DEFAULT_FONT_PATH
 
     font_size = max(18, int(image.width * text_scale))
-    try:
-        font = ImageFont.truetype(str(font_file), font_size)
-    except OSError:
-        font = ImageFont.load_default()
-
-    text_bbox = draw.textbbox((0, 0), watermark_text, font=font)
-    text_w = text_bbox[2] - text_bbox[0]
-    text_h = text_bbox[3] - text_bbox[1]
+    text_sprite, (text_dx, text_dy) = _render_text_sprite(watermark_text, str(font_file), font_size)
+    text_w = text_sprite.width - TEXT_SHADOW_OFFSET
+    text_h = text_sprite.height - TEXT_SHADOW_OFFSET
 
     text_xy = _get_position(
         image.width,
@@ -65,54 +192,42 @@ def add_branding_to_image(
         margin,
         text_position,
     )
-
-    shadow_fill = (0, 0, 0, 160)
-    text_fill = (255, 255, 255, 215)
-    shadow_offset = 2
-
-    draw.text(
-        (text_xy[0] + shadow_offset, text_xy[1] + shadow_offset),
-        watermark_text,
-        font=font,
-        fill=shadow_fill,
-    )
-    draw.text(
-        text_xy,
-        watermark_text,
-        font=font,
-        fill=text_fill,
-    )
+    _composite_region(image, text_sprite, (text_xy[0] + text_dx, text_xy[1] + text_dy))
 
     logo_file = Path(logo_path)
     if logo_file.exists():
         try:
-            logo = Image.open(logo_file).convert("RGBA")
-
             logo_w = max(40, int(image.width * logo_scale))
-            ratio = logo.height / logo.width
-            logo_h = int(logo_w * ratio)
-            logo = logo.resize((logo_w, logo_h), Image.LANCZOS)
-
-            alpha = logo.getchannel("A")
-            alpha = alpha.point(lambda p: int(p * logo_opacity))
-            logo.putalpha(alpha)
+            logo = _load_scaled_logo(
+                str(logo_file),
+                logo_file.stat().st_mtime_ns,
+                logo_w,
+                logo_opacity,
+            )
 
             logo_xy = _get_position(
                 image.width,
                 image.height,
-                logo_w,
-                logo_h,
+                logo.width,
+                logo.height,
                 margin,
                 logo_position,
             )
 
-            layer.paste(logo, logo_xy, logo)
+            _composite_region(image, logo, logo_xy)
         except Exception as e:
             print(f"[IMG] logo overlay failed: {e}")
 
-    combined = Image.alpha_composite(image, layer)
+    if max_bytes:
+        encoded = encode_jpeg_to_budget(
+            image,
+            max_bytes=max_bytes,
+            min_ssim=min_ssim,
+            progressive=progressive,
+        )
+        return BytesIO(encoded.data)
 
     output = BytesIO()
-    combined.convert("RGB").save(output, format="JPEG", quality=95)
+    image.save(output, format="JPEG", quality=95)
     output.seek(0)
     return output
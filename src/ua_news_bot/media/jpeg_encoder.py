@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image, ImageMath
+
+_SSIM_C1 = (0.01 * 255) ** 2
+_SSIM_C2 = (0.03 * 255) ** 2
+
+
+@dataclass(frozen=True)
+class EncodedJpeg:
+    data: bytes
+    quality: int
+    ssim: float | None
+    attempts: int
+
+
+def _encode(image: Image.Image, quality: int, progressive: bool) -> bytes:
+    output = BytesIO()
+    image.save(
+        output,
+        format="JPEG",
+        quality=quality,
+        optimize=progressive,
+        progressive=progressive,
+    )
+    return output.getvalue()
+
+
+def block_ssim(reference: Image.Image, candidate: Image.Image, block: int = 8) -> float:
+    """
+    Mean SSIM of the luminance over non-overlapping `block` x `block` windows.
+
+    Window statistics come from `reduce()` on float images, so this runs inside
+    Pillow without NumPy.
+    """
+    x = reference.convert("L").convert("F")
+    y = candidate.convert("L").convert("F")
+
+    xx = ImageMath.lambda_eval(lambda a: a["x"] * a["x"], x=x)
+    yy = ImageMath.lambda_eval(lambda a: a["y"] * a["y"], y=y)
+    xy = ImageMath.lambda_eval(lambda a: a["x"] * a["y"], x=x, y=y)
+
+    ssim_map = ImageMath.lambda_eval(
+        lambda a: (
+            ((a["mx"] * a["my"] * 2 + _SSIM_C1) * ((a["mxy"] - a["mx"] * a["my"]) * 2 + _SSIM_C2))
+            / (
+                (a["mx"] * a["mx"] + a["my"] * a["my"] + _SSIM_C1)
+                * (a["mxx"] - a["mx"] * a["mx"] + a["myy"] - a["my"] * a["my"] + _SSIM_C2)
+            )
+        ),
+        mx=x.reduce(block),
+        my=y.reduce(block),
+        mxx=xx.reduce(block),
+        myy=yy.reduce(block),
+        mxy=xy.reduce(block),
+    )
+    # ImageStat is histogram based and clips "F" images, so average directly.
+    # The map is 1/block^2 of the image size.
+    values = array("f", ssim_map.tobytes())
+    return sum(values) / len(values)
+
+
+def encode_jpeg_to_budget(
+    image: Image.Image,
+    *,
+    max_bytes: int,
+    min_quality: int = 60,
+    max_quality: int = 95,
+    min_ssim: float | None = 0.95,
+    progressive: bool = True,
+) -> EncodedJpeg:
+    """
+    Encodes an RGB image as JPEG with the highest quality that fits `max_bytes`.
+
+    - Early exit: if `max_quality` already fits, it is used as is.
+    - Otherwise binary search over quality; stops once the fitting candidate is
+      within 5% of the budget.
+    - SSIM floor: if the fitting quality drops below `min_ssim`, quality is raised
+      again to the lowest level that keeps the floor. The floor wins over the
+      budget, so the result may be larger than `max_bytes`.
+    """
+    attempts = 1
+    data = _encode(image, max_quality, progressive)
+    if len(data) <= max_bytes:
+        return EncodedJpeg(data=data, quality=max_quality, ssim=None, attempts=attempts)
+
+    best_quality = min_quality
+    best_data: bytes | None = None
+    lo, hi = min_quality, max_quality - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        candidate = _encode(image, mid, progressive)
+        attempts += 1
+        if len(candidate) <= max_bytes:
+            best_quality, best_data = mid, candidate
+            if len(candidate) >= max_bytes * 0.95:
+                break
+            lo = mid + 1
+        else:
+            hi = mid - 1
+
+    if best_data is None:
+        best_data = _encode(image, min_quality, progressive)
+        attempts += 1
+
+    if min_ssim is None:
+        return EncodedJpeg(data=best_data, quality=best_quality, ssim=None, attempts=attempts)
+
+    ssim = block_ssim(image, Image.open(BytesIO(best_data)))
+    if ssim >= min_ssim:
+        return EncodedJpeg(data=best_data, quality=best_quality, ssim=ssim, attempts=attempts)
+
+    # Lowest quality above the budget pick that still keeps the SSIM floor.
+    floor_quality, floor_data, floor_ssim = max_quality, data, None
+    lo, hi = best_quality + 1, max_quality - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        candidate = _encode(image, mid, progressive)
+        attempts += 1
+        candidate_ssim = block_ssim(image, Image.open(BytesIO(candidate)))
+        if candidate_ssim >= min_ssim:
+            floor_quality, floor_data, floor_ssim = mid, candidate, candidate_ssim
+            hi = mid - 1
+        else:
+            lo = mid + 1
+
+    return EncodedJpeg(
+        data=floor_data,
+        quality=floor_quality,
+        ssim=floor_ssim,
+        attempts=attempts,
+    )
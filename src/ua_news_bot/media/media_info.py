@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+PROBE_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    duration: float | None
+    # Display size: ffmpeg autorotates, so it is swapped for 90/270 degree clips.
+    width: int | None
+    height: int | None
+    video_codec: str | None
+    audio_codec: str | None
+    bit_rate: int | None
+    rotation: int = 0
+
+    @property
+    def has_video(self) -> bool:
+        return self.video_codec is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio_codec is not None
+
+    @property
+    def is_usable(self) -> bool:
+        return self.has_video and bool(self.width) and bool(self.height)
+
+
+_probe_cache: OrderedDict[tuple[str, int, int], MediaInfo] = OrderedDict()
+
+
+def _to_int(value: Any) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value: Any) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rotation(stream: dict[str, Any]) -> int:
+    """Rotation in degrees from the display matrix side data or the legacy rotate tag."""
+    for side_data in stream.get("side_data_list") or []:
+        rotation = _to_float(side_data.get("rotation"))
+        if rotation is not None:
+            return int(round(rotation)) % 360
+    rotation = _to_float((stream.get("tags") or {}).get("rotate"))
+    return int(round(rotation)) % 360 if rotation is not None else 0
+
+
+def parse_ffprobe_json(data: dict[str, Any]) -> MediaInfo:
+    streams = data.get("streams") or []
+    fmt = data.get("format") or {}
+
+    # Cover art is reported as a video stream with the attached_pic disposition.
+    video = next(
+        (
+            s
+            for s in streams
+            if s.get("codec_type") == "video"
+            and not (s.get("disposition") or {}).get("attached_pic")
+        ),
+        None,
+    )
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    duration = _to_float(fmt.get("duration"))
+    if duration is None and video is not None:
+        duration = _to_float(video.get("duration"))
+
+    width = _to_int(video.get("width")) if video else None
+    height = _to_int(video.get("height")) if video else None
+    rotation = _rotation(video) if video else 0
+    if rotation in (90, 270):
+        width, height = height, width
+
+    return MediaInfo(
+        duration=duration,
+        width=width,
+        height=height,
+        video_codec=video.get("codec_name") if video else None,
+        audio_codec=audio.get("codec_name") if audio else None,
+        bit_rate=_to_int(fmt.get("bit_rate")),
+        rotation=rotation,
+    )
+
+
+async def _run_ffprobe(path: str, ffprobe_bin: str) -> MediaInfo:
+    process = await asyncio.create_subprocess_exec(
+        ffprobe_bin,
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration,bit_rate:"
+        "stream=codec_type,codec_name,width,height,duration:stream_tags=rotate:"
+        "stream_side_data=rotation:stream_disposition=attached_pic",
+        "-of",
+        "json",
+        path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe error:\n{stderr.decode()}")
+
+    try:
+        data = json.loads(stdout.decode() or "{}")
+    except ValueError as e:
+        raise RuntimeError(f"ffprobe returned invalid JSON: {e}") from e
+    return parse_ffprobe_json(data)
+
+
+async def probe_media(path: str, ffprobe_bin: str = "ffprobe") -> MediaInfo:
+    """
+    One JSON ffprobe call, cached in memory by (path, size, mtime), so a file
+    is probed once per process (before branding, before sending, for several
+    channels). ffprobe only reads the headers, so the key must not cost more
+    than that: the file is not hashed.
+    """
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+
+    cached = _probe_cache.get(key)
+    if cached is not None:
+        _probe_cache.move_to_end(key)
+        return cached
+
+    info = await _run_ffprobe(path, ffprobe_bin)
+    _probe_cache[key] = info
+    if len(_probe_cache) > PROBE_CACHE_SIZE:
+        _probe_cache.popitem(last=False)
+    return info
+
+
+def clear_probe_cache() -> None:
+    _probe_cache.clear()
@@ -1,15 +1,46 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import os
+import shutil
 import tempfile
+from collections.abc import AsyncIterable
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Literal
 
+from PIL import Image, ImageDraw, ImageFont
+
+from ua_news_bot.media.media_info import MediaInfo, probe_media
+from ua_news_bot.media.video_jobs import ProcessControls, run_ffmpeg_process
+
 BASE_DIR = Path(__file__).resolve().parents[3]
 DEFAULT_FONT_PATH = (
     BASE_DIR / "data" / "assets" / "fonts" / "sf-pro-display" / "SFPRODISPLAYREGULAR.OTF"
 )
 
+# Share of the size budget the encoder aims for; the rest absorbs mp4 overhead
+# and rate-control overshoot.
+SIZE_BUDGET_FILL = 0.94
+AUDIO_KBPS = 128
+LOW_AUDIO_KBPS = 64
+MIN_VIDEO_KBPS = 200
+# Shorter pieces are not worth an extra ffmpeg process.
+MIN_SEGMENT_SECONDS = 15
+# Telegram clients do not play more than this inline anyway.
+MAX_OUTPUT_HEIGHT = 1080
+# (minimum video kbps, max output height)
+_HEIGHT_LADDER = ((2500, MAX_OUTPUT_HEIGHT), (1200, 720), (700, 540), (0, 360))
+
+# Rendered watermark layers, one PNG per resolution and branding settings.
+OVERLAY_CACHE_DIR = Path(tempfile.gettempdir()) / "smart_news_overlays"
+# Same look as the former drawtext box: black@0.30, boxborderw=6.
+OVERLAY_BOX_FILL = (0, 0, 0, 77)
+OVERLAY_BOX_BORDER = 6
+OVERLAY_LOGO_INSET = 20
+
 
 def _escape_drawtext_text(s: str) -> str:
     if not s:
@@ -29,54 +60,224 @@ def _get_logo_position(
     return mapping.get(position, "x=20:y=20")
 
 
-async def _has_audio(video_path: str, ffprobe_bin: str) -> bool:
-    process = await asyncio.create_subprocess_exec(
-        ffprobe_bin,
-        "-i",
-        video_path,
-        "-show_streams",
-        "-select_streams",
-        "a",
-        "-loglevel",
-        "error",
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+@dataclass(frozen=True)
+class Overlay:
+    """Pre-rendered watermark cropped to its content, placed at (x, y) on the frame."""
+
+    path: Path
+    x: int
+    y: int
+
+
+@lru_cache(maxsize=16)
+def _overlay_font(font_file: str, font_size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    try:
+        return ImageFont.truetype(font_file, font_size)
+    except OSError:
+        return ImageFont.load_default(font_size)
+
+
+def _render_overlay_layer(
+    width: int,
+    height: int,
+    watermark_text: str,
+    logo_file: Path,
+    font_file: Path,
+    logo_position: Literal["top-left", "top-right", "bottom-left", "bottom-right"],
+    logo_opacity: float,
+    logo_scale: float,
+    text_scale: float,
+    margin: int,
+) -> Image.Image:
+    layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+
+    # Logo: scale=iw*logo_scale:-1 and colorchannelmixer=aa=logo_opacity.
+    logo = Image.open(logo_file).convert("RGBA")
+    logo_w = max(1, int(logo.width * logo_scale))
+    logo_h = max(1, round(logo.height * logo_w / logo.width))
+    logo = logo.resize((logo_w, logo_h), Image.LANCZOS)
+    logo.putalpha(logo.getchannel("A").point([int(p * logo_opacity) for p in range(256)]))
+
+    inset = OVERLAY_LOGO_INSET
+    positions = {
+        "top-left": (inset, inset),
+        "top-right": (width - logo_w - inset, inset),
+        "bottom-left": (inset, height - logo_h - inset),
+        "bottom-right": (width - logo_w - inset, height - logo_h - inset),
+    }
+    layer.alpha_composite(logo, positions.get(logo_position, (inset, inset)))
+
+    if watermark_text:
+        # drawtext: fontsize=w*text_scale at x=w-tw-margin, y=h-th-margin, with a box.
+        font = _overlay_font(str(font_file), max(1, int(width * text_scale)))
+        left, top, right, bottom = ImageDraw.Draw(layer).textbbox((0, 0), watermark_text, font=font)
+        x = width - (right - left) - margin
+        y = height - (bottom - top) - margin
+
+        box = Image.new("RGBA", layer.size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(box)
+        border = OVERLAY_BOX_BORDER
+        draw.rectangle(
+            (x - border, y - border, x + right - left + border, y + bottom - top + border),
+            fill=OVERLAY_BOX_FILL,
+        )
+        draw.text((x - left, y - top), watermark_text, font=font, fill=(255, 255, 255, 255))
+        layer.alpha_composite(box)
+
+    return layer
+
+
+def render_overlay(
+    width: int,
+    height: int,
+    watermark_text: str,
+    logo_file: Path,
+    font_file: Path,
+    logo_position: Literal["top-left", "top-right", "bottom-left", "bottom-right"],
+    logo_opacity: float,
+    logo_scale: float,
+    text_scale: float,
+    margin: int,
+    cache_dir: Path = OVERLAY_CACHE_DIR,
+) -> Overlay:
+    """
+    Renders the whole watermark (scaled, faded logo plus text on its box) for a
+    `width`x`height` frame once, so ffmpeg only needs one static overlay instead
+    of scaling the logo and rendering drawtext on every frame.
+
+    The PNG is cropped to the visible pixels and cached on disk by resolution
+    and settings; a replaced logo file (new mtime/size) gets a new entry.
+    """
+    logo_stat = logo_file.stat()
+    digest = hashlib.sha256(
+        repr(
+            (
+                width,
+                height,
+                watermark_text,
+                str(logo_file),
+                logo_stat.st_mtime_ns,
+                logo_stat.st_size,
+                str(font_file),
+                logo_position,
+                logo_opacity,
+                logo_scale,
+                text_scale,
+                margin,
+            )
+        ).encode()
+    ).hexdigest()[:32]
+    path = cache_dir / f"{digest}.png"
+    meta = cache_dir / f"{digest}.xy"
+
+    if path.exists() and meta.exists():
+        x, _, y = meta.read_text().partition(",")
+        return Overlay(path=path, x=int(x), y=int(y))
+
+    layer = _render_overlay_layer(
+        width,
+        height,
+        watermark_text,
+        logo_file,
+        font_file,
+        logo_position,
+        logo_opacity,
+        logo_scale,
+        text_scale,
+        margin,
     )
-    stdout, _ = await process.communicate()
-    return bool(stdout.decode().strip())
+    bbox = layer.getbbox() or (0, 0, 1, 1)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Written under temp names and renamed, so concurrent jobs never read a partial PNG.
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp.png")
+    layer.crop(bbox).save(tmp_path, optimize=False)
+    tmp_meta = meta.with_suffix(f".{os.getpid()}.tmp")
+    tmp_meta.write_text(f"{bbox[0]},{bbox[1]}")
+    os.replace(tmp_path, path)
+    os.replace(tmp_meta, meta)
+    return Overlay(path=path, x=bbox[0], y=bbox[1])
+
+
+def _overlay_filter(overlay: Overlay) -> str:
+    return f"[0:v][1:v]overlay=x={overlay.x}:y={overlay.y}[v]"
+
+
+@dataclass(frozen=True)
+class EncodePlan:
+    # None means constant quality (-crf 23), used when there is no size budget.
+    video_kbps: int | None
+    audio_kbps: int
+    max_height: int | None
+
+
+CRF_PLAN = EncodePlan(video_kbps=None, audio_kbps=AUDIO_KBPS, max_height=None)
+
+
+def plan_encode(
+    duration: float | None,
+    has_audio: bool,
+    max_bytes: int | None,
+    source_height: int | None = None,
+) -> EncodePlan:
+    """
+    Picks bitrates so that `duration` seconds fit into `max_bytes`.
+
+    A share of the budget is left for mp4 overhead and rate-control overshoot.
+    Audio drops to 64k when the budget is tight, and the output height is capped
+    to what the video bitrate can carry without heavy blocking. Sources above
+    MAX_OUTPUT_HEIGHT are always scaled down; no scale filter is added when the
+    source is already small enough.
+    """
+    max_height: int | None = MAX_OUTPUT_HEIGHT
+    if not max_bytes or not duration or duration <= 0:
+        if source_height is None or source_height <= MAX_OUTPUT_HEIGHT:
+            return CRF_PLAN
+        return EncodePlan(video_kbps=None, audio_kbps=AUDIO_KBPS, max_height=max_height)
+
+    total_kbps = max_bytes * SIZE_BUDGET_FILL * 8 / duration / 1000
+    audio_kbps = AUDIO_KBPS if has_audio else 0
+    if has_audio and total_kbps - audio_kbps < 2 * MIN_VIDEO_KBPS:
+        audio_kbps = LOW_AUDIO_KBPS
 
+    video_kbps = max(MIN_VIDEO_KBPS, int(total_kbps - audio_kbps))
+    max_height = next(height for min_kbps, height in _HEIGHT_LADDER if video_kbps >= min_kbps)
+    if source_height is not None and source_height <= max_height:
+        max_height = None
+    return EncodePlan(video_kbps=video_kbps, audio_kbps=audio_kbps, max_height=max_height)
 
-async def _run_ffmpeg(command: list[str], timeout: int = 300) -> None:
-    process = await asyncio.create_subprocess_exec(
-        *command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+
+async def _run_ffmpeg(
+    command: list[str],
+    timeout: float = 300,
+    *,
+    duration: float | None = None,
+    label: str = "ffmpeg",
+    controls: ProcessControls | None = None,
+) -> None:
+    await run_ffmpeg_process(
+        command,
+        timeout=timeout,
+        duration=duration,
+        label=label,
+        controls=controls,
     )
-    _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
-    if process.returncode != 0:
-        raise RuntimeError(f"FFmpeg error:\n{stderr.decode()}")
 
 
-async def add_branding_to_video_file(
-    input_video_path: str,
-    watermark_text: str,
-    logo_path: str,
-    font_path: str | None = None,
-    logo_position: Literal["top-left", "top-right", "bottom-left", "bottom-right"] = "top-left",
-    logo_opacity: float = 0.9,
-    logo_scale: float = 0.06,
-    text_scale: float = 0.022,
-    margin: int = 32,
-    ffmpeg_bin: str = "ffmpeg",
-    ffprobe_bin: str = "ffprobe",
-) -> str:
-    logo_file = Path(logo_path)
-    if not logo_file.exists():
-        raise FileNotFoundError(f"Logo not found: {logo_file}")
+def _encode_timeout(duration: float | None) -> float:
+    # Stalls are caught separately; this only bounds very slow encodes.
+    return 300.0 if not duration else max(300.0, duration * 4)
 
-    font_file = Path(font_path) if font_path else DEFAULT_FONT_PATH
-    temp_output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
 
+def _branding_filter(
+    watermark_text: str,
+    font_file: Path,
+    logo_position: Literal["top-left", "top-right", "bottom-left", "bottom-right"],
+    logo_opacity: float,
+    logo_scale: float,
+    text_scale: float,
+    margin: int,
+) -> str:
     text = _escape_drawtext_text(watermark_text)
     logo_xy = _get_logo_position(logo_position)
 
@@ -103,7 +304,58 @@ async def add_branding_to_video_file(
     else:
         filter_complex += "[v]"
 
-    has_audio = await _has_audio(input_video_path, ffprobe_bin)
+    return filter_complex
+
+
+def _video_args(plan: EncodePlan, two_pass: bool) -> list[str]:
+    if plan.video_kbps is None:
+        return ["-c:v", "libx264", "-crf", "23", "-preset", "veryfast"]
+
+    if two_pass:
+        # ABR: the analysis pass lets x264 hit the average closely.
+        rate_args = [
+            "-b:v",
+            f"{plan.video_kbps}k",
+            "-maxrate",
+            f"{int(plan.video_kbps * 1.5)}k",
+        ]
+    else:
+        # Capped CRF: constant quality while it fits, the VBV cap keeps the
+        # average at or below the budget rate. Short clips stay small.
+        rate_args = ["-crf", "23", "-maxrate", f"{plan.video_kbps}k"]
+
+    return [
+        "-c:v",
+        "libx264",
+        *rate_args,
+        "-bufsize",
+        f"{plan.video_kbps * 2}k",
+        "-preset",
+        "veryfast",
+    ]
+
+
+def _branding_command(
+    *,
+    ffmpeg_bin: str,
+    input_arg: str,
+    logo_file: Path,
+    filter_complex: str,
+    has_audio: bool | None,
+    output_path: str,
+    plan: EncodePlan = CRF_PLAN,
+    pass_args: list[str] | None = None,
+    threads: int | None = None,
+) -> list[str]:
+    """
+    `has_audio=None` maps the audio stream optionally (`0:a?`), so ffmpeg decides
+    from its own probe of the input; used when there is no file for ffprobe.
+    `pass_args` are the two-pass flags; the first pass writes no audio and no file.
+    """
+    video_label = "[v]"
+    if plan.max_height:
+        filter_complex += f";[v]scale=w=-2:h='min(ih,{plan.max_height})'[vout]"
+        video_label = "[vout]"
 
     command = [
         ffmpeg_bin,
@@ -112,38 +364,346 @@ async def add_branding_to_video_file(
         "error",
         "-y",
         "-i",
-        input_video_path,
+        input_arg,
         "-i",
         str(logo_file),
         "-filter_complex",
         filter_complex,
         "-map",
-        "[v]",
+        video_label,
     ]
 
-    if has_audio:
-        command += ["-map", "0:a", "-c:a", "aac", "-b:a", "128k"]
-    else:
+    first_pass = bool(pass_args) and pass_args[1] == "1"
+    audio_args = ["-c:a", "aac", "-b:a", f"{plan.audio_kbps}k"]
+    if first_pass or has_audio is False:
         command += ["-an"]
+    elif has_audio is None:
+        command += ["-map", "0:a?", *audio_args]
+    else:
+        command += ["-map", "0:a", *audio_args]
 
-    command += [
-        "-c:v",
-        "libx264",
-        "-crf",
-        "23",
-        "-preset",
-        "veryfast",
-        "-pix_fmt",
-        "yuv420p",
-        "-movflags",
-        "+faststart",
-        temp_output_path,
-    ]
+    command += _video_args(plan, two_pass=bool(pass_args))
+    command += pass_args or []
+    if threads:
+        command += ["-threads", str(threads)]
+    command += ["-pix_fmt", "yuv420p"]
+
+    if first_pass:
+        command += ["-f", "mp4", os.devnull]
+    else:
+        command += ["-movflags", "+faststart", output_path]
+    return command
 
-    await _run_ffmpeg(command)
 
-    output_path = Path(temp_output_path)
-    if not output_path.exists() or output_path.stat().st_size < 5000:
+def _check_output(output_path: str) -> None:
+    path = Path(output_path)
+    if not path.exists() or path.stat().st_size < 5000:
         raise RuntimeError("FFmpeg produced invalid output video")
 
+
+def segment_count(duration: float | None, requested: int) -> int:
+    """Number of parallel segments actually used: short clips are not split."""
+    if requested <= 1 or not duration:
+        return 1
+    return max(1, min(requested, int(duration // MIN_SEGMENT_SECONDS)))
+
+
+async def _brand_segmented(
+    *,
+    ffmpeg_bin: str,
+    input_video_path: str,
+    logo_file: Path,
+    filter_complex: str,
+    info: MediaInfo,
+    plan: EncodePlan,
+    segments: int,
+    output_path: str,
+    controls: ProcessControls | None = None,
+) -> None:
+    """
+    Splits the video stream at keyframes (stream copy), brands the pieces in
+    parallel ffmpeg processes and joins them with the concat demuxer without
+    re-encoding. Audio is encoded once from the original input while muxing,
+    so there are no AAC priming gaps at the joins. The per-second bitrate cap
+    of `plan` applies to every piece, so the joined file keeps the same budget.
+    """
+    work_dir = Path(tempfile.mkdtemp(prefix="smart_news_segments_"))
+    try:
+        await _run_ffmpeg(
+            [
+                ffmpeg_bin,
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-y",
+                "-i",
+                input_video_path,
+                "-map",
+                "0:v:0",
+                "-c",
+                "copy",
+                "-f",
+                "segment",
+                "-segment_time",
+                f"{info.duration / segments:.3f}",
+                "-reset_timestamps",
+                "1",
+                str(work_dir / "src%03d.mp4"),
+            ],
+            _encode_timeout(info.duration),
+            label="split",
+            controls=controls,
+        )
+        sources = sorted(work_dir.glob("src*.mp4"))
+        if not sources:
+            raise RuntimeError("FFmpeg produced no segments")
+
+        outputs = [work_dir / f"out{idx:03d}.mp4" for idx in range(len(sources))]
+        threads = max(1, (os.cpu_count() or 1) // len(sources))
+        piece_duration = info.duration / len(sources)
+        # A TaskGroup cancels (and so kills) the other workers as soon as one fails.
+        try:
+            async with asyncio.TaskGroup() as group:
+                for idx, (source, output) in enumerate(zip(sources, outputs, strict=True)):
+                    command = _branding_command(
+                        ffmpeg_bin=ffmpeg_bin,
+                        input_arg=str(source),
+                        logo_file=logo_file,
+                        filter_complex=filter_complex,
+                        has_audio=False,
+                        output_path=str(output),
+                        plan=plan,
+                        threads=threads,
+                    )
+                    group.create_task(
+                        _run_ffmpeg(
+                            command,
+                            _encode_timeout(piece_duration),
+                            duration=piece_duration,
+                            label=f"segment {idx + 1}/{len(sources)}",
+                            controls=controls,
+                        )
+                    )
+        except ExceptionGroup as eg:
+            raise eg.exceptions[0] from eg
+
+        concat_list = work_dir / "concat.txt"
+        concat_list.write_text("".join(f"file '{output.name}'\n" for output in outputs))
+
+        command = [
+            ffmpeg_bin,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            str(concat_list),
+        ]
+        if info.has_audio:
+            command += [
+                "-i",
+                input_video_path,
+                "-map",
+                "0:v",
+                "-map",
+                "1:a:0",
+                "-c:a",
+                "aac",
+                "-b:a",
+                f"{plan.audio_kbps}k",
+            ]
+        command += ["-c:v", "copy", "-movflags", "+faststart", output_path]
+        await _run_ffmpeg(
+            command,
+            _encode_timeout(info.duration),
+            duration=info.duration,
+            label="concat",
+            controls=controls,
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def add_branding_to_video_file(
+    input_video_path: str,
+    watermark_text: str,
+    logo_path: str,
+    font_path: str | None = None,
+    logo_position: Literal["top-left", "top-right", "bottom-left", "bottom-right"] = "top-left",
+    logo_opacity: float = 0.9,
+    logo_scale: float = 0.06,
+    text_scale: float = 0.022,
+    margin: int = 32,
+    ffmpeg_bin: str = "ffmpeg",
+    ffprobe_bin: str = "ffprobe",
+    max_bytes: int | None = None,
+    two_pass: bool = False,
+    media_info: MediaInfo | None = None,
+    segments: int = 1,
+    controls: ProcessControls | None = None,
+) -> str:
+    """
+    Brands a video file and returns the path of a new temp mp4.
+
+    With `max_bytes` the bitrate is capped to a rate computed from the probed
+    duration (see `plan_encode`), so the output fits the upload limit on the
+    first try. `two_pass` switches to a two-pass average bitrate encode for a
+    closer hit on the budget at about twice the encode time.
+    `media_info` skips the probe when the caller has already run one.
+    `segments` > 1 encodes clips of at least MIN_SEGMENT_SECONDS per segment in
+    parallel (see `_brand_segmented`); two-pass does not apply in that mode.
+    `controls` sets nice/CPU affinity and the stall timeout of every ffmpeg run;
+    on failure or cancellation the processes are killed and temp files removed.
+    The watermark is pre-rendered for the input resolution (see `render_overlay`).
+    """
+    logo_file = Path(logo_path)
+    if not logo_file.exists():
+        raise FileNotFoundError(f"Logo not found: {logo_file}")
+
+    font_file = Path(font_path) if font_path else DEFAULT_FONT_PATH
+
+    info = media_info or await probe_media(input_video_path, ffprobe_bin)
+    if not info.is_usable:
+        raise ValueError(f"Input has no usable video stream: {info}")
+    plan = plan_encode(info.duration, info.has_audio, max_bytes, info.height)
+
+    # The resolution is known here, so the watermark is one pre-rendered layer.
+    overlay = await asyncio.to_thread(
+        render_overlay,
+        info.width,
+        info.height,
+        watermark_text,
+        logo_file,
+        font_file,
+        logo_position,
+        logo_opacity,
+        logo_scale,
+        text_scale,
+        margin,
+    )
+    logo_file = overlay.path
+    filter_complex = _overlay_filter(overlay)
+    temp_output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
+
+    command_kwargs = {
+        "ffmpeg_bin": ffmpeg_bin,
+        "input_arg": input_video_path,
+        "logo_file": logo_file,
+        "filter_complex": filter_complex,
+        "has_audio": info.has_audio,
+        "output_path": temp_output_path,
+        "plan": plan,
+    }
+
+    run_kwargs = {
+        "timeout": _encode_timeout(info.duration),
+        "duration": info.duration,
+        "controls": controls,
+    }
+
+    try:
+        parallel_segments = segment_count(info.duration, segments)
+        if parallel_segments > 1:
+            await _brand_segmented(
+                ffmpeg_bin=ffmpeg_bin,
+                input_video_path=input_video_path,
+                logo_file=logo_file,
+                filter_complex=filter_complex,
+                info=info,
+                plan=plan,
+                segments=parallel_segments,
+                output_path=temp_output_path,
+                controls=controls,
+            )
+        elif two_pass and plan.video_kbps is not None:
+            passlog_dir = tempfile.mkdtemp(prefix="smart_news_x264_")
+            passlog = str(Path(passlog_dir) / "pass")
+            try:
+                await _run_ffmpeg(
+                    _branding_command(
+                        **command_kwargs, pass_args=["-pass", "1", "-passlogfile", passlog]
+                    ),
+                    label="pass 1/2",
+                    **run_kwargs,
+                )
+                await _run_ffmpeg(
+                    _branding_command(
+                        **command_kwargs, pass_args=["-pass", "2", "-passlogfile", passlog]
+                    ),
+                    label="pass 2/2",
+                    **run_kwargs,
+                )
+            finally:
+                shutil.rmtree(passlog_dir, ignore_errors=True)
+        else:
+            await _run_ffmpeg(_branding_command(**command_kwargs), label="branding", **run_kwargs)
+
+        _check_output(temp_output_path)
+    except BaseException:
+        Path(temp_output_path).unlink(missing_ok=True)
+        raise
+
+    return temp_output_path
+
+
+async def add_branding_to_video_stream(
+    chunks: AsyncIterable[bytes],
+    watermark_text: str,
+    logo_path: str,
+    font_path: str | None = None,
+    logo_position: Literal["top-left", "top-right", "bottom-left", "bottom-right"] = "top-left",
+    logo_opacity: float = 0.9,
+    logo_scale: float = 0.06,
+    text_scale: float = 0.022,
+    margin: int = 32,
+    ffmpeg_bin: str = "ffmpeg",
+    timeout: float = 300.0,
+    controls: ProcessControls | None = None,
+) -> str:
+    """
+    Brands a video read from `chunks` (e.g. an HTTP body) through ffmpeg's stdin,
+    so the transcode runs while the download is still in progress.
+
+    ffmpeg probes the stream itself, so the resolution is not known up front and
+    the watermark is drawn by the filter graph; audio is mapped optionally. Inputs that
+    need seeking (mp4 with the moov atom at the end) fail with RuntimeError, and
+    the caller should fall back to `add_branding_to_video_file`. Runs through
+    `run_ffmpeg_process`, so `controls` stall detection and cleanup apply.
+    """
+    logo_file = Path(logo_path)
+    if not logo_file.exists():
+        raise FileNotFoundError(f"Logo not found: {logo_file}")
+
+    font_file = Path(font_path) if font_path else DEFAULT_FONT_PATH
+    temp_output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
+
+    filter_complex = _branding_filter(
+        watermark_text, font_file, logo_position, logo_opacity, logo_scale, text_scale, margin
+    )
+    command = _branding_command(
+        ffmpeg_bin=ffmpeg_bin,
+        input_arg="pipe:0",
+        logo_file=logo_file,
+        filter_complex=filter_complex,
+        has_audio=None,
+        output_path=temp_output_path,
+    )
+
+    try:
+        await run_ffmpeg_process(
+            command,
+            timeout=timeout,
+            label="streamed branding",
+            controls=controls,
+            stdin=chunks,
+        )
+        _check_output(temp_output_path)
+    except BaseException:
+        Path(temp_output_path).unlink(missing_ok=True)
+        raise
+
     return temp_output_path
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import Counter, deque
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from time import monotonic
+
+
+class VideoJobStalled(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class ProcessControls:
+    """Scheduling limits applied to every ffmpeg / yt-dlp child process."""
+
+    nice: int = 0
+    cpu_affinity: frozenset[int] = frozenset()
+    # No progress (out_time not advancing) for this long kills the process.
+    stall_timeout: float = 60.0
+    progress_interval: float = 10.0
+
+    def preexec_fn(self) -> Callable[[], None] | None:
+        if not self.nice and not self.cpu_affinity:
+            return None
+
+        nice = self.nice
+        cpus = set(self.cpu_affinity)
+
+        def apply() -> None:
+            if nice:
+                os.nice(nice)
+            if cpus and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, cpus)
+
+        return apply
+
+
+@dataclass
+class FfmpegProgress:
+    out_time: float = 0.0
+    speed: float | None = None
+    fps: float | None = None
+    done: bool = False
+    _block: dict[str, str] = field(default_factory=dict, repr=False)
+
+    def feed(self, line: str) -> bool:
+        """
+        Consumes one `key=value` line of `ffmpeg -progress` output.
+        Returns True when a block is complete (the `progress=` line).
+        """
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return False
+
+        if key != "progress":
+            self._block[key] = value.strip()
+            return False
+
+        block, self._block = self._block, {}
+        out_time_us = block.get("out_time_us") or block.get("out_time_ms")
+        if out_time_us and out_time_us.lstrip("-").isdigit():
+            self.out_time = max(self.out_time, int(out_time_us) / 1_000_000)
+        self.speed = _parse_number(block.get("speed", "").rstrip("x"))
+        self.fps = _parse_number(block.get("fps", ""))
+        self.done = value.strip() == "end"
+        return True
+
+    def eta(self, duration: float | None) -> float | None:
+        if not duration or not self.speed:
+            return None
+        return max(0.0, duration - self.out_time) / self.speed
+
+    def format(self, duration: float | None) -> str:
+        parts = []
+        if duration:
+            parts.append(f"{min(1.0, self.out_time / duration):.0%}")
+        parts.append(f"t={self.out_time:.1f}s")
+        if self.speed:
+            parts.append(f"speed={self.speed:.2f}x")
+        eta = self.eta(duration)
+        if eta is not None:
+            parts.append(f"eta={eta:.0f}s")
+        return " ".join(parts)
+
+
+def _parse_number(value: str) -> float | None:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+async def kill_process(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+
+async def _watch_progress(
+    stdout: asyncio.StreamReader,
+    progress: FfmpegProgress,
+    *,
+    label: str,
+    duration: float | None,
+    controls: ProcessControls,
+) -> None:
+    last_advance = monotonic()
+    last_out_time = 0.0
+    last_report = monotonic()
+
+    while True:
+        try:
+            line = await asyncio.wait_for(stdout.readline(), timeout=controls.stall_timeout)
+        except TimeoutError as e:
+            raise VideoJobStalled(
+                f"{label}: no ffmpeg output for {controls.stall_timeout:.0f}s"
+            ) from e
+        if not line:
+            return
+
+        if not progress.feed(line.decode(errors="replace")):
+            continue
+
+        now = monotonic()
+        if progress.out_time > last_out_time:
+            last_out_time, last_advance = progress.out_time, now
+        elif now - last_advance > controls.stall_timeout:
+            raise VideoJobStalled(
+                f"{label}: stalled at t={progress.out_time:.1f}s for {controls.stall_timeout:.0f}s"
+            )
+
+        if now - last_report >= controls.progress_interval and not progress.done:
+            last_report = now
+            print(f"[VIDEO] {label} {progress.format(duration)}")
+
+
+async def _feed_stdin(stdin: asyncio.StreamWriter, chunks: AsyncIterable[bytes]) -> None:
+    try:
+        async for chunk in chunks:
+            stdin.write(chunk)
+            await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # ffmpeg exited early; its stderr explains why.
+        return
+    finally:
+        stdin.close()
+
+
+async def run_ffmpeg_process(
+    command: list[str],
+    *,
+    timeout: float = 300.0,
+    duration: float | None = None,
+    label: str = "ffmpeg",
+    controls: ProcessControls | None = None,
+    stdin: AsyncIterable[bytes] | None = None,
+) -> FfmpegProgress:
+    """
+    Runs ffmpeg with `-progress pipe:1` and returns the last progress block.
+
+    `stdin` chunks are fed to the process while it runs (input `pipe:0`);
+    an error raised while producing them (e.g. a failed download) is raised
+    here. The child is always killed and reaped on timeout, stall, error or
+    task cancellation, so no ffmpeg is left running behind a cancelled job.
+    """
+    controls = controls or ProcessControls()
+    command = [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        preexec_fn=controls.preexec_fn(),
+    )
+    stderr_task = asyncio.create_task(process.stderr.read())
+    feeder = asyncio.create_task(_feed_stdin(process.stdin, stdin)) if stdin is not None else None
+    progress = FfmpegProgress()
+    try:
+        async with asyncio.timeout(timeout):
+            await _watch_progress(
+                process.stdout,
+                progress,
+                label=label,
+                duration=duration,
+                controls=controls,
+            )
+            await process.wait()
+            if feeder is not None:
+                # Ends right away once ffmpeg has exited (EOF or a broken pipe).
+                await feeder
+    except TimeoutError as e:
+        raise RuntimeError(f"{label}: ffmpeg timed out after {timeout:.0f}s") from e
+    finally:
+        if feeder is not None and not feeder.done():
+            feeder.cancel()
+            await asyncio.gather(feeder, return_exceptions=True)
+        await kill_process(process)
+        stderr = await stderr_task
+
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg error:\n{stderr.decode()}")
+    return progress
+
+
+class VideoJobManager:
+    """
+    Caps how many video jobs (download + branding of one video) run at once.
+
+    Jobs waiting for a slot queue in arrival order, foreground jobs ahead of
+    `background` ones (prefetch). A foreground job that finds every slot
+    taken preempts a running background job: its task is cancelled, so it
+    gives up the slot and the item's video is prepared again when needed.
+    """
+
+    def __init__(self, max_concurrent: int = 1) -> None:
+        self._slots = max(1, max_concurrent)
+        self._running = 0
+        # Waiters by lane: foreground (False) is always served first.
+        self._waiters: dict[bool, deque[asyncio.Future[None]]] = {False: deque(), True: deque()}
+        self._background: set[asyncio.Task] = set()
+        self._preempted: set[asyncio.Task] = set()
+        self._stats: Counter[str] = Counter()
+        self._max_wait = 0.0
+
+    @asynccontextmanager
+    async def job(self, label: str, *, background: bool = False) -> AsyncIterator[None]:
+        requested = monotonic()
+        await self._acquire(background)
+        self._max_wait = max(self._max_wait, monotonic() - requested)
+        task = asyncio.current_task()
+        if background and task is not None:
+            self._background.add(task)
+        try:
+            yield
+            self._stats["done"] += 1
+        except asyncio.CancelledError:
+            if task in self._preempted:
+                self._stats["preempted"] += 1
+                print(f"[VIDEO] background job preempted: {label}")
+            else:
+                self._stats["cancelled"] += 1
+                print(f"[VIDEO] job cancelled: {label}")
+            raise
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self._background.discard(task)
+            self._preempted.discard(task)
+            self._running -= 1
+            self._wake()
+
+    async def _acquire(self, background: bool) -> None:
+        ahead = self._waiters[False] or (background and self._waiters[True])
+        if self._running < self._slots and not ahead:
+            self._running += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[background].append(waiter)
+        if not background:
+            self._preempt()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the waiter was cancelled.
+                self._running -= 1
+                self._wake()
+            elif waiter in self._waiters[background]:
+                self._waiters[background].remove(waiter)
+            raise
+
+    def _wake(self) -> None:
+        while self._running < self._slots:
+            lane = self._waiters[False] or self._waiters[True]
+            if not lane:
+                return
+            waiter = lane.popleft()
+            if not waiter.done():
+                self._running += 1
+                waiter.set_result(None)
+
+    def _preempt(self) -> None:
+        # One background job per waiting foreground job.
+        if len(self._preempted) >= len(self._waiters[False]):
+            return
+        for task in self._background - self._preempted:
+            self._preempted.add(task)
+            task.cancel()
+            return
+
+    def stats(self) -> dict[str, float]:
+        return {**self._stats, "running": self._running, "max_wait": self._max_wait}
+
+    def format_stats(self) -> str:
+        s = self._stats
+        return (
+            f"running={self._running} done={s['done']} failed={s['failed']} "
+            f"cancelled={s['cancelled']} preempted={s['preempted']} "
+            f"max_wait={self._max_wait:.1f}s"
+        )
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import re
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from time import monotonic
 from typing import Literal
 
 import httpx
@@ -17,34 +20,37 @@ class ResolvedVideo:
     url: str
 
 
-_YOUTUBE_EMBED_RE = re.compile(
-    r"""<iframe[^>]+src=["'](https?://(?:www\.)?youtube\.com/embed/[^"']+)["']""",
-    re.IGNORECASE,
-)
-_YOUTUBE_WATCH_RE = re.compile(
-    r"""https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/|youtube-nocookie\.com/embed/)([A-Za-z0-9_-]{6,})""",
-    re.IGNORECASE,
-)
-_DIRECT_VIDEO_RE = re.compile(
-    r"""https?://[^\s"'<>]+?\.(?:mp4|m4v|mov)(?:\?[^\s"'<>]*)?""",
-    re.IGNORECASE,
-)
-_VIDEO_TAG_RE = re.compile(
-    r"""<video[^>]+src=["'](https?://[^"']+)["']""",
-    re.IGNORECASE,
-)
-_SOURCE_TAG_RE = re.compile(
-    r"""<source[^>]+src=["'](https?://[^"']+)["'][^>]*type=["']video/[^"']+["']""",
-    re.IGNORECASE,
-)
-_OG_VIDEO_RE = re.compile(
-    r"""<meta[^>]+property=["']og:video(?::url)?["'][^>]+content=["'](https?://[^"']+)["']""",
-    re.IGNORECASE,
+# Every media candidate of a page in one alternation, so the HTML is scanned
+# once. Group names double as the candidate kinds of `PageScan`.
+_PAGE_SCAN_RE = re.compile(
+    r"""
+    <iframe[^>]+src=["'](?P<youtube_embed>https?://(?:www\.)?youtube\.com/embed/[^"']+)["']
+    |<meta[^>]+property=["']og:video(?::url)?["'][^>]+content=["'](?P<og_video>https?://[^"']+)["']
+    |<meta[^>]+property=["']og:image(?::url)?["'][^>]+content=["'](?P<og_image>https?://[^"']+)["']
+    |<meta[^>]+name=["']twitter:player["'][^>]+content=["'](?P<twitter_player>https?://[^"']+)["']
+    |<video[^>]+src=["'](?P<video_tag>https?://[^"']+)["']
+    |<source[^>]+src=["'](?P<source_tag>https?://[^"']+)["'][^>]*type=["']video/[^"']+["']
+    |(?P<direct>https?://[^\s"'<>]+?\.(?:mp4|m4v|mov)(?:\?[^\s"'<>]*)?)
+    |https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/|youtube-nocookie\.com/embed/)
+        (?P<youtube_id>[A-Za-z0-9_-]{6,})
+    """,
+    re.IGNORECASE | re.VERBOSE,
 )
-_TWITTER_PLAYER_RE = re.compile(
-    r"""<meta[^>]+name=["']twitter:player["'][^>]+content=["'](https?://[^"']+)["']""",
-    re.IGNORECASE,
+# Candidate kinds tried by resolve_video_candidate, highest priority first.
+_VIDEO_CANDIDATE_ORDER = (
+    "youtube_embed",
+    "og_video",
+    "twitter_player",
+    "video_tag",
+    "source_tag",
+    "direct",
 )
+# Media tags live in <head> and the article body; the rest of the page
+# (comments, related articles, footer) is not downloaded.
+_PAGE_END_RE = re.compile(r"</article\s*>|</body\s*>", re.IGNORECASE)
+PAGE_MAX_CHARS = 2_000_000
+PAGE_CACHE_SIZE = 256
+PAGE_CACHE_TTL_SECONDS = 900.0
 _YOUTUBE_HOST_RE = re.compile(
     r"""(?:youtube\.com|youtu\.be|youtube-nocookie\.com)""",
     re.IGNORECASE,
@@ -85,49 +91,145 @@ def resolve_video_candidate(url: str) -> ResolvedVideo | None:
     return None
 
 
-async def fetch_page_html(url: str, timeout: float = 30.0) -> str:
+async def fetch_page_html(
+    url: str,
+    timeout: float = 30.0,
+    max_chars: int = PAGE_MAX_CHARS,
+) -> str:
+    """
+    Streams the page and stops reading after the first `</article>` (or
+    `</body>`), i.e. once <head> and the article body are in, or at `max_chars`.
+    """
     headers = {
         "User-Agent": DEFAULT_USER_AGENT,
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
         "Referer": url,
     }
+    parts: list[str] = []
+    received = 0
+    tail = ""
     async with httpx.AsyncClient(timeout=timeout, follow_redirects=True, headers=headers) as client:
-        resp = await client.get(url)
-        resp.raise_for_status()
-        return resp.text
+        async with client.stream("GET", url) as resp:
+            resp.raise_for_status()
+            async for text in resp.aiter_text():
+                parts.append(text)
+                received += len(text)
+                # The tail catches an end tag split across two chunks.
+                if _PAGE_END_RE.search(tail + text) or received >= max_chars:
+                    break
+                tail = text[-16:]
 
+    return "".join(parts)[:max_chars]
 
-def resolve_video_from_html(html: str) -> ResolvedVideo | None:
-    if not html:
+
+@dataclass(frozen=True)
+class PageScan:
+    """First match of every media candidate kind found on a page."""
+
+    candidates: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def og_image(self) -> str | None:
+        return self.candidates.get("og_image")
+
+    def best_video(self) -> ResolvedVideo | None:
+        for kind in _VIDEO_CANDIDATE_ORDER:
+            found = self.candidates.get(kind)
+            resolved = resolve_video_candidate(found) if found else None
+            if resolved:
+                return resolved
+
+        video_id = self.candidates.get("youtube_id")
+        if video_id:
+            return ResolvedVideo(kind="youtube", url=f"https://www.youtube.com/watch?v={video_id}")
         return None
 
-    for pattern in (
-        _YOUTUBE_EMBED_RE,
-        _OG_VIDEO_RE,
-        _TWITTER_PLAYER_RE,
-        _VIDEO_TAG_RE,
-        _SOURCE_TAG_RE,
-    ):
-        match = pattern.search(html)
-        if not match:
-            continue
-        found = match.group(1).strip()
-        resolved = resolve_video_candidate(found)
-        if resolved:
-            return resolved
 
-    direct_match = _DIRECT_VIDEO_RE.search(html)
-    if direct_match:
-        resolved = resolve_video_candidate(direct_match.group(0))
-        if resolved:
-            return resolved
+def scan_page(html: str) -> PageScan:
+    candidates: dict[str, str] = {}
+    for match in _PAGE_SCAN_RE.finditer(html or ""):
+        kind = match.lastgroup
+        if kind and kind not in candidates:
+            candidates[kind] = match.group(kind).strip()
+    return PageScan(candidates=candidates)
 
-    yt_match = _YOUTUBE_WATCH_RE.search(html)
-    if yt_match:
-        video_id = yt_match.group(1)
-        return ResolvedVideo(kind="youtube", url=f"https://www.youtube.com/watch?v={video_id}")
 
-    return None
+def resolve_video_from_html(html: str) -> ResolvedVideo | None:
+    return scan_page(html).best_video()
+
+
+class PageScanCache:
+    """
+    Scans of article pages by URL, kept for `ttl` seconds and at most
+    `max_entries` pages. Concurrent lookups of one URL share a single fetch.
+    Failed fetches are not cached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = PAGE_CACHE_SIZE,
+        ttl: float = PAGE_CACHE_TTL_SECONDS,
+    ) -> None:
+        self._entries: OrderedDict[str, tuple[float, PageScan]] = OrderedDict()
+        self._pending: dict[str, asyncio.Task[PageScan]] = {}
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def scan(self, url: str) -> PageScan:
+        cached = self._entries.get(url)
+        if cached and monotonic() - cached[0] < self._ttl:
+            self._entries.move_to_end(url)
+            self.hits += 1
+            return cached[1]
+
+        task = self._pending.get(url)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._fetch(url))
+            self._pending[url] = task
+            task.add_done_callback(lambda done: self._finish(url, done))
+        else:
+            self.hits += 1
+
+        # A cancelled caller does not cancel the fetch other callers wait for.
+        return await asyncio.shield(task)
+
+    def _finish(self, url: str, task: asyncio.Task[PageScan]) -> None:
+        self._pending.pop(url, None)
+        if not task.cancelled():
+            # Retrieved here too, for fetches whose callers were all cancelled.
+            task.exception()
+
+    async def _fetch(self, url: str) -> PageScan:
+        result = scan_page(await fetch_page_html(url))
+        self._entries[url] = (monotonic(), result)
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def format_stats(self) -> str:
+        return f"pages={len(self._entries)} hit={self.hits} miss={self.misses}"
+
+
+_page_cache = PageScanCache()
+
+
+def clear_page_cache() -> None:
+    _page_cache.clear()
+
+
+def page_cache_stats() -> str:
+    return _page_cache.format_stats()
+
+
+async def scan_article_page(url: str) -> PageScan:
+    """Scan of the article page, shared with video resolution through the cache."""
+    return await _page_cache.scan(url)
 
 
 async def resolve_video_for_item(item) -> ResolvedVideo | None:
@@ -137,9 +239,9 @@ async def resolve_video_for_item(item) -> ResolvedVideo | None:
             return resolved
 
     try:
-        html = await fetch_page_html(item.url)
+        scan = await _page_cache.scan(item.url)
     except Exception as e:
         print(f"[MEDIA] article html fetch failed: {e}")
         return None
 
-    return resolve_video_from_html(html)
+    return scan.best_video()
@@ -1,13 +1,32 @@
 from __future__ import annotations
 
 import asyncio
+import copy
 import json
 import shutil
 import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
+from time import monotonic
+from typing import Any
+from urllib.parse import parse_qs, urlparse
 
+from ua_news_bot.media.video_editor import MAX_OUTPUT_HEIGHT, plan_encode
+from ua_news_bot.media.video_jobs import ProcessControls, kill_process
 
-async def extract_video_url_with_ytdlp(url: str, ytdlp_bin: str = "yt-dlp") -> str | None:
+
+async def extract_info_with_ytdlp(
+    url: str,
+    ytdlp_bin: str = "yt-dlp",
+    timeout: float = 120.0,
+    controls: ProcessControls | None = None,
+) -> dict[str, Any]:
+    """
+    Info JSON of `url` from one `yt-dlp --dump-single-json` run. On timeout or
+    cancellation yt-dlp is killed.
+    """
     process = await asyncio.create_subprocess_exec(
         ytdlp_bin,
         "--dump-single-json",
@@ -16,13 +35,22 @@ async def extract_video_url_with_ytdlp(url: str, ytdlp_bin: str = "yt-dlp") -> s
         url,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
+        preexec_fn=(controls or ProcessControls()).preexec_fn(),
     )
-    stdout, stderr = await process.communicate()
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except BaseException:
+        await kill_process(process)
+        raise
 
     if process.returncode != 0:
         raise RuntimeError(f"yt-dlp extract failed:\n{stderr.decode()}")
 
-    data = json.loads(stdout.decode())
+    return json.loads(stdout.decode())
+
+
+async def extract_video_url_with_ytdlp(url: str, ytdlp_bin: str = "yt-dlp") -> str | None:
+    data = await extract_info_with_ytdlp(url, ytdlp_bin=ytdlp_bin)
 
     direct_url = (data.get("url") or "").strip()
     if direct_url:
@@ -45,32 +73,39 @@ async def extract_video_url_with_ytdlp(url: str, ytdlp_bin: str = "yt-dlp") -> s
     return None
 
 
-async def download_video_with_ytdlp(url: str, ytdlp_bin: str = "yt-dlp") -> str:
+DEFAULT_FORMAT = "bv*[ext=mp4]+ba[ext=m4a]/b[ext=mp4]/b"
+
+
+def format_for_budget(
+    duration: float | None,
+    max_upload_bytes: int,
+    max_download_bytes: int,
+) -> str:
     """
-    Downloads video to a temp directory and returns the final mp4 path.
-    Caller must delete the returned file.
+    yt-dlp format selector that does not fetch more than branding can use.
+
+    The height is capped to what the upload budget can carry for `duration`
+    (the same ladder as `plan_encode`), or 1080p if the duration is unknown.
+    `filesize<?` / `filesize_approx<?` drop formats known to exceed the download
+    cap and keep those with unknown size. The last resort is any single file;
+    `max_filesize` still aborts it if it turns out too large.
     """
-    temp_dir = Path(tempfile.mkdtemp(prefix="smart_news_ytdlp_"))
+    height = MAX_OUTPUT_HEIGHT
+    if duration:
+        height = plan_encode(duration, True, max_upload_bytes).max_height or MAX_OUTPUT_HEIGHT
 
-    process = await asyncio.create_subprocess_exec(
-        ytdlp_bin,
-        "-f",
-        "bv*[ext=mp4]+ba[ext=m4a]/b[ext=mp4]/b",
-        "--merge-output-format",
-        "mp4",
-        "-o",
-        "%(id)s.%(ext)s",
-        url,
-        cwd=str(temp_dir),
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+    limit_mb = max(1, max_download_bytes // (1024 * 1024))
+    size = f"[filesize<?{limit_mb}M][filesize_approx<?{limit_mb}M]"
+    return (
+        f"bv*[ext=mp4][height<={height}]{size}+ba[ext=m4a]/"
+        f"b[ext=mp4][height<={height}]{size}/"
+        f"bv*[height<={height}]{size}+ba/"
+        f"b[height<={height}]{size}/"
+        f"b"
     )
-    _, stderr = await process.communicate()
 
-    if process.returncode != 0:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        raise RuntimeError(f"yt-dlp download failed:\n{stderr.decode()}")
 
+def _pick_output(temp_dir: Path) -> str:
     candidates = sorted(
         [p for p in temp_dir.iterdir() if p.is_file()],
         key=lambda p: p.stat().st_mtime,
@@ -96,3 +131,173 @@ async def download_video_with_ytdlp(url: str, ytdlp_bin: str = "yt-dlp") -> str:
     shutil.rmtree(temp_dir, ignore_errors=True)
 
     return str(final_path)
+
+
+async def download_video_with_ytdlp(
+    url: str,
+    ytdlp_bin: str = "yt-dlp",
+    timeout: float = 900.0,
+    controls: ProcessControls | None = None,
+    format_selector: str = DEFAULT_FORMAT,
+    max_filesize: int | None = None,
+    info: dict[str, Any] | None = None,
+) -> str:
+    """
+    Downloads video to a temp directory and returns the final mp4 path.
+    Caller must delete the returned file. On timeout or cancellation yt-dlp is
+    killed and the temp directory removed.
+
+    `info` from `extract_info_with_ytdlp` is passed with `--load-info-json`,
+    so yt-dlp does not extract the video a second time.
+    """
+    temp_dir = Path(tempfile.mkdtemp(prefix="smart_news_ytdlp_"))
+
+    size_args = ["--max-filesize", str(max_filesize)] if max_filesize else []
+    source_args = [url]
+    if info is not None:
+        info_path = temp_dir / "info.json"
+        info_path.write_text(json.dumps(info))
+        source_args = ["--load-info-json", str(info_path)]
+
+    process = await asyncio.create_subprocess_exec(
+        ytdlp_bin,
+        "-f",
+        format_selector,
+        *size_args,
+        "--merge-output-format",
+        "mp4",
+        "-o",
+        "%(id)s.%(ext)s",
+        *source_args,
+        cwd=str(temp_dir),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        preexec_fn=(controls or ProcessControls()).preexec_fn(),
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except BaseException:
+        await kill_process(process)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    if process.returncode != 0:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise RuntimeError(f"yt-dlp download failed:\n{stderr.decode()}")
+
+    if info is not None:
+        # Not an output candidate.
+        info_path.unlink(missing_ok=True)
+    return _pick_output(temp_dir)
+
+
+def _video_key(url: str) -> str:
+    # The resolver normalizes YouTube links to watch?v=<id>.
+    query = parse_qs(urlparse(url).query)
+    return query["v"][0] if query.get("v") else url
+
+
+class InProcessYtDlp:
+    """
+    yt-dlp through its Python API instead of a new `yt-dlp` process per video.
+
+    One `YoutubeDL` instance is reused for extraction, so the interpreter start
+    and extractor setup are paid once. Extraction results are cached per video
+    ID for `info_ttl` seconds (format URLs are signed and expire), and the
+    download runs from the cached info with a size-constrained format.
+    Requires the optional `yt-dlp` package.
+    """
+
+    def __init__(self, info_cache_size: int = 128, info_ttl: float = 1800.0) -> None:
+        try:
+            import yt_dlp
+        except ImportError as e:
+            raise RuntimeError("YTDLP_IN_PROCESS=true requires the yt-dlp package") from e
+
+        self._yt_dlp = yt_dlp
+        self._base_params: dict[str, Any] = {
+            "quiet": True,
+            "no_warnings": True,
+            "noprogress": True,
+        }
+        self._extractor = yt_dlp.YoutubeDL(self._base_params)
+        self._extract_lock = asyncio.Lock()
+        self._info_cache: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._info_cache_size = info_cache_size
+        self._info_ttl = info_ttl
+
+    async def extract(self, url: str) -> dict[str, Any]:
+        key = _video_key(url)
+        cached = self._info_cache.get(key)
+        if cached and monotonic() - cached[0] < self._info_ttl:
+            self._info_cache.move_to_end(key)
+            return cached[1]
+
+        # YoutubeDL is not thread-safe; extractions on the shared instance are serialized.
+        async with self._extract_lock:
+            info = await asyncio.to_thread(self._extractor.extract_info, url, download=False)
+
+        self._info_cache[key] = (monotonic(), info)
+        if len(self._info_cache) > self._info_cache_size:
+            self._info_cache.popitem(last=False)
+        return info
+
+    async def download(
+        self,
+        url: str,
+        *,
+        max_upload_bytes: int,
+        max_download_bytes: int,
+    ) -> str:
+        """
+        Downloads the best format that fits the budget and returns a temp mp4
+        path owned by the caller. Cancellation stops the download at the next
+        progress callback; the temp directory is removed once the worker
+        thread has stopped writing to it.
+        """
+        info = await self.extract(url)
+        temp_dir = Path(tempfile.mkdtemp(prefix="smart_news_ytdlp_"))
+        cancelled = threading.Event()
+
+        def stop_if_cancelled(_status: dict[str, Any]) -> None:
+            if cancelled.is_set():
+                raise self._yt_dlp.utils.DownloadCancelled("cancelled by bot")
+
+        params = {
+            **self._base_params,
+            "format": format_for_budget(info.get("duration"), max_upload_bytes, max_download_bytes),
+            "max_filesize": max_download_bytes,
+            "merge_output_format": "mp4",
+            "outtmpl": str(temp_dir / "%(id)s.%(ext)s"),
+            "progress_hooks": [stop_if_cancelled],
+            "postprocessor_hooks": [stop_if_cancelled],
+        }
+
+        def run() -> None:
+            # A download-only instance: processing cached info skips extraction.
+            with self._yt_dlp.YoutubeDL(params) as ydl:
+                ydl.process_ie_result(copy.deepcopy(info), download=True)
+
+        worker = asyncio.ensure_future(asyncio.to_thread(run))
+        try:
+            await asyncio.shield(worker)
+        except BaseException:
+            cancelled.set()
+            # A thread cannot be killed: wait for the hook to stop it, or files
+            # could be written after the directory is removed.
+            while not worker.done():
+                try:
+                    await asyncio.wait([worker])
+                except asyncio.CancelledError:
+                    continue
+            if not worker.cancelled():
+                worker.exception()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+        return _pick_output(temp_dir)
+
+
+@lru_cache(maxsize=1)
+def get_in_process_ytdlp() -> InProcessYtDlp:
+    return InProcessYtDlp()
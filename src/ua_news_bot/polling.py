@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import random
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from time import time
+
+# Exponential moving average weight of the newest gap between items.
+CADENCE_ALPHA = 0.3
+# Interval growth per poll that found nothing new.
+IDLE_BACKOFF = 1.5
+
+
+@dataclass
+class FeedCadence:
+    interval: float
+    next_poll_at: float = 0.0
+    # Publish time (unix) of the newest item seen so far.
+    newest: float | None = None
+    # Learned average gap between new items, seconds.
+    mean_gap: float | None = None
+    polls: int = 0
+    idle_polls: int = 0
+
+
+class FeedPollScheduler:
+    """
+    Decides when each feed is polled next.
+
+    A feed's cadence is learned from the publish times of its new items: after
+    new items it is polled at half the average gap between them (so an item
+    waits half a gap on average), and every poll that finds nothing (including
+    304 Not Modified) stretches the interval by `IDLE_BACKOFF`. Intervals stay
+    within [min_seconds, max_seconds] and get +-`jitter` randomness so polls
+    do not line up with the feed's own schedule.
+    """
+
+    def __init__(
+        self,
+        min_seconds: float,
+        max_seconds: float,
+        jitter: float = 0.1,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self._min = min_seconds
+        self._max = max(min_seconds, max_seconds)
+        self._jitter = jitter
+        self._rng = rng
+        self._feeds: dict[str, FeedCadence] = {}
+
+    def _feed(self, name: str) -> FeedCadence:
+        if name not in self._feeds:
+            self._feeds[name] = FeedCadence(interval=self._min)
+        return self._feeds[name]
+
+    def is_due(self, name: str, now: float | None = None) -> bool:
+        return self._feed(name).next_poll_at <= (time() if now is None else now)
+
+    def next_poll_at(self, name: str) -> float:
+        """Unix time of the source's next poll (0 = never polled, due now)."""
+        return self._feed(name).next_poll_at
+
+    def seconds_until_next(self, now: float | None = None) -> float:
+        if not self._feeds:
+            return 0.0
+        now = time() if now is None else now
+        return max(0.0, min(feed.next_poll_at for feed in self._feeds.values()) - now)
+
+    def record(
+        self,
+        name: str,
+        published: list[datetime | None],
+        *,
+        not_modified: bool = False,
+        now: float | None = None,
+    ) -> None:
+        """
+        Records a poll: publish times of the items it returned, or a 304.
+        Items without a publish time say nothing about the cadence.
+        """
+        now = time() if now is None else now
+        feed = self._feed(name)
+        feed.polls += 1
+
+        stamps = [] if not_modified else sorted(_timestamp(p) for p in published if p)
+        fresh = [t for t in stamps if feed.newest is None or t > feed.newest]
+        if fresh:
+            # On the first poll the whole feed is history to learn the cadence from.
+            previous = feed.newest if feed.newest is not None else fresh[0]
+            for t in fresh:
+                gap = t - previous
+                previous = t
+                if gap <= 0:
+                    continue
+                if feed.mean_gap is None:
+                    feed.mean_gap = gap
+                else:
+                    feed.mean_gap += CADENCE_ALPHA * (gap - feed.mean_gap)
+            feed.newest = fresh[-1]
+            feed.idle_polls = 0
+            feed.interval = self._clamp(feed.mean_gap / 2 if feed.mean_gap else self._min)
+        else:
+            feed.idle_polls += 1
+            feed.interval = self._clamp(feed.interval * IDLE_BACKOFF)
+
+        self._schedule(feed, now)
+
+    def record_error(self, name: str, now: float | None = None) -> None:
+        """A failed poll backs off like an idle one, without touching the cadence."""
+        feed = self._feed(name)
+        feed.interval = self._clamp(feed.interval * IDLE_BACKOFF)
+        self._schedule(feed, time() if now is None else now)
+
+    def format_stats(self, now: float | None = None) -> str:
+        now = time() if now is None else now
+        parts = []
+        for name, feed in self._feeds.items():
+            gap = f"{feed.mean_gap:.0f}s" if feed.mean_gap is not None else "?"
+            parts.append(
+                f"{name}: every {feed.interval:.0f}s (gap {gap}, idle {feed.idle_polls}) "
+                f"next in {max(0.0, feed.next_poll_at - now):.0f}s"
+            )
+        return "; ".join(parts) or "no feeds polled"
+
+    def _clamp(self, seconds: float) -> float:
+        return min(self._max, max(self._min, seconds))
+
+    def _schedule(self, feed: FeedCadence, now: float) -> None:
+        spread = self._jitter * (2 * self._rng() - 1)
+        feed.next_poll_at = now + self._clamp(feed.interval * (1 + spread))
+
+
+def _timestamp(published_at: datetime) -> float:
+    # feedparser timestamps are naive UTC.
+    if published_at.tzinfo is None:
+        published_at = published_at.replace(tzinfo=UTC)
+    return published_at.timestamp()
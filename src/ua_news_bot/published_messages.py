@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from time import time
+
+from ua_news_bot.models import NewsItem
+from ua_news_bot.work_queue import item_from_json, item_to_json
+
+# media_state values
+MEDIA_PENDING = "pending"
+MEDIA_SWAPPED = "swapped"
+MEDIA_PLACEHOLDER = "placeholder"
+
+
+@dataclass(frozen=True)
+class PendingMessage:
+    """A posted placeholder whose video is still to be swapped in."""
+
+    item: NewsItem
+    chat_id: str
+    message_id: int
+    caption: str
+    # Caption without the video note, for when no video comes; None if the
+    # post text was split over several messages.
+    caption_without_video: str | None
+    priority: int
+
+
+class SQLitePublishedMessageStore:
+    """
+    message_ids of posts whose media is attached after publishing.
+
+    A post that missed its deadline goes out with a placeholder photo
+    (media_state=pending); the row is updated once the video replaced it
+    (swapped) or the placeholder stays for good (placeholder). Pending rows
+    keep the item and captions, so swaps are resumed after a restart.
+    """
+
+    def __init__(self, db_path: str = "data/seen.sqlite3") -> None:
+        path = Path(db_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS published_messages (
+                item_url TEXT NOT NULL,
+                chat_id TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                media_state TEXT NOT NULL,
+                item_json TEXT NOT NULL,
+                caption TEXT NOT NULL,
+                caption_without_video TEXT,
+                priority INTEGER NOT NULL,
+                posted_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (chat_id, message_id)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def record(self, message: PendingMessage) -> None:
+        now = int(time())
+        self._conn.execute(
+            "INSERT OR REPLACE INTO published_messages "
+            "(item_url, chat_id, message_id, media_state, item_json, caption, "
+            "caption_without_video, priority, posted_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                message.item.url,
+                message.chat_id,
+                message.message_id,
+                MEDIA_PENDING,
+                item_to_json(message.item),
+                message.caption,
+                message.caption_without_video,
+                message.priority,
+                now,
+                now,
+            ),
+        )
+        self._conn.commit()
+
+    def set_media_state(self, chat_id: str, message_id: int, media_state: str) -> None:
+        self._conn.execute(
+            "UPDATE published_messages SET media_state = ?, updated_at = ? "
+            "WHERE chat_id = ? AND message_id = ?",
+            (media_state, int(time()), chat_id, message_id),
+        )
+        self._conn.commit()
+
+    def pending(self) -> list[PendingMessage]:
+        """Posts still waiting for their video, oldest first."""
+        cur = self._conn.execute(
+            "SELECT item_json, chat_id, message_id, caption, caption_without_video, priority "
+            "FROM published_messages WHERE media_state = ? ORDER BY posted_at",
+            (MEDIA_PENDING,),
+        )
+        return [
+            PendingMessage(
+                item=item_from_json(item_json),
+                chat_id=chat_id,
+                message_id=message_id,
+                caption=caption,
+                caption_without_video=caption_without_video,
+                priority=priority,
+            )
+            for item_json, chat_id, message_id, caption, caption_without_video, priority in cur
+        ]
+
+    def close(self) -> None:
+        self._conn.close()
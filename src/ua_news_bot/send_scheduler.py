@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import TypeVar
+
+T = TypeVar("T")
+
+PRIORITY_BREAKING = 0
+PRIORITY_NORMAL = 10
+
+
+class TokenBucket:
+    """
+    Classic token bucket.
+
+    A job may start once the bucket holds `min(cost, capacity)` tokens; the full
+    cost is then charged, so albums larger than the burst put the bucket in debt
+    instead of blocking forever.
+    """
+
+    def __init__(self, rate: float, capacity: float, now: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic() if now is None else now
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        self._refill(now)
+        paused = max(0.0, self._paused_until - now)
+        needed = min(cost, self.capacity)
+        if self._tokens >= needed:
+            return paused
+        return max(paused, (needed - self._tokens) / self.rate)
+
+    def consume(self, cost: float, now: float) -> None:
+        self._refill(now)
+        self._tokens -= cost
+
+    def pause(self, seconds: float, now: float) -> None:
+        """Nothing may start for `seconds`; tokens keep refilling meanwhile."""
+        self._paused_until = max(self._paused_until, now + seconds)
+
+    def drain(self, now: float) -> None:
+        """Drops the saved-up burst, so the next jobs go at `rate`."""
+        self._refill(now)
+        self._tokens = min(self._tokens, 0.0)
+
+
+@dataclass
+class SchedulerStats:
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    jobs_sent: int = 0
+    messages_sent: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    rate_limited: int = 0
+
+    @property
+    def avg_wait_seconds(self) -> float:
+        if not self.jobs_sent:
+            return 0.0
+        return self.total_wait_seconds / self.jobs_sent
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    seq: int
+    chat_id: str = field(compare=False)
+    cost: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    granted: asyncio.Future[None] = field(compare=False)
+
+
+class SendScheduler:
+    """
+    Paces outgoing Telegram sends with a global bucket and one bucket per chat.
+
+    Telegram allows ~30 messages/second per bot and ~20 messages/minute per
+    group or channel. The per-chat bucket refills at
+    `(chat_per_minute - chat_burst) / 60` so that a full burst plus a minute of
+    refill never exceeds `chat_per_minute` in any 60 second window.
+
+    Jobs are granted in priority order (lower first, then FIFO). A ready job for
+    an idle chat is never blocked behind a job waiting on a busy chat.
+
+    When Telegram still answers 429, `pause` holds the chat back for the
+    `retry_after` it asked for.
+    """
+
+    def __init__(
+        self,
+        *,
+        global_per_second: float = 30.0,
+        chat_per_minute: float = 20.0,
+        chat_burst: int = 3,
+    ) -> None:
+        self._global = TokenBucket(global_per_second, global_per_second)
+        self._chat_rate = max(chat_per_minute - chat_burst, 1.0) / 60.0
+        self._chat_burst = float(chat_burst)
+        self._chats: dict[str, TokenBucket] = {}
+
+        self._queue: list[_Ticket] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task[None] | None = None
+        self._stats = SchedulerStats()
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self._chat_rate, self._chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def stats(self) -> SchedulerStats:
+        self._stats.queue_depth = len(self._queue)
+        return self._stats
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (
+            f"queue_depth={s.queue_depth} max_queue_depth={s.max_queue_depth} "
+            f"jobs={s.jobs_sent} messages={s.messages_sent} "
+            f"avg_wait={s.avg_wait_seconds:.2f}s max_wait={s.max_wait_seconds:.2f}s "
+            f"rate_limited={s.rate_limited}"
+        )
+
+    def pause(self, chat_id: str | None, seconds: float) -> None:
+        """
+        Feeds a 429 `retry_after` back into the buckets. Nothing more is granted
+        to `chat_id` for `seconds`; the global bucket loses its burst, so other
+        chats continue at the paced rate in case the bot-wide limit was hit.
+        """
+        now = monotonic()
+        if chat_id is not None:
+            self._chat_bucket(chat_id).pause(seconds, now)
+        else:
+            self._global.pause(seconds, now)
+        self._global.drain(now)
+        self._stats.rate_limited += 1
+        self._wakeup.set()
+
+    async def submit(
+        self,
+        chat_id: str,
+        send: Callable[[], Awaitable[T]],
+        *,
+        cost: int = 1,
+        priority: int = PRIORITY_NORMAL,
+    ) -> T:
+        """
+        Waits for a send slot, then runs `send()`.
+
+        `cost` is the number of Telegram messages the job produces, e.g. an album
+        of 4 photos plus its overflow text costs 5. Coalescing a follow-up into
+        the same job keeps it right behind its media post.
+        """
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket(
+            priority=priority,
+            seq=next(self._seq),
+            chat_id=chat_id,
+            cost=max(1, cost),
+            enqueued_at=monotonic(),
+            granted=loop.create_future(),
+        )
+        heapq.heappush(self._queue, ticket)
+        self._stats.max_queue_depth = max(self._stats.max_queue_depth, len(self._queue))
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+            raise
+
+        return await send()
+
+    async def _dispatch(self) -> None:
+        while self._queue:
+            self._wakeup.clear()
+            now = monotonic()
+            next_wait: float | None = None
+
+            for ticket in sorted(self._queue):
+                if ticket.granted.done():
+                    continue
+                wait = max(
+                    self._global.wait_time(ticket.cost, now),
+                    self._chat_bucket(ticket.chat_id).wait_time(ticket.cost, now),
+                )
+                if wait <= 0:
+                    self._grant(ticket, now)
+                    next_wait = 0.0
+                    break
+                if next_wait is None or wait < next_wait:
+                    next_wait = wait
+
+            if next_wait == 0.0 or not self._queue:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=next_wait)
+            except TimeoutError:
+                pass
+
+    def _grant(self, ticket: _Ticket, now: float) -> None:
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+
+        self._global.consume(ticket.cost, now)
+        self._chat_bucket(ticket.chat_id).consume(ticket.cost, now)
+
+        waited = now - ticket.enqueued_at
+        self._stats.jobs_sent += 1
+        self._stats.messages_sent += ticket.cost
+        self._stats.total_wait_seconds += waited
+        self._stats.max_wait_seconds = max(self._stats.max_wait_seconds, waited)
+
+        ticket.granted.set_result(None)
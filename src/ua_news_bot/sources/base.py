@@ -7,6 +7,8 @@ from ua_news_bot.models import NewsItem
 
 class NewsSource(Protocol):
     name: str
+    # True when the last fetch got 304 Not Modified (and returned no items).
+    not_modified: bool
 
     async def fetch_latest(self, limit: int = 20) -> list[NewsItem]:
         """Fetch latest items from this source."""
@@ -90,11 +90,29 @@ def _extract_video_urls(entry: Any) -> tuple[str, ...]:
 class SuspilneSource:
     name = "Суспільне"
 
+    def __init__(self) -> None:
+        # Validators of the last response, for conditional requests.
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        self.not_modified = False
+
     async def fetch_latest(self, limit: int = 20) -> list[NewsItem]:
+        headers = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+
         async with httpx.AsyncClient(timeout=20.0, follow_redirects=True) as client:
-            resp = await client.get(SUSPILNE_RSS_URL)
+            resp = await client.get(SUSPILNE_RSS_URL, headers=headers)
+            self.not_modified = resp.status_code == 304
+            if self.not_modified:
+                return []
             resp.raise_for_status()
 
+        self._etag = resp.headers.get("etag")
+        self._last_modified = resp.headers.get("last-modified")
+
         feed = feedparser.parse(resp.content)
 
         items: list[NewsItem] = []
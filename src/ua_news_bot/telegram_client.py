@@ -1,127 +1,497 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from io import BytesIO
+import random
+from collections.abc import Callable
 from pathlib import Path
+from typing import Any
 
 import httpx
 
+from ua_news_bot.telegram_file_ids import SQLiteFileIdStore, hash_bytes, hash_file_async
+
+DEFAULT_API_BASE_URL = "https://api.telegram.org"
+
+# Gateway errors where the request never reached the Bot API backend,
+# so resending cannot produce a duplicate post.
+_SAFE_RETRY_STATUSES = {502, 503}
+# Errors where the request may or may not have been processed.
+_AMBIGUOUS_RETRY_STATUSES = {500, 504}
+
+# Raised before any byte of the request was sent.
+_SAFE_NETWORK_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Raised after the request was (possibly) sent.
+_AMBIGUOUS_NETWORK_ERRORS = (
+    httpx.ReadTimeout,
+    httpx.ReadError,
+    httpx.WriteTimeout,
+    httpx.WriteError,
+    httpx.RemoteProtocolError,
+)
+
 
 class TelegramAPIError(RuntimeError):
-    pass
+    def __init__(
+        self,
+        message: str,
+        *,
+        status_code: int | None = None,
+        error_code: int | None = None,
+        description: str = "",
+        retry_after: int | None = None,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.error_code = error_code
+        self.description = description
+        self.retry_after = retry_after
+
+
+FilesFactory = Callable[[], dict[str, Any]]
 
 
 class TelegramClient:
-    def __init__(self, token: str) -> None:
-        self._base_url = f"https://api.telegram.org/bot{token}"
+    """
+    Bot API client on top of one long-lived pooled `httpx.AsyncClient`.
+
+    Retry policy:
+    - 429: sleep for `parameters.retry_after` and resend (Telegram did not process it).
+      `on_retry_after(chat_id, seconds)` is told first, so the send scheduler
+      holds back the chat's other jobs as well.
+    - connect errors / 502 / 503: jittered exponential backoff, always retried.
+    - read errors / 500 / 504: retried only for idempotent methods, because
+      a send may already be visible in the channel.
+
+    If a `SQLiteFileIdStore` is given, uploaded media is remembered by content
+    hash and later sends of the same bytes reference the file_id instead of
+    uploading again.
+
+    With `local_mode=True` the client talks to a self-hosted Bot API server
+    (`telegram-bot-api --local`) that shares our filesystem: videos are passed
+    as `file://` paths instead of being streamed in a multipart body.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        *,
+        base_url: str = DEFAULT_API_BASE_URL,
+        local_mode: bool = False,
+        max_retries: int = 3,
+        max_retry_after: float = 60.0,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 30.0,
+        http_client: httpx.AsyncClient | None = None,
+        file_ids: SQLiteFileIdStore | None = None,
+        on_retry_after: Callable[[str | None, float], None] | None = None,
+    ) -> None:
+        self._base_url = f"{base_url.rstrip('/')}/bot{token}"
+        self._local_mode = local_mode
+        self._max_retries = max_retries
+        self._max_retry_after = max_retry_after
+        self._backoff_base = backoff_base
+        self._backoff_cap = backoff_cap
+        self._file_ids = file_ids
+        self._on_retry_after = on_retry_after
+        self._client = http_client or httpx.AsyncClient(
+            timeout=20.0,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter: uniform(0, min(cap, base * 2^attempt)).
+        return random.uniform(0, min(self._backoff_cap, self._backoff_base * (2**attempt)))
+
+    async def _request(
+        self,
+        method: str,
+        *,
+        json_payload: dict[str, Any] | None = None,
+        data: dict[str, Any] | None = None,
+        files: FilesFactory | None = None,
+        timeout: float = 20.0,
+        idempotent: bool = False,
+    ) -> Any:
+        url = f"{self._base_url}/{method}"
+        attempt = 0
+
+        while True:
+            try:
+                resp = await self._client.post(
+                    url,
+                    json=json_payload,
+                    data=data,
+                    files=files() if files else None,
+                    timeout=timeout,
+                )
+            except _SAFE_NETWORK_ERRORS as e:
+                if attempt >= self._max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                print(f"[TG] {method} {type(e).__name__}, retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except _AMBIGUOUS_NETWORK_ERRORS as e:
+                if not idempotent or attempt >= self._max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                print(f"[TG] {method} {type(e).__name__}, retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            try:
+                payload = resp.json()
+            except ValueError:
+                payload = {"ok": False, "description": resp.text[:500]}
+
+            if resp.is_success and payload.get("ok", False):
+                return payload.get("result")
 
-    async def send_message(self, chat_id: str, text: str) -> None:
-        url = f"{self._base_url}/sendMessage"
+            error = _build_error(resp.status_code, payload)
+            if error.retry_after is not None and self._on_retry_after is not None:
+                chat_id = (json_payload or data or {}).get("chat_id")
+                self._on_retry_after(
+                    None if chat_id is None else str(chat_id), float(error.retry_after)
+                )
+
+            if attempt < self._max_retries:
+                delay: float | None = None
+                if error.retry_after is not None:
+                    if error.retry_after <= self._max_retry_after:
+                        delay = float(error.retry_after)
+                elif resp.status_code in _SAFE_RETRY_STATUSES or (
+                    idempotent and resp.status_code in _AMBIGUOUS_RETRY_STATUSES
+                ):
+                    delay = self._backoff_delay(attempt)
+
+                if delay is not None:
+                    print(f"[TG] {method} HTTP {resp.status_code}, retry in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+
+            raise error
+
+    def _cached_file_id(self, kind: str, content_hash: str | None) -> str | None:
+        if self._file_ids is None or content_hash is None:
+            return None
+        return self._file_ids.get(kind, content_hash)
+
+    def _remember_file_id(self, kind: str, content_hash: str | None, file_id: str | None) -> None:
+        if self._file_ids is None or content_hash is None or not file_id:
+            return
+        self._file_ids.put(kind, content_hash, file_id)
+
+    def _forget_file_id(self, kind: str, content_hash: str | None) -> None:
+        if self._file_ids is None or content_hash is None:
+            return
+        self._file_ids.forget(kind, content_hash)
+
+    async def send_message(self, chat_id: str, text: str) -> dict[str, Any]:
         payload = {
             "chat_id": chat_id,
             "text": text,
             "parse_mode": "HTML",
             "disable_web_page_preview": True,
         }
+        return await self._request("sendMessage", json_payload=payload, timeout=20.0)
 
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.post(url, json=payload)
-            data = resp.json()
-
-        if not resp.is_success:
-            raise TelegramAPIError(f"HTTP {resp.status_code}: {data}")
-
-        if not data.get("ok", False):
-            raise TelegramAPIError(f"Telegram API error: {data}")
-
-    async def send_photo(self, chat_id: str, photo_bytes: bytes, caption: str) -> None:
-        url = f"{self._base_url}/sendPhoto"
-
-        files = {
-            "photo": ("image.jpg", BytesIO(photo_bytes), "image/jpeg"),
-        }
+    async def send_photo(self, chat_id: str, photo_bytes: bytes, caption: str) -> dict[str, Any]:
         data = {
             "chat_id": chat_id,
             "caption": caption,
             "parse_mode": "HTML",
         }
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            resp = await client.post(url, data=data, files=files)
-            payload = resp.json()
-
-        if not resp.is_success:
-            raise TelegramAPIError(f"HTTP {resp.status_code}: {payload}")
+        content_hash = hash_bytes(photo_bytes) if self._file_ids is not None else None
+        file_id = self._cached_file_id("photo", content_hash)
+        if file_id:
+            try:
+                return await self._request("sendPhoto", data={**data, "photo": file_id})
+            except TelegramAPIError as e:
+                if not _is_file_id_error(e):
+                    raise
+                print(f"[TG] cached photo file_id rejected, uploading: {e.description}")
+                self._forget_file_id("photo", content_hash)
 
-        if not payload.get("ok", False):
-            raise TelegramAPIError(f"Telegram API error: {payload}")
+        message = await self._request(
+            "sendPhoto",
+            data=data,
+            files=lambda: {"photo": ("image.jpg", photo_bytes, "image/jpeg")},
+            timeout=60.0,
+        )
+        self._remember_file_id("photo", content_hash, _message_file_id(message))
+        return message
 
     async def send_media_group(
         self,
         chat_id: str,
         images: list[bytes],
         caption: str,
-    ) -> None:
+    ) -> list[dict[str, Any]]:
         if not images:
             raise ValueError("images must not be empty")
 
-        url = f"{self._base_url}/sendMediaGroup"
+        hashes: list[str | None] = [
+            hash_bytes(image_bytes) if self._file_ids is not None else None
+            for image_bytes in images
+        ]
+        cached = [self._cached_file_id("photo", h) for h in hashes]
 
+        if any(cached):
+            try:
+                return await self._send_media_group_once(chat_id, images, hashes, cached, caption)
+            except TelegramAPIError as e:
+                if not _is_file_id_error(e):
+                    raise
+                print(f"[TG] cached album file_id rejected, uploading: {e.description}")
+                for h, file_id in zip(hashes, cached, strict=True):
+                    if file_id:
+                        self._forget_file_id("photo", h)
+
+        return await self._send_media_group_once(
+            chat_id, images, hashes, [None] * len(images), caption
+        )
+
+    async def _send_media_group_once(
+        self,
+        chat_id: str,
+        images: list[bytes],
+        hashes: list[str | None],
+        file_ids: list[str | None],
+        caption: str,
+    ) -> list[dict[str, Any]]:
         media = []
-        files: dict[str, tuple[str, BytesIO, str]] = {}
+        uploads: dict[str, bytes] = {}
+        for idx, (image_bytes, file_id) in enumerate(zip(images, file_ids, strict=True)):
+            if file_id:
+                media_ref = file_id
+            else:
+                media_ref = f"attach://photo{idx}"
+                uploads[f"photo{idx}"] = image_bytes
 
-        for idx, image_bytes in enumerate(images):
-            attach_name = f"photo{idx}"
             media_item = {
                 "type": "photo",
-                "media": f"attach://{attach_name}",
+                "media": media_ref,
             }
             if idx == 0 and caption:
                 media_item["caption"] = caption
                 media_item["parse_mode"] = "HTML"
-
             media.append(media_item)
-            files[attach_name] = (
-                f"{attach_name}.jpg",
-                BytesIO(image_bytes),
-                "image/jpeg",
-            )
 
         data = {
             "chat_id": chat_id,
             "media": json.dumps(media, ensure_ascii=False),
         }
+        messages = await self._request(
+            "sendMediaGroup",
+            data=data,
+            files=(
+                (
+                    lambda: {
+                        name: (f"{name}.jpg", image_bytes, "image/jpeg")
+                        for name, image_bytes in uploads.items()
+                    }
+                )
+                if uploads
+                else None
+            ),
+            timeout=120.0 if uploads else 20.0,
+        )
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            resp = await client.post(url, data=data, files=files)
-            payload = resp.json()
+        for h, file_id, message in zip(hashes, file_ids, messages or [], strict=False):
+            if not file_id:
+                self._remember_file_id("photo", h, _message_file_id(message))
 
-        if not resp.is_success:
-            raise TelegramAPIError(f"HTTP {resp.status_code}: {payload}")
+        return messages
 
-        if not payload.get("ok", False):
-            raise TelegramAPIError(f"Telegram API error: {payload}")
+    async def send_video(
+        self,
+        chat_id: str,
+        video_path: str,
+        caption: str,
+        *,
+        duration: float | None = None,
+        width: int | None = None,
+        height: int | None = None,
+    ) -> dict[str, Any]:
+        data = {
+            "chat_id": chat_id,
+            "caption": caption,
+            "parse_mode": "HTML",
+            "supports_streaming": "true",
+        }
+        # Known dimensions let clients lay out the player and start playback
+        # without fetching the file header first.
+        if duration:
+            data["duration"] = str(round(duration))
+        if width and height:
+            data["width"] = str(width)
+            data["height"] = str(height)
 
-    async def send_video(self, chat_id: str, video_path: str, caption: str) -> None:
-        url = f"{self._base_url}/sendVideo"
+        content_hash = await hash_file_async(video_path) if self._file_ids is not None else None
+        file_id = self._cached_file_id("video", content_hash)
+        if file_id:
+            try:
+                return await self._request("sendVideo", data={**data, "video": file_id})
+            except TelegramAPIError as e:
+                if not _is_file_id_error(e):
+                    raise
+                print(f"[TG] cached video file_id rejected, uploading: {e.description}")
+                self._forget_file_id("video", content_hash)
+
+        if self._local_mode:
+            # The local server reads the file itself, nothing is copied over HTTP.
+            local_uri = Path(video_path).resolve().as_uri()
+            message = await self._request(
+                "sendVideo",
+                data={**data, "video": local_uri},
+                timeout=900.0,
+            )
+            self._remember_file_id("video", content_hash, _message_file_id(message))
+            return message
 
         with open(video_path, "rb") as f:
-            files = {
-                "video": (Path(video_path).name, f, "video/mp4"),
-            }
-            data = {
+
+            def _files() -> dict[str, Any]:
+                f.seek(0)
+                return {"video": (Path(video_path).name, f, "video/mp4")}
+
+            message = await self._request("sendVideo", data=data, files=_files, timeout=300.0)
+
+        self._remember_file_id("video", content_hash, _message_file_id(message))
+        return message
+
+    async def edit_message_caption(
+        self, chat_id: str, message_id: int, caption: str
+    ) -> dict[str, Any]:
+        payload = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "caption": caption,
+            "parse_mode": "HTML",
+        }
+        # An edit applied twice looks the same, so ambiguous failures are retried.
+        return await self._request("editMessageCaption", json_payload=payload, idempotent=True)
+
+    async def edit_message_video(
+        self,
+        chat_id: str,
+        message_id: int,
+        video_path: str,
+        caption: str,
+        *,
+        duration: float | None = None,
+        width: int | None = None,
+        height: int | None = None,
+    ) -> dict[str, Any]:
+        """
+        Replaces the media of a sent photo/video message with `video_path`
+        through editMessageMedia. The caption has to be passed again, otherwise
+        Telegram clears it.
+        """
+        media: dict[str, Any] = {
+            "type": "video",
+            "caption": caption,
+            "parse_mode": "HTML",
+            "supports_streaming": True,
+        }
+        if duration:
+            media["duration"] = round(duration)
+        if width and height:
+            media["width"] = width
+            media["height"] = height
+
+        def _data(media_ref: str) -> dict[str, Any]:
+            return {
                 "chat_id": chat_id,
-                "caption": caption,
-                "parse_mode": "HTML",
-                "supports_streaming": "true",
+                "message_id": str(message_id),
+                "media": json.dumps({**media, "media": media_ref}, ensure_ascii=False),
             }
 
-            async with httpx.AsyncClient(timeout=300.0) as client:
-                resp = await client.post(url, data=data, files=files)
-                payload = resp.json()
+        content_hash = await hash_file_async(video_path) if self._file_ids is not None else None
+        file_id = self._cached_file_id("video", content_hash)
+        if file_id:
+            try:
+                return await self._request("editMessageMedia", data=_data(file_id), idempotent=True)
+            except TelegramAPIError as e:
+                if not _is_file_id_error(e):
+                    raise
+                print(f"[TG] cached video file_id rejected, uploading: {e.description}")
+                self._forget_file_id("video", content_hash)
+
+        if self._local_mode:
+            message = await self._request(
+                "editMessageMedia",
+                data=_data(Path(video_path).resolve().as_uri()),
+                timeout=900.0,
+                idempotent=True,
+            )
+        else:
+            with open(video_path, "rb") as f:
+
+                def _files() -> dict[str, Any]:
+                    f.seek(0)
+                    return {"video": (Path(video_path).name, f, "video/mp4")}
+
+                message = await self._request(
+                    "editMessageMedia",
+                    data=_data("attach://video"),
+                    files=_files,
+                    timeout=300.0,
+                    idempotent=True,
+                )
+
+        if isinstance(message, dict):
+            self._remember_file_id("video", content_hash, _message_file_id(message))
+        return message
+
+
+def _message_file_id(message: dict[str, Any] | None) -> str | None:
+    if not message:
+        return None
+
+    photos = message.get("photo") or []
+    if photos:
+        # PhotoSize list is ordered from smallest to largest.
+        return photos[-1].get("file_id")
+
+    for key in ("video", "animation", "document"):
+        media = message.get(key)
+        if media and media.get("file_id"):
+            return media["file_id"]
+
+    return None
+
+
+def _is_file_id_error(exc: TelegramAPIError) -> bool:
+    if exc.status_code != 400:
+        return False
+    description = exc.description.lower()
+    return "file identifier" in description or "file reference" in description
+
+
+def _build_error(status_code: int, payload: dict[str, Any]) -> TelegramAPIError:
+    parameters = payload.get("parameters") or {}
+    retry_after = parameters.get("retry_after")
+    if not isinstance(retry_after, int):
+        retry_after = None
 
-        if not resp.is_success:
-            raise TelegramAPIError(f"HTTP {resp.status_code}: {payload}")
+    if status_code >= 400:
+        message = f"HTTP {status_code}: {payload}"
+    else:
+        message = f"Telegram API error: {payload}"
 
-        if not payload.get("ok", False):
-            raise TelegramAPIError(f"Telegram API error: {payload}")
+    return TelegramAPIError(
+        message,
+        status_code=status_code,
+        error_code=payload.get("error_code"),
+        description=str(payload.get("description") or ""),
+        retry_after=retry_after,
+    )
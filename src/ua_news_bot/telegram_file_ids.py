@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from time import time
+
+FILE_HASH_CACHE_SIZE = 256
+
+_file_hashes: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+
+
+def hash_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+async def hash_file_async(path: str) -> str:
+    """
+    sha256 of a file, computed in a worker thread so large videos do not block
+    the event loop, and remembered by (path, size, mtime) so the cache, the
+    file_id lookup and the upload of the same file hash it once.
+    """
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _file_hashes.get(key)
+    if digest is not None:
+        _file_hashes.move_to_end(key)
+        return digest
+
+    digest = await asyncio.to_thread(hash_file, path)
+    _file_hashes[key] = digest
+    if len(_file_hashes) > FILE_HASH_CACHE_SIZE:
+        _file_hashes.popitem(last=False)
+    return digest
+
+
+class SQLiteFileIdStore:
+    """
+    Persistent map: (media kind, sha256 of uploaded bytes) -> Telegram file_id.
+
+    file_ids are bound to the bot token, not to a chat, so one upload can be
+    reused for resends, fallbacks and other channels of the same bot.
+    """
+
+    def __init__(self, db_path: str = "data/seen.sqlite3") -> None:
+        path = Path(db_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS telegram_file_ids (
+                kind TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                PRIMARY KEY (kind, content_hash)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, kind: str, content_hash: str) -> str | None:
+        cur = self._conn.execute(
+            "SELECT file_id FROM telegram_file_ids WHERE kind = ? AND content_hash = ?",
+            (kind, content_hash),
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def put(self, kind: str, content_hash: str, file_id: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO telegram_file_ids "
+            "(kind, content_hash, file_id, created_at) VALUES (?, ?, ?, ?)",
+            (kind, content_hash, file_id, int(time())),
+        )
+        self._conn.commit()
+
+    def forget(self, kind: str, content_hash: str) -> None:
+        self._conn.execute(
+            "DELETE FROM telegram_file_ids WHERE kind = ? AND content_hash = ?",
+            (kind, content_hash),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from time import time
+from typing import Any
+
+from ua_news_bot.models import NewsItem, Source
+
+# Item states, in order. sent / skipped / failed / expired are terminal.
+STATE_FETCHED = "fetched"
+STATE_ENHANCED = "enhanced"
+STATE_MEDIA_READY = "media_ready"
+STATE_SENT = "sent"
+STATE_SKIPPED = "skipped"
+STATE_FAILED = "failed"
+# Waited in the backlog longer than the freshness window.
+STATE_EXPIRED = "expired"
+
+TERMINAL_STATES = (STATE_SENT, STATE_SKIPPED, STATE_FAILED, STATE_EXPIRED)
+
+
+def item_to_json(item: NewsItem) -> str:
+    return json.dumps(
+        {
+            "source": item.source.value,
+            "title": item.title,
+            "url": item.url,
+            "published_at": item.published_at.isoformat() if item.published_at else None,
+            "summary": item.summary,
+            "image_urls": list(item.image_urls),
+            "video_urls": list(item.video_urls),
+        },
+        ensure_ascii=False,
+    )
+
+
+def item_from_json(raw: str) -> NewsItem:
+    data = json.loads(raw)
+    published_at = data.get("published_at")
+    return NewsItem(
+        source=Source(data["source"]),
+        title=data["title"],
+        url=data["url"],
+        published_at=datetime.fromisoformat(published_at) if published_at else None,
+        summary=data.get("summary"),
+        image_urls=tuple(data.get("image_urls") or ()),
+        video_urls=tuple(data.get("video_urls") or ()),
+    )
+
+
+@dataclass
+class WorkItem:
+    item: NewsItem
+    state: str
+    attempts: int = 0
+    ai_text: str | None = None
+    # Prepared media that survives a restart: branded video paths by branding key.
+    artifacts: dict[str, str] = field(default_factory=dict)
+    delivered: set[str] = field(default_factory=set)
+    # Chat whose send was started but not confirmed when the process stopped.
+    in_flight: str | None = None
+    last_error: str | None = None
+    # Unix time the item was queued.
+    queued_at: int = 0
+
+
+class SQLiteWorkQueue:
+    """
+    Durable per-item pipeline state: fetched -> enhanced -> media_ready -> sent
+    (or skipped / failed), stored next to the dedup table.
+
+    Every stage is committed as soon as it completes, so after a crash an item
+    resumes from its last completed stage: the AI text is reused, prepared
+    video files are picked up again, and chats that already got the post are
+    not sent to again. A chat whose send was in flight at the crash is treated
+    as delivered: a possibly missing post is preferred over a duplicate.
+    """
+
+    def __init__(self, db_path: str = "data/seen.sqlite3", max_attempts: int = 3) -> None:
+        path = Path(db_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_attempts = max(1, max_attempts)
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS work_queue (
+                url TEXT PRIMARY KEY,
+                item_json TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                ai_text TEXT,
+                artifacts TEXT NOT NULL DEFAULT '{}',
+                delivered TEXT NOT NULL DEFAULT '[]',
+                in_flight TEXT,
+                last_error TEXT,
+                created_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS work_queue_state ON work_queue (state)")
+        self._conn.commit()
+
+    def enqueue(self, item: NewsItem) -> bool:
+        """Adds a new item in state fetched. Returns False if it is already queued."""
+        now = int(time())
+        cur = self._conn.execute(
+            "INSERT OR IGNORE INTO work_queue "
+            "(url, item_json, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (item.url, item_to_json(item), STATE_FETCHED, now, now),
+        )
+        self._conn.commit()
+        return cur.rowcount > 0
+
+    def get(self, url: str) -> WorkItem | None:
+        cur = self._conn.execute(
+            f"SELECT {_COLUMNS} FROM work_queue WHERE url = ?",
+            (url,),
+        )
+        row = cur.fetchone()
+        return _work_item(row) if row else None
+
+    def pending(self) -> list[WorkItem]:
+        """Items not in a terminal state, oldest first."""
+        cur = self._conn.execute(
+            f"SELECT {_COLUMNS} FROM work_queue "
+            f"WHERE state NOT IN ({', '.join('?' * len(TERMINAL_STATES))}) "
+            "ORDER BY created_at, rowid",
+            TERMINAL_STATES,
+        )
+        return [_work_item(row) for row in cur.fetchall()]
+
+    def set_enhanced(self, url: str, ai_text: str | None) -> None:
+        self._update(url, "state = ?, ai_text = ?", (STATE_ENHANCED, ai_text))
+
+    def set_media_ready(self, url: str, artifacts: dict[str, str]) -> None:
+        self._update(url, "state = ?, artifacts = ?", (STATE_MEDIA_READY, json.dumps(artifacts)))
+
+    def begin_send(self, url: str, chat_id: str) -> None:
+        self._update(url, "in_flight = ?", (chat_id,))
+
+    def mark_delivered(self, url: str, chat_id: str) -> None:
+        work = self.get(url)
+        delivered = sorted((work.delivered if work else set()) | {chat_id})
+        self._update(url, "delivered = ?, in_flight = NULL", (json.dumps(delivered),))
+
+    def finish(self, url: str, state: str, error: str | None = None) -> None:
+        self._update(url, "state = ?, in_flight = NULL, last_error = ?", (state, error))
+
+    def record_failure(self, url: str, error: str) -> bool:
+        """
+        Counts a failed attempt. Returns True when the item is given up
+        (state failed) after `max_attempts`. A send that raised has reported
+        its failure, so it no longer counts as in flight.
+        """
+        self._update(url, "attempts = attempts + 1, in_flight = NULL, last_error = ?", (error,))
+        work = self.get(url)
+        if work is not None and work.attempts >= self._max_attempts:
+            self.finish(url, STATE_FAILED, error)
+            return True
+        return False
+
+    def forget_finished(self) -> int:
+        """Deletes items in a terminal state, so they can be queued again."""
+        cur = self._conn.execute(
+            f"DELETE FROM work_queue WHERE state IN ({', '.join('?' * len(TERMINAL_STATES))})",
+            TERMINAL_STATES,
+        )
+        self._conn.commit()
+        return cur.rowcount
+
+    def sent_since(self, since: float) -> int:
+        """Items sent at or after unix time `since`, by any worker."""
+        cur = self._conn.execute(
+            "SELECT COUNT(*) FROM work_queue WHERE state = ? AND updated_at >= ?",
+            (STATE_SENT, int(since)),
+        )
+        return cur.fetchone()[0]
+
+    def stats(self) -> dict[str, int]:
+        cur = self._conn.execute("SELECT state, COUNT(*) FROM work_queue GROUP BY state")
+        return dict(cur.fetchall())
+
+    def format_stats(self) -> str:
+        return " ".join(f"{state}={count}" for state, count in sorted(self.stats().items()))
+
+    def _update(self, url: str, assignments: str, params: tuple[Any, ...]) -> None:
+        self._conn.execute(
+            f"UPDATE work_queue SET {assignments}, updated_at = ? WHERE url = ?",
+            (*params, int(time()), url),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_COLUMNS = (
+    "item_json, state, attempts, ai_text, artifacts, delivered, in_flight, last_error, created_at"
+)
+
+
+def _work_item(row: tuple[Any, ...]) -> WorkItem:
+    (
+        item_json,
+        state,
+        attempts,
+        ai_text,
+        artifacts,
+        delivered,
+        in_flight,
+        last_error,
+        created_at,
+    ) = row
+    return WorkItem(
+        item=item_from_json(item_json),
+        state=state,
+        attempts=attempts,
+        ai_text=ai_text,
+        artifacts=json.loads(artifacts or "{}"),
+        delivered=set(json.loads(delivered or "[]")),
+        in_flight=in_flight,
+        last_error=last_error,
+        queued_at=created_at,
+    )
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import unittest
+from datetime import UTC, datetime
+
+from ua_news_bot.backlog import backlog_score, plan_drain
+from ua_news_bot.models import NewsItem, Source
+from ua_news_bot.work_queue import STATE_ENHANCED, STATE_FETCHED, WorkItem
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=UTC).timestamp()
+
+
+def _work(
+    url: str,
+    minutes_old: float,
+    *,
+    state: str = STATE_FETCHED,
+    title: str = "Новина",
+    video: bool = False,
+) -> WorkItem:
+    published_at = datetime.fromtimestamp(NOW - minutes_old * 60, UTC).replace(tzinfo=None)
+    item = NewsItem(
+        source=Source.SUSPILNE,
+        title=title,
+        url=url,
+        published_at=published_at,
+        video_urls=("https://cdn/v.mp4",) if video else (),
+    )
+    return WorkItem(item=item, state=state)
+
+
+def _plan(pending: list[WorkItem], budget: int):
+    return plan_drain(
+        pending,
+        NOW,
+        budget=budget,
+        max_age_seconds=3600,
+        source_weights={},
+        priority=lambda item: 0 if "Терміново" in item.title else 1,
+    )
+
+
+class TestBacklogScore(unittest.TestCase):
+    def test_recency_media_and_source_weight(self) -> None:
+        def score(work: WorkItem, weights: dict[str, float] | None = None) -> float:
+            return backlog_score(work, NOW, half_life_seconds=1800, source_weights=weights or {})
+
+        self.assertAlmostEqual(score(_work("a", 0)), 1.0)
+        self.assertAlmostEqual(score(_work("a", 30)), 0.5)
+        self.assertAlmostEqual(score(_work("a", 0, video=True)), 1.5)
+        self.assertAlmostEqual(score(_work("a", 0), {Source.SUSPILNE.value: 2.0}), 2.0)
+
+
+class TestPlanDrain(unittest.TestCase):
+    def test_takes_best_items_within_budget_and_expires_stale(self) -> None:
+        pending = [
+            _work("old", 90),
+            _work("plain", 10),
+            _work("fresh", 1),
+            _work("breaking", 50, title="Терміново: новина"),
+        ]
+
+        plan = _plan(pending, budget=2)
+
+        self.assertEqual([w.item.url for w in plan.post], ["breaking", "fresh"])
+        self.assertEqual([w.item.url for w in plan.waiting], ["plain"])
+        self.assertEqual([w.item.url for w in plan.expired], ["old"])
+
+    def test_unfinished_items_are_always_resumed(self) -> None:
+        pending = [_work("fresh", 1), _work("half-done", 120, state=STATE_ENHANCED)]
+
+        plan = _plan(pending, budget=0)
+
+        self.assertEqual([w.item.url for w in plan.post], ["half-done"])
+        self.assertEqual([w.item.url for w in plan.waiting], ["fresh"])
+        self.assertEqual(plan.expired, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import os
+import unittest
+from unittest.mock import patch
+
+from ua_news_bot.config import (
+    CLOUD_DEFAULT_MAX_VIDEO_UPLOAD_MB,
+    LOCAL_DEFAULT_MAX_VIDEO_UPLOAD_MB,
+    ChannelTarget,
+    _parse_extra_channels,
+    load_settings,
+)
+
+
+def _parse(value: str | None) -> list[ChannelTarget]:
+    return _parse_extra_channels(
+        value,
+        primary_chat_id="@main",
+        channel_cta_text="Підписатися",
+        channel_cta_url="https://t.me/main",
+        watermark_text="main",
+        watermark_logo_path="logo.png",
+    )
+
+
+def _load(**env: str):
+    environ = {"TELEGRAM_BOT_TOKEN": "TOKEN", "TELEGRAM_CHAT_ID": "@main", **env}
+    with patch.dict(os.environ, environ, clear=True), patch("ua_news_bot.config.load_dotenv"):
+        return load_settings()
+
+
+class TestExtraChannels(unittest.TestCase):
+    def test_empty_value_means_no_extra_channels(self) -> None:
+        self.assertEqual(_parse(None), [])
+        self.assertEqual(_parse("  "), [])
+
+    def test_entries_inherit_primary_branding_unless_overridden(self) -> None:
+        channels = _parse(
+            '["@kyiv", -1001, {"chat_id": " @en ", "cta_text": "Subscribe",'
+            ' "watermark_text": "news en"}]'
+        )
+
+        self.assertEqual([c.chat_id for c in channels], ["@kyiv", "-1001", "@en"])
+        self.assertEqual(channels[0].watermark_text, "main")
+        self.assertEqual(channels[0].channel_cta_url, "https://t.me/main")
+        self.assertEqual(channels[2].channel_cta_text, "Subscribe")
+        self.assertEqual(channels[2].channel_cta_url, "https://t.me/main")
+        self.assertEqual(channels[2].watermark_text, "news en")
+        self.assertEqual(channels[2].watermark_logo_path, "logo.png")
+
+    def test_malformed_values_are_rejected(self) -> None:
+        for value in (
+            "@kyiv,@en",
+            '{"chat_id": "@kyiv"}',
+            '[{"cta_text": "no chat"}]',
+            '[""]',
+            "[null]",
+            "[[]]",
+        ):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                _parse(value)
+
+    def test_repeated_or_primary_chat_is_rejected(self) -> None:
+        for value in ('["@kyiv", {"chat_id": "@kyiv"}]', '["@main"]', '[" @main "]'):
+            with self.subTest(value=value), self.assertRaisesRegex(ValueError, "repeats"):
+                _parse(value)
+
+    def test_load_settings_lists_primary_first(self) -> None:
+        settings = _load(TELEGRAM_EXTRA_CHANNELS='["@kyiv"]', WATERMARK_TEXT="wm")
+
+        targets = settings.channel_targets()
+        self.assertEqual([t.chat_id for t in targets], ["@main", "@kyiv"])
+        self.assertEqual(targets[1].watermark_text, "wm")
+
+        with self.assertRaises(ValueError):
+            _load(TELEGRAM_EXTRA_CHANNELS='["@main"]')
+
+
+class TestLocalMode(unittest.TestCase):
+    def test_custom_endpoint_alone_keeps_cloud_uploads(self) -> None:
+        settings = _load(TELEGRAM_API_BASE_URL="https://tg-proxy.example/")
+
+        self.assertEqual(settings.telegram_api_base_url, "https://tg-proxy.example")
+        self.assertFalse(settings.telegram_local_mode)
+        self.assertEqual(settings.max_video_upload_mb, CLOUD_DEFAULT_MAX_VIDEO_UPLOAD_MB)
+
+    def test_local_mode_is_opt_in(self) -> None:
+        settings = _load(TELEGRAM_API_BASE_URL="http://127.0.0.1:8081", TELEGRAM_LOCAL_MODE="true")
+
+        self.assertTrue(settings.telegram_local_mode)
+        self.assertEqual(settings.max_video_upload_mb, LOCAL_DEFAULT_MAX_VIDEO_UPLOAD_MB)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from ua_news_bot.dedup_sqlite import SQLiteSeenStore
+
+
+class TestClaims(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        db_path = str(Path(self._tmp.name) / "seen.sqlite3")
+        # Two workers, each with its own connection to the shared database.
+        self.a = SQLiteSeenStore(db_path)
+        self.b = SQLiteSeenStore(db_path)
+
+    def tearDown(self) -> None:
+        self.a.close()
+        self.b.close()
+        self._tmp.cleanup()
+
+    def test_one_worker_gets_the_claim_until_done(self) -> None:
+        self.assertTrue(self.a.claim("https://x/1", "a", 60))
+        self.assertFalse(self.b.claim("https://x/1", "b", 60))
+        self.assertTrue(self.b.claimed_by_other("https://x/1", "b"))
+        self.assertFalse(self.a.claimed_by_other("https://x/1", "a"))
+        self.assertTrue(self.a.renew("https://x/1", "a", 60))
+        self.assertFalse(self.b.renew("https://x/1", "b", 60))
+
+        self.a.mark_done("https://x/1", "a")
+
+        self.assertTrue(self.b.has("https://x/1"))
+        self.assertFalse(self.b.claim("https://x/1", "b", 60))
+
+    def test_released_or_expired_claim_can_be_taken(self) -> None:
+        self.assertTrue(self.a.claim("https://x/1", "a", 60))
+        self.a.release("https://x/1", "a")
+        self.assertTrue(self.b.claim("https://x/1", "b", 60))
+
+        with patch("ua_news_bot.dedup_sqlite.time", return_value=10**10):
+            self.assertFalse(self.b.renew("https://x/1", "b", 60))
+            self.assertTrue(self.a.claim("https://x/1", "a", 60))
+
+
+if __name__ == "__main__":
+    unittest.main()
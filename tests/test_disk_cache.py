@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from ua_news_bot.media.disk_cache import MediaDiskCache, branded_key, raw_key
+
+
+class TestMediaDiskCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_hit_miss_and_shared_blob(self) -> None:
+        cache = MediaDiskCache(self.root, max_bytes=1024)
+        self.assertIsNone(cache.get_bytes(raw_key("https://x/a.jpg")))
+
+        h1 = cache.put_bytes(raw_key("https://x/a.jpg"), b"abc")
+        h2 = cache.put_bytes(raw_key("https://x/b.jpg"), b"abc")
+
+        self.assertEqual(h1, h2)
+        self.assertEqual(cache.get_bytes(raw_key("https://x/b.jpg")), b"abc")
+        self.assertEqual(cache.stats(), {"raw_miss": 1, "raw_hit": 1})
+        cache.close()
+
+        reopened = MediaDiskCache(self.root, max_bytes=1024)
+        self.assertEqual(reopened.get_bytes(raw_key("https://x/a.jpg")), b"abc")
+        reopened.close()
+
+    def test_branded_key_depends_on_params(self) -> None:
+        self.assertEqual(branded_key("h", {"a": 1, "b": 2}), branded_key("h", {"b": 2, "a": 1}))
+        self.assertNotEqual(branded_key("h", {"a": 1}), branded_key("h", {"a": 2}))
+
+    def test_lru_eviction(self) -> None:
+        cache = MediaDiskCache(self.root, max_bytes=10)
+        cache.put_bytes("raw:a", b"a" * 4)
+        cache.put_bytes("raw:b", b"b" * 4)
+        cache.get_bytes("raw:a")
+        cache.put_bytes("raw:c", b"c" * 4)
+
+        self.assertIsNotNone(cache.get_bytes("raw:a"))
+        self.assertIsNone(cache.get_bytes("raw:b"))
+        self.assertIsNotNone(cache.get_bytes("raw:c"))
+        self.assertEqual(cache.stats()["evicted"], 1)
+        cache.close()
+
+    def test_get_file_returns_caller_owned_copy(self) -> None:
+        cache = MediaDiskCache(self.root, max_bytes=1024)
+        source = Path(self.root) / "video.mp4"
+        source.write_bytes(b"video")
+        cache.put_file("branded:x:y", str(source))
+        source.unlink()
+
+        first = cache.get_file("branded:x:y", suffix=".mp4")
+        self.assertIsNotNone(first)
+        self.assertTrue(first.endswith(".mp4"))
+        Path(first).unlink()
+
+        second = cache.get_file("branded:x:y", suffix=".mp4")
+        self.assertEqual(Path(second).read_bytes(), b"video")
+        Path(second).unlink()
+        cache.close()
+
+    def test_raw_keys_expire_after_ttl(self) -> None:
+        cache = MediaDiskCache(self.root, max_bytes=1024, raw_ttl_seconds=3600)
+        cache.put_bytes(raw_key("https://x/v.mp4"), b"old")
+        cache.put_bytes("branded:h:p", b"branded")
+
+        self.assertEqual(cache.get_bytes(raw_key("https://x/v.mp4")), b"old")
+        with patch("ua_news_bot.media.disk_cache.time", return_value=10**10):
+            self.assertIsNone(cache.get_bytes(raw_key("https://x/v.mp4")))
+            self.assertIsNotNone(cache.get_bytes("branded:h:p"))
+        self.assertEqual(cache.stats()["raw_expired"], 1)
+        cache.close()
+
+    def test_async_file_copies_run_off_the_loop(self) -> None:
+        cache = MediaDiskCache(self.root, max_bytes=1024)
+        source = Path(self.root) / "video.mp4"
+        source.write_bytes(b"video")
+
+        async def roundtrip() -> str | None:
+            await cache.put_file_async(raw_key("https://x/v.mp4"), str(source))
+            return await cache.get_file_async(raw_key("https://x/v.mp4"), suffix=".mp4")
+
+        copy = asyncio.run(roundtrip())
+        self.assertEqual(Path(copy).read_bytes(), b"video")
+        Path(copy).unlink()
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import tempfile
+import unittest
+from functools import partial
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+
+from ua_news_bot.media.downloader import (
+    DownloadTooLargeError,
+    download_image_bytes,
+    download_to_file,
+)
+
+
+def _patched_client(handler):
+    return patch(
+        "ua_news_bot.media.downloader.httpx.AsyncClient",
+        partial(httpx.AsyncClient, transport=httpx.MockTransport(handler)),
+    )
+
+
+async def _chunks(count: int, size: int):
+    for _ in range(count):
+        await asyncio.sleep(0)
+        yield b"x" * size
+
+
+class TestDownloader(unittest.IsolatedAsyncioTestCase):
+    async def test_image_rejected_by_content_length_before_body(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(
+                200,
+                headers={"content-type": "image/jpeg", "content-length": "5000"},
+                content=b"x" * 5000,
+            )
+
+        with _patched_client(handler), self.assertRaises(DownloadTooLargeError):
+            await download_image_bytes("https://x/a.jpg", max_bytes=1000)
+
+    async def test_image_wrong_content_type(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, headers={"content-type": "text/html"}, content=b"<html>")
+
+        with _patched_client(handler), self.assertRaises(ValueError):
+            await download_image_bytes("https://x/a.jpg")
+
+    async def test_video_streams_to_file(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(
+                200,
+                headers={"content-type": "video/mp4"},
+                content=_chunks(4, 1000),
+            )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "video.mp4"
+            with _patched_client(handler):
+                content_type = await download_to_file("https://x/v.mp4", str(target))
+
+            self.assertEqual(content_type, "video/mp4")
+            self.assertEqual(target.stat().st_size, 4000)
+
+    async def test_video_aborted_mid_stream_removes_partial_file(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            # No Content-Length: the cap has to trip while streaming.
+            return httpx.Response(
+                200,
+                headers={"content-type": "video/mp4"},
+                content=_chunks(10, 1000),
+            )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "video.mp4"
+            with _patched_client(handler), self.assertRaises(DownloadTooLargeError):
+                await download_to_file("https://x/v.mp4", str(target), max_bytes=2500)
+
+            self.assertFalse(target.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
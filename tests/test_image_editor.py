@@ -6,7 +6,12 @@ from pathlib import Path
 
 from PIL import Image, ImageChops, ImageStat
 
-from ua_news_bot.media.image_editor import add_branding_to_image
+from ua_news_bot.media.image_editor import (
+    _composite_region,
+    _render_text_sprite,
+    add_branding_to_image,
+    clear_branding_cache,
+)
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 LOGO_PATH = BASE_DIR / "data" / "images" / "smart_news_ua_logo.png"
@@ -110,6 +115,76 @@ class TestImageEditor(unittest.TestCase):
 
         self.assertGreater(diff, 1.0)
 
+    def test_large_images_are_downscaled_to_max_dimension(self) -> None:
+        original_bytes = self._make_base_image_bytes(width=5000, height=3000)
+
+        result_buffer = add_branding_to_image(
+            image_bytes=original_bytes,
+            watermark_text="Smart News UA",
+            logo_path=str(LOGO_PATH),
+            font_path=str(FONT_PATH),
+            max_dimension=2560,
+        )
+        result_img = self._open_image(result_buffer.getvalue())
+
+        self.assertEqual(result_img.size, (2500, 1500))
+
+    def test_large_palette_png_is_downscaled(self) -> None:
+        image = Image.new("P", (5000, 3000))
+        image.putpalette([40, 60, 90] * 256)
+        output = BytesIO()
+        image.save(output, format="PNG")
+
+        result_buffer = add_branding_to_image(
+            image_bytes=output.getvalue(),
+            watermark_text="Smart News UA",
+            logo_path=str(LOGO_PATH),
+            font_path=str(FONT_PATH),
+            max_dimension=2560,
+        )
+        result_img = self._open_image(result_buffer.getvalue())
+
+        self.assertEqual(result_img.size, (2500, 1500))
+
+    def test_branding_assets_are_cached_between_images(self) -> None:
+        clear_branding_cache()
+        original_bytes = self._make_base_image_bytes()
+
+        first = add_branding_to_image(
+            image_bytes=original_bytes,
+            watermark_text="Smart News UA",
+            logo_path=str(LOGO_PATH),
+            font_path=str(FONT_PATH),
+        )
+        second = add_branding_to_image(
+            image_bytes=original_bytes,
+            watermark_text="Smart News UA",
+            logo_path=str(LOGO_PATH),
+            font_path=str(FONT_PATH),
+        )
+
+        self.assertEqual(first.getvalue(), second.getvalue())
+        self.assertEqual(_render_text_sprite.cache_info().misses, 1)
+        self.assertEqual(_render_text_sprite.cache_info().hits, 1)
+
+    def test_region_compositing_matches_full_frame_blend(self) -> None:
+        image = Image.radial_gradient("L").resize((640, 360)).convert("RGB")
+        sprite = Image.linear_gradient("L").resize((200, 80)).convert("RGBA")
+        sprite.putalpha(Image.linear_gradient("L").rotate(90).resize((200, 80)))
+        # One sprite inside the frame, one clipped by the bottom-right corner.
+        placements = [(20, 30), (540, 320)]
+
+        # The previous path: a full-frame RGBA layer blended over the whole image.
+        layer = Image.new("RGBA", image.size, (0, 0, 0, 0))
+        for xy in placements:
+            layer.paste(sprite, xy)
+        expected = Image.alpha_composite(image.convert("RGBA"), layer).convert("RGB")
+
+        for xy in placements:
+            _composite_region(image, sprite, xy)
+
+        self.assertIsNone(ImageChops.difference(expected, image).getbbox())
+
     def test_asset_paths_are_resolved(self) -> None:
         self.assertTrue(True, f"Logo path checked: {LOGO_PATH}, font path checked: {FONT_PATH}")
 
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from ua_news_bot.media.jpeg_encoder import block_ssim, encode_jpeg_to_budget
+
+
+class TestJpegEncoder(unittest.TestCase):
+    def _make_photo(self, width: int = 1600, height: int = 900) -> Image.Image:
+        coarse = Image.effect_noise((width // 16, height // 16), 80).convert("RGB")
+        return coarse.resize((width, height), Image.BICUBIC)
+
+    def test_identical_images_have_ssim_one(self) -> None:
+        image = self._make_photo()
+        self.assertAlmostEqual(block_ssim(image, image), 1.0, places=4)
+
+    def test_max_quality_is_kept_when_it_fits(self) -> None:
+        result = encode_jpeg_to_budget(self._make_photo(), max_bytes=50 * 1024 * 1024)
+
+        self.assertEqual(result.quality, 95)
+        self.assertEqual(result.attempts, 1)
+
+    def test_output_fits_budget(self) -> None:
+        image = self._make_photo()
+        full = encode_jpeg_to_budget(image, max_bytes=50 * 1024 * 1024, min_ssim=None)
+        budget = len(full.data) // 2
+
+        result = encode_jpeg_to_budget(image, max_bytes=budget, min_ssim=None)
+
+        self.assertLessEqual(len(result.data), budget)
+        self.assertLess(result.quality, 95)
+        self.assertEqual(Image.open(BytesIO(result.data)).size, image.size)
+
+    def test_ssim_floor_wins_over_budget(self) -> None:
+        image = self._make_photo()
+
+        result = encode_jpeg_to_budget(image, max_bytes=1024, min_ssim=0.99)
+
+        self.assertGreater(len(result.data), 1024)
+        self.assertTrue(result.ssim is None or result.ssim >= 0.99)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,650 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import sqlite3
+import sys
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+import httpx
+
+from ua_news_bot.config import ChannelTarget, Settings
+from ua_news_bot.dedup_sqlite import SQLiteSeenStore
+from ua_news_bot.main import (
+    ClaimLease,
+    LateVideoSwaps,
+    MediaPrefetcher,
+    _claim_backlog,
+    _download_ytdlp_video,
+    _ItemMedia,
+    _plan_backlog,
+    _video_branding_params,
+    run_once,
+)
+from ua_news_bot.media.disk_cache import MediaDiskCache, branded_key
+from ua_news_bot.media.video_jobs import VideoJobManager
+from ua_news_bot.media.video_resolver import ResolvedVideo
+from ua_news_bot.models import NewsItem, Source
+from ua_news_bot.published_messages import (
+    MEDIA_PLACEHOLDER,
+    MEDIA_SWAPPED,
+    SQLitePublishedMessageStore,
+)
+from ua_news_bot.send_scheduler import SendScheduler
+from ua_news_bot.telegram_client import TelegramClient
+from ua_news_bot.telegram_file_ids import hash_bytes
+from ua_news_bot.work_queue import STATE_SENT, STATE_SKIPPED, SQLiteWorkQueue
+
+_MULTIPART_CHAT_RE = re.compile(rb'name="chat_id"\r\n\r\n([^\r]+)')
+
+
+def _item(n: int, **kwargs) -> NewsItem:
+    return NewsItem(
+        source=Source.SUSPILNE,
+        title=f"Новина {n}",
+        url=f"https://suspilne.media/{n}",
+        summary="Текст новини",
+        **kwargs,
+    )
+
+
+class FakeSource:
+    name = "fake"
+    not_modified = False
+
+    def __init__(self, items: list[NewsItem]) -> None:
+        self.items = items
+
+    async def fetch_latest(self, limit: int = 20) -> list[NewsItem]:
+        return self.items[:limit]
+
+
+class FakeTelegram:
+    """Bot API over httpx.MockTransport: records (method, chat_id) of every call."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, str]] = []
+        # Chats, or Bot API methods, whose calls fail with a 400.
+        self.failing: set[str] = set()
+        self._message_id = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        method = request.url.path.rsplit("/", 1)[-1]
+        chat_id = _chat_id(request)
+        self.calls.append((method, chat_id))
+        if chat_id in self.failing or method in self.failing:
+            error = "message to edit not found" if method.startswith("edit") else "chat not found"
+            return httpx.Response(
+                400,
+                json={"ok": False, "error_code": 400, "description": f"Bad Request: {error}"},
+            )
+        self._message_id += 1
+        result = {"message_id": self._message_id, "photo": [{"file_id": "PHOTO"}]}
+        return httpx.Response(200, json={"ok": True, "result": result})
+
+    def client(self) -> TelegramClient:
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        return TelegramClient("TOKEN", backoff_base=0.0, http_client=http_client)
+
+    def chats(self) -> list[str]:
+        return [chat_id for _, chat_id in self.calls]
+
+
+def _chat_id(request: httpx.Request) -> str:
+    body = request.content
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        return str(json.loads(body).get("chat_id", ""))
+    if content_type.startswith("multipart/"):
+        match = _MULTIPART_CHAT_RE.search(body)
+        return match.group(1).decode() if match else ""
+    return parse_qs(body.decode()).get("chat_id", [""])[0]
+
+
+async def _no_video(item):
+    return None
+
+
+class RunOnceTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tmp = Path(self._tmp.name)
+        self.db_path = str(self.tmp / "seen.sqlite3")
+        self.telegram = FakeTelegram()
+        self.tg = self.telegram.client()
+        self.scheduler = SendScheduler()
+        self.patch("ua_news_bot.main.resolve_video_for_item", _no_video)
+
+    async def asyncTearDown(self) -> None:
+        await self.tg.aclose()
+
+    def patch(self, target: str, value) -> None:
+        patcher = patch(target, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def settings(self, **overrides) -> Settings:
+        values = {
+            "telegram_bot_token": "TOKEN",
+            "telegram_chat_id": "@a",
+            "dry_run": False,
+            "max_posts_per_run": 5,
+            "dedup_db_path": self.db_path,
+            "worker_id": "worker-a",
+            "extra_channels": [ChannelTarget(chat_id="@b")],
+        }
+        values.update(overrides)
+        return Settings(**values)
+
+    async def run_cycle(self, settings: Settings, items: list[NewsItem], **kwargs) -> int:
+        dedup = kwargs.pop("dedup", None) or SQLiteSeenStore(settings.dedup_db_path)
+        queue = kwargs.pop("work_queue", None) or SQLiteWorkQueue(settings.dedup_db_path)
+        try:
+            return await run_once(
+                tg=self.tg,
+                scheduler=self.scheduler,
+                settings=settings,
+                dedup=dedup,
+                work_queue=queue,
+                sources=[FakeSource(items)],
+                **kwargs,
+            )
+        finally:
+            dedup.close()
+            queue.close()
+
+
+class TestWorkQueueResume(RunOnceTestCase):
+    async def test_delivered_chat_is_not_sent_again_on_resume(self) -> None:
+        item = _item(1)
+        queue = SQLiteWorkQueue(self.db_path)
+        queue.enqueue(item)
+        queue.set_enhanced(item.url, "Текст після AI")
+        queue.mark_delivered(item.url, "@a")
+        queue.close()
+
+        sent = await self.run_cycle(self.settings(), [item])
+
+        self.assertEqual(sent, 1)
+        self.assertEqual(self.telegram.chats(), ["@b"])
+        queue = SQLiteWorkQueue(self.db_path)
+        self.assertEqual(queue.get(item.url).state, STATE_SENT)
+        queue.close()
+
+    async def test_interrupted_send_is_not_repeated(self) -> None:
+        item = _item(1)
+        queue = SQLiteWorkQueue(self.db_path)
+        queue.enqueue(item)
+        queue.set_enhanced(item.url, None)
+        queue.begin_send(item.url, "@a")
+        queue.close()
+
+        await self.run_cycle(self.settings(), [item])
+
+        self.assertEqual(self.telegram.chats(), ["@b"])
+
+    async def test_failed_chat_is_retried_alone(self) -> None:
+        item = _item(1)
+        self.telegram.failing = {"@b"}
+
+        self.assertEqual(await self.run_cycle(self.settings(), [item]), 0)
+        # The fallback path retries the failed chat once, never the delivered one.
+        self.assertEqual(self.telegram.chats(), ["@a", "@b", "@b"])
+
+        self.telegram.failing = set()
+        self.telegram.calls.clear()
+        self.assertEqual(await self.run_cycle(self.settings(), [item]), 1)
+        self.assertEqual(self.telegram.chats(), ["@b"])
+
+        dedup = SQLiteSeenStore(self.db_path)
+        self.assertTrue(dedup.has(item.url))
+        dedup.close()
+
+    async def test_dedup_reset_keeps_unfinished_items(self) -> None:
+        done, unfinished = _item(1), _item(2)
+        await self.run_cycle(self.settings(), [done])
+        queue = SQLiteWorkQueue(self.db_path)
+        queue.enqueue(unfinished)
+        queue.set_enhanced(unfinished.url, None)
+        queue.mark_delivered(unfinished.url, "@a")
+
+        dedup = SQLiteSeenStore(self.db_path)
+        self.assertEqual(dedup.reset(), 1)
+        self.assertEqual(queue.forget_finished(), 1)
+        self.assertFalse(dedup.has(done.url))
+        self.assertEqual(queue.get(unfinished.url).delivered, {"@a"})
+        dedup.close()
+        queue.close()
+
+        self.telegram.calls.clear()
+        await self.run_cycle(self.settings(), [done, unfinished])
+
+        self.assertEqual(
+            sorted(self.telegram.calls),
+            [
+                ("sendMessage", "@a"),
+                ("sendMessage", "@b"),
+                ("sendMessage", "@b"),
+            ],
+        )
+
+
+class TestBacklogClaims(RunOnceTestCase):
+    """Two workers, "worker-a" and "worker-b", sharing one database."""
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.queue = SQLiteWorkQueue(self.db_path)
+        self.dedup_a = SQLiteSeenStore(self.db_path)
+        self.dedup_b = SQLiteSeenStore(self.db_path)
+        for store in (self.queue, self.dedup_a, self.dedup_b):
+            self.addCleanup(store.close)
+
+    def claim(self, dedup: SQLiteSeenStore, worker_id: str, **overrides) -> tuple[list, int]:
+        settings = self.settings(worker_id=worker_id, **overrides)
+        return _claim_backlog(self.queue, dedup, _plan_backlog(self.queue, settings), settings)
+
+    async def test_racing_workers_post_each_item_once(self) -> None:
+        items = [_item(1), _item(2)]
+        a = self.run_cycle(self.settings(worker_id="worker-a"), items)
+        b = self.run_cycle(self.settings(worker_id="worker-b"), items)
+
+        self.assertEqual(sum(await asyncio.gather(a, b)), 2)
+        self.assertEqual(Counter(self.telegram.chats()), {"@a": 2, "@b": 2})
+
+    async def test_claims_skip_items_held_by_the_other_worker(self) -> None:
+        first, second = _item(1), _item(2)
+        self.queue.enqueue(first)
+        self.queue.enqueue(second)
+
+        claimed_a, _ = self.claim(self.dedup_a, "worker-a", max_posts_per_run=1)
+        claimed_b, _ = self.claim(self.dedup_b, "worker-b", max_posts_per_run=1)
+
+        self.assertEqual(claimed_a, [first])
+        # b's share is one item too, taken from further down the plan.
+        self.assertEqual(claimed_b, [second])
+
+    async def test_expired_lease_is_taken_over(self) -> None:
+        item = _item(1)
+        self.queue.enqueue(item)
+        # worker-a claimed the item and stalled past its lease.
+        self.assertTrue(self.dedup_a.claim(item.url, "worker-a", 0.05))
+        self.assertEqual(self.claim(self.dedup_b, "worker-b")[0], [])
+        await asyncio.sleep(0.06)
+
+        self.assertEqual(self.claim(self.dedup_b, "worker-b")[0], [item])
+
+        # When worker-a wakes up, its lease is gone and releasing keeps b's claim.
+        lease = ClaimLease(self.dedup_a, item.url, "worker-a", 0.03)
+        await asyncio.sleep(0.03)
+        self.assertTrue(lease.lost)
+        await lease.release()
+        self.assertTrue(self.dedup_a.claimed_by_other(item.url, "worker-a"))
+
+    async def test_lease_is_renewed_until_released(self) -> None:
+        item = _item(1)
+        self.assertTrue(self.dedup_a.claim(item.url, "worker-a", 0.06))
+        lease = ClaimLease(self.dedup_a, item.url, "worker-a", 0.06)
+
+        await asyncio.sleep(0.15)
+        self.assertFalse(lease.lost)
+        self.assertFalse(self.dedup_b.claim(item.url, "worker-b", 60))
+
+        await lease.release()
+        self.assertTrue(self.dedup_b.claim(item.url, "worker-b", 60))
+
+    async def test_seen_but_unfinished_rows_are_closed(self) -> None:
+        delivered, undelivered = _item(1), _item(2)
+        for item in (delivered, undelivered):
+            self.queue.enqueue(item)
+            # The process stopped between marking the item seen and finishing its row.
+            self.dedup_a.mark_done(item.url, "worker-a")
+        self.queue.mark_delivered(delivered.url, "@a")
+
+        self.assertEqual(self.claim(self.dedup_b, "worker-b"), ([], 2))
+        self.assertEqual(self.queue.get(delivered.url).state, STATE_SENT)
+        self.assertEqual(self.queue.get(undelivered.url).state, STATE_SKIPPED)
+        self.assertEqual(self.queue.pending(), [])
+
+
+class TestChannelFanOut(RunOnceTestCase):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.downloads = 0
+        # Watermark text of every video branding run.
+        self.renders: list[str] = []
+
+        async def resolve(item):
+            return ResolvedVideo(kind="direct", url="https://cdn/v.mp4")
+
+        async def download(resolved, referer, settings, cache):
+            self.downloads += 1
+            path = self.tmp / f"raw-{self.downloads}.mp4"
+            path.write_bytes(b"v" * 6000)
+            return str(path)
+
+        async def brand(path, settings, target, cache):
+            self.renders.append(target.watermark_text)
+            branded = self.tmp / f"branded-{len(self.renders)}.mp4"
+            branded.write_bytes(Path(path).read_bytes())
+            return str(branded)
+
+        self.patch("ua_news_bot.main.resolve_video_for_item", resolve)
+        self.patch("ua_news_bot.main._download_resolved_video", download)
+        self.patch("ua_news_bot.main._brand_video_checked", brand)
+
+    def settings(self, **overrides) -> Settings:
+        # @a and @b share the default watermark, @c has its own.
+        extra = [ChannelTarget(chat_id="@b"), ChannelTarget(chat_id="@c", watermark_text="c")]
+        return super().settings(extra_channels=extra, **overrides)
+
+    async def test_render_is_shared_by_targets_with_the_same_branding(self) -> None:
+        self.assertEqual(await self.run_cycle(self.settings(), [_item(1)]), 1)
+
+        self.assertEqual(self.downloads, 1)
+        self.assertEqual(self.renders, ["Smart News UA", "c"])
+        self.assertEqual(
+            self.telegram.calls, [("sendVideo", "@a"), ("sendVideo", "@b"), ("sendVideo", "@c")]
+        )
+
+    async def test_item_media_renders_once_per_branding_key(self) -> None:
+        settings = self.settings()
+        primary, same, other = settings.channel_targets()
+        media = _ItemMedia(_item(1), settings)
+        self.addCleanup(media.cleanup)
+
+        first = await media.video_for(primary)
+        self.assertEqual(await media.video_for(same), first)
+        self.assertNotEqual(await media.video_for(other), first)
+        self.assertEqual(self.downloads, 1)
+        self.assertEqual(len(self.renders), 2)
+
+    async def test_retry_skips_chats_that_already_got_the_item(self) -> None:
+        item = _item(1)
+        self.telegram.failing = {"@c"}
+        self.assertEqual(await self.run_cycle(self.settings(), [item]), 0)
+
+        self.telegram.failing = set()
+        self.telegram.calls.clear()
+        self.renders.clear()
+        self.assertEqual(await self.run_cycle(self.settings(), [item]), 1)
+
+        self.assertEqual(self.telegram.calls, [("sendVideo", "@c")])
+        # The queue recorded the branded file of @c, so nothing is rendered again.
+        self.assertEqual(self.renders, [])
+        self.assertEqual(self.downloads, 1)
+
+
+class TestLateVideoSwaps(RunOnceTestCase):
+    """Items with a video; preparing it waits for `video_ready`."""
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.video_ready = asyncio.Event()
+        self.video_ok = True
+        self.store = SQLitePublishedMessageStore(self.db_path)
+        self.addCleanup(self.store.close)
+
+        async def resolve(item):
+            return ResolvedVideo(kind="direct", url="https://cdn/v.mp4")
+
+        async def download(resolved, referer, settings, cache):
+            await self.video_ready.wait()
+            if not self.video_ok:
+                return None
+            path = self.tmp / f"raw-{len(list(self.tmp.iterdir()))}.mp4"
+            path.write_bytes(b"v" * 6000)
+            return str(path)
+
+        async def brand(path, settings, target, cache):
+            return path
+
+        async def no_article(url):
+            raise RuntimeError("no article page in tests")
+
+        self.patch("ua_news_bot.main.resolve_video_for_item", resolve)
+        self.patch("ua_news_bot.main._download_resolved_video", download)
+        self.patch("ua_news_bot.main._brand_video_checked", brand)
+        self.patch("ua_news_bot.main.scan_article_page", no_article)
+
+    def swaps(self, settings: Settings) -> LateVideoSwaps:
+        swaps = LateVideoSwaps(self.tg, self.scheduler, settings, self.store)
+        self.addAsyncCleanup(swaps.aclose)
+        return swaps
+
+    def deadline_settings(self) -> Settings:
+        return self.settings(publish_deadline_seconds=0.05, extra_channels=[])
+
+    async def wait_for_swaps(self) -> None:
+        async with asyncio.timeout(5):
+            while self.store.pending():
+                await asyncio.sleep(0.01)
+
+    def media_state(self, message_id: int) -> str:
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            "SELECT media_state FROM published_messages WHERE message_id = ?", (message_id,)
+        ).fetchone()
+        conn.close()
+        return row[0]
+
+    async def test_video_ready_before_the_deadline_is_sent_directly(self) -> None:
+        self.video_ready.set()
+        settings = self.settings(publish_deadline_seconds=5, extra_channels=[])
+
+        await self.run_cycle(settings, [_item(1)], late_swaps=self.swaps(settings))
+
+        self.assertEqual(self.telegram.calls, [("sendVideo", "@a")])
+        self.assertEqual(self.store.pending(), [])
+
+    async def test_missed_deadline_posts_a_placeholder_and_swaps_the_video_in(self) -> None:
+        settings = self.deadline_settings()
+
+        await self.run_cycle(settings, [_item(1)], late_swaps=self.swaps(settings))
+        self.assertEqual(self.telegram.calls, [("sendPhoto", "@a")])
+        self.assertEqual(len(self.store.pending()), 1)
+
+        self.video_ready.set()
+        await self.wait_for_swaps()
+
+        self.assertEqual(self.telegram.calls, [("sendPhoto", "@a"), ("editMessageMedia", "@a")])
+        self.assertEqual(self.media_state(1), MEDIA_SWAPPED)
+
+    async def test_no_video_keeps_the_placeholder_without_the_video_note(self) -> None:
+        settings = self.deadline_settings()
+        self.video_ok = False
+
+        await self.run_cycle(settings, [_item(1)], late_swaps=self.swaps(settings))
+        self.video_ready.set()
+        await self.wait_for_swaps()
+
+        self.assertEqual(self.telegram.calls, [("sendPhoto", "@a"), ("editMessageCaption", "@a")])
+        self.assertEqual(self.media_state(1), MEDIA_PLACEHOLDER)
+
+    async def test_swap_into_a_deleted_message_keeps_the_placeholder(self) -> None:
+        settings = self.deadline_settings()
+        self.telegram.failing = {"editMessageMedia", "editMessageCaption"}
+
+        await self.run_cycle(settings, [_item(1)], late_swaps=self.swaps(settings))
+        self.video_ready.set()
+        await self.wait_for_swaps()
+
+        self.assertEqual(self.telegram.calls[0], ("sendPhoto", "@a"))
+        self.assertIn(("editMessageMedia", "@a"), self.telegram.calls)
+        self.assertEqual(self.media_state(1), MEDIA_PLACEHOLDER)
+
+    async def test_pending_swaps_are_resumed_after_a_restart(self) -> None:
+        settings = self.deadline_settings()
+        before_restart = self.swaps(settings)
+        await self.run_cycle(settings, [_item(1)], late_swaps=before_restart)
+        # The process stops before the video is ready.
+        await before_restart.aclose()
+        self.assertEqual(len(self.store.pending()), 1)
+
+        self.video_ready.set()
+        self.assertEqual(self.swaps(settings).resume(), 1)
+        await self.wait_for_swaps()
+
+        self.assertEqual(self.telegram.calls, [("sendPhoto", "@a"), ("editMessageMedia", "@a")])
+        self.assertEqual(self.media_state(1), MEDIA_SWAPPED)
+
+
+class TestMediaPrefetcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tmp = Path(self._tmp.name)
+        self.settings = Settings(telegram_bot_token="TOKEN", telegram_chat_id="@a", dry_run=False)
+        self.target = self.settings.channel_targets()[0]
+        # Downloads per item url; a download of `slow_url` waits for `release`.
+        self.downloads: Counter[str] = Counter()
+        self.slow_url: str | None = None
+        self.release = asyncio.Event()
+
+        async def resolve(item):
+            return ResolvedVideo(kind="direct", url=item.url)
+
+        async def download(resolved, referer, settings, cache):
+            self.downloads[resolved.url] += 1
+            if resolved.url == self.slow_url:
+                await self.release.wait()
+            path = self.tmp / f"raw-{sum(self.downloads.values())}.mp4"
+            path.write_bytes(_raw_video(resolved.url))
+            return str(path)
+
+        for target, value in (
+            ("ua_news_bot.main.resolve_video_for_item", resolve),
+            ("ua_news_bot.main._download_resolved_video", download),
+        ):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def cache(self) -> MediaDiskCache:
+        """A cache that already holds the branded video of every test item."""
+        cache = MediaDiskCache(str(self.tmp / "cache"))
+        self.addCleanup(cache.close)
+        params = _video_branding_params(self.settings, self.target)
+        for n in (1, 2):
+            source = self.tmp / f"branded-{n}.mp4"
+            source.write_bytes(b"branded" * 1000)
+            key = branded_key(hash_bytes(_raw_video(_item(n).url)), params)
+            cache.put_file(key, str(source))
+        return cache
+
+    def temp_files(self) -> set[str]:
+        return {path.name for path in self.tmp.glob("*.mp4")}
+
+    async def test_prefetched_item_is_taken_exactly_once(self) -> None:
+        prefetcher = MediaPrefetcher(self.settings, self.cache(), None, max_items=2)
+        item = _item(1)
+        prefetcher.schedule([item])
+
+        media = await prefetcher.take(item)
+        video = await media.video_for(self.target)
+
+        self.assertIsNotNone(video)
+        self.assertIsNone(await prefetcher.take(item))
+        self.assertEqual(self.downloads[item.url], 1)
+        self.assertIn("hit=0 wait=1 miss=1", prefetcher.format_stats())
+        media.cleanup()
+        await prefetcher.aclose()
+
+    async def test_foreground_video_preempts_a_background_prefetch(self) -> None:
+        video_jobs = VideoJobManager(max_concurrent=1)
+        cache = self.cache()
+        prefetcher = MediaPrefetcher(self.settings, cache, video_jobs, max_items=2)
+        breaking, backlog = _item(1), _item(2)
+        self.slow_url = backlog.url
+        prefetcher.schedule([backlog])
+        while not self.downloads[backlog.url]:
+            await asyncio.sleep(0.01)
+
+        foreground = _ItemMedia(breaking, self.settings, cache, video_jobs)
+        self.assertIsNotNone(await foreground.video_for(self.target))
+
+        # The preempted prefetch is redone when its item's turn comes.
+        self.release.set()
+        media = await prefetcher.take(backlog)
+        self.assertIsNotNone(await media.video_for(self.target))
+        self.assertEqual(self.downloads[backlog.url], 2)
+        self.assertEqual(video_jobs.stats()["preempted"], 1)
+        self.assertIn("preempted=1", prefetcher.format_stats())
+        foreground.cleanup()
+        media.cleanup()
+        await prefetcher.aclose()
+
+    async def test_discarded_prefetch_removes_its_files(self) -> None:
+        prefetcher = MediaPrefetcher(self.settings, self.cache(), None, max_items=2)
+        before = self.temp_files()
+        item = _item(1)
+        prefetcher.schedule([item])
+        while "prepared=1" not in prefetcher.format_stats():
+            await asyncio.sleep(0.01)
+        self.assertGreater(len(self.temp_files()), len(before))
+
+        # The item is no longer scheduled: its raw download and cached copy go.
+        prefetcher.schedule([])
+        await asyncio.sleep(0)
+
+        self.assertEqual(self.temp_files(), before)
+        self.assertIsNone(await prefetcher.take(item))
+
+
+# Fake yt-dlp: appends its argv to args.jsonl next to it, prints an info JSON
+# for --dump-single-json and writes a video for a download.
+_FAKE_YTDLP = """\
+import json, pathlib, sys
+args = sys.argv[1:]
+with open(pathlib.Path(__file__).with_name("args.jsonl"), "a") as f:
+    f.write(json.dumps(args) + "\\n")
+if "--dump-single-json" in args:
+    print(json.dumps({"id": "abc", "duration": 1200}))
+else:
+    pathlib.Path("abc.mp4").write_bytes(b"v" * 6000)
+"""
+
+
+class TestYtDlpSubprocess(unittest.IsolatedAsyncioTestCase):
+    async def test_download_format_is_capped_for_the_extracted_duration(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            script = Path(tmp) / "yt-dlp"
+            script.write_text(f"#!{sys.executable}\n{_FAKE_YTDLP}")
+            script.chmod(0o755)
+            settings = Settings(
+                telegram_bot_token="TOKEN",
+                telegram_chat_id="@a",
+                ytdlp_enabled=True,
+                ytdlp_bin=str(script),
+            )
+
+            path = await _download_ytdlp_video(
+                "https://www.youtube.com/watch?v=abc", settings, None
+            )
+            self.addCleanup(Path(path).unlink)
+
+            extract, download = [
+                json.loads(line) for line in (Path(tmp) / "args.jsonl").read_text().splitlines()
+            ]
+        self.assertIn("--dump-single-json", extract)
+        # 20 minutes in the upload budget: the lowest rung, from the info
+        # already extracted rather than a second extraction.
+        self.assertIn("[height<=360]", download[download.index("-f") + 1])
+        self.assertIn("--load-info-json", download)
+        self.assertNotIn("https://www.youtube.com/watch?v=abc", download)
+        self.assertEqual(Path(path).read_bytes(), b"v" * 6000)
+
+
+def _raw_video(url: str) -> bytes:
+    return url.encode() * 1000
+
+
+if __name__ == "__main__":
+    unittest.main()
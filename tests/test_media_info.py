@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from ua_news_bot.media.media_info import clear_probe_cache, parse_ffprobe_json, probe_media
+
+FFPROBE_JSON = {
+    "streams": [
+        {"codec_type": "video", "codec_name": "mjpeg", "disposition": {"attached_pic": 1}},
+        {"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080},
+        {"codec_type": "audio", "codec_name": "aac"},
+    ],
+    "format": {"duration": "61.480000", "bit_rate": "4200000"},
+}
+
+
+class TestParseFfprobeJson(unittest.TestCase):
+    def test_parses_streams_and_skips_cover_art(self) -> None:
+        info = parse_ffprobe_json(FFPROBE_JSON)
+
+        self.assertEqual(info.video_codec, "h264")
+        self.assertEqual((info.width, info.height), (1920, 1080))
+        self.assertAlmostEqual(info.duration, 61.48)
+        self.assertEqual(info.bit_rate, 4200000)
+        self.assertTrue(info.has_audio)
+        self.assertTrue(info.is_usable)
+
+    def test_rotated_clip_reports_display_size(self) -> None:
+        portrait = {
+            "streams": [
+                {
+                    "codec_type": "video",
+                    "codec_name": "h264",
+                    "width": 1920,
+                    "height": 1080,
+                    "side_data_list": [{"side_data_type": "Display Matrix", "rotation": -90}],
+                }
+            ]
+        }
+        legacy = {
+            "streams": [
+                {
+                    "codec_type": "video",
+                    "width": 1920,
+                    "height": 1080,
+                    "tags": {"rotate": "90"},
+                }
+            ]
+        }
+        upside_down = {
+            "streams": [
+                {"codec_type": "video", "width": 1920, "height": 1080, "tags": {"rotate": "180"}}
+            ]
+        }
+
+        def size(data: dict) -> tuple[int | None, int | None]:
+            info = parse_ffprobe_json(data)
+            return info.width, info.height
+
+        self.assertEqual(parse_ffprobe_json(portrait).rotation, 270)
+        self.assertEqual(size(portrait), (1080, 1920))
+        self.assertEqual(size(legacy), (1080, 1920))
+        self.assertEqual(size(upside_down), (1920, 1080))
+
+    def test_audio_only_is_not_usable(self) -> None:
+        info = parse_ffprobe_json({"streams": [{"codec_type": "audio", "codec_name": "mp3"}]})
+
+        self.assertFalse(info.is_usable)
+        self.assertIsNone(info.duration)
+
+
+class TestProbeMedia(unittest.IsolatedAsyncioTestCase):
+    async def test_probe_is_cached_by_path_size_and_mtime(self) -> None:
+        clear_probe_cache()
+        with tempfile.TemporaryDirectory() as tmp:
+            calls = Path(tmp) / "calls"
+            ffprobe = Path(tmp) / "ffprobe"
+            ffprobe.write_text(f"#!/bin/sh\necho x >> {calls}\necho '{json.dumps(FFPROBE_JSON)}'\n")
+            os.chmod(ffprobe, 0o755)
+
+            video = Path(tmp) / "a.mp4"
+            video.write_bytes(b"video")
+
+            first = await probe_media(str(video), str(ffprobe))
+            second = await probe_media(str(video), str(ffprobe))
+            self.assertEqual(first, second)
+            self.assertEqual(len(calls.read_text().splitlines()), 1)
+
+            # A rewritten file is probed again.
+            video.write_bytes(b"other video")
+            await probe_media(str(video), str(ffprobe))
+            self.assertEqual(len(calls.read_text().splitlines()), 2)
+        clear_probe_cache()
+
+
+if __name__ == "__main__":
+    unittest.main()
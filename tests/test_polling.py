@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import unittest
+from datetime import UTC, datetime
+from functools import partial
+from unittest.mock import patch
+
+import httpx
+
+from ua_news_bot.aggregator import fetch_all_latest
+from ua_news_bot.polling import FeedPollScheduler
+from ua_news_bot.sources.suspilne import SuspilneSource
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=UTC).timestamp()
+
+FEED = """<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>
+<item><title>Новина</title><link>https://suspilne.media/1</link>
+<pubDate>Thu, 01 Jan 2026 11:50:00 GMT</pubDate></item>
+</channel></rss>"""
+
+
+def _minutes_ago(minutes: float) -> datetime:
+    return datetime.fromtimestamp(NOW - minutes * 60, UTC).replace(tzinfo=None)
+
+
+def _scheduler() -> FeedPollScheduler:
+    # rng=0.5 means no jitter.
+    return FeedPollScheduler(30, 600, jitter=0.1, rng=lambda: 0.5)
+
+
+class TestFeedPollScheduler(unittest.TestCase):
+    def test_learns_cadence_and_backs_off_when_idle(self) -> None:
+        scheduler = _scheduler()
+        self.assertTrue(scheduler.is_due("feed", NOW))
+
+        # Items every 4 minutes: poll every 2 minutes.
+        scheduler.record("feed", [_minutes_ago(m) for m in (8, 4, 0)], now=NOW)
+        self.assertEqual(scheduler.next_poll_at("feed"), NOW + 120)
+        self.assertFalse(scheduler.is_due("feed", NOW + 60))
+
+        scheduler.record("feed", [], not_modified=True, now=NOW + 120)
+        self.assertEqual(scheduler.next_poll_at("feed"), NOW + 120 + 180)
+
+        # Already seen items are not news either.
+        scheduler.record("feed", [_minutes_ago(0)], now=NOW + 300)
+        self.assertEqual(scheduler.next_poll_at("feed"), NOW + 300 + 270)
+
+        for i in range(10):
+            scheduler.record("feed", [], not_modified=True, now=NOW + 1000 * i)
+        self.assertEqual(scheduler.seconds_until_next(NOW + 9000), 600)
+
+    def test_new_items_bring_the_interval_down(self) -> None:
+        scheduler = _scheduler()
+        scheduler.record("feed", [_minutes_ago(60), _minutes_ago(0)], now=NOW)
+        self.assertEqual(scheduler.next_poll_at("feed"), NOW + 600)
+
+        # A burst: items a minute apart pull the average gap down.
+        burst = [datetime.fromtimestamp(NOW + m * 60, UTC) for m in range(1, 6)]
+        scheduler.record("feed", burst, now=NOW + 300)
+        self.assertLess(scheduler.next_poll_at("feed") - (NOW + 300), 600)
+
+    def test_jitter_stays_within_bounds(self) -> None:
+        low = FeedPollScheduler(30, 600, jitter=0.2, rng=lambda: 0.0)
+        low.record("feed", [], now=NOW)
+        self.assertEqual(low.next_poll_at("feed"), NOW + 36)
+
+        high = FeedPollScheduler(30, 600, jitter=0.2, rng=lambda: 1.0)
+        for _ in range(20):
+            high.record("feed", [], now=NOW)
+        self.assertEqual(high.next_poll_at("feed"), NOW + 600)
+
+
+class TestConditionalFetch(unittest.IsolatedAsyncioTestCase):
+    async def test_unchanged_feed_is_a_304_and_skipped_until_due(self) -> None:
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, headers={"etag": '"v1"'}, text=FEED)
+
+        source = SuspilneSource()
+        scheduler = _scheduler()
+        with patch(
+            "ua_news_bot.sources.suspilne.httpx.AsyncClient",
+            partial(httpx.AsyncClient, transport=httpx.MockTransport(handler)),
+        ):
+            first = await fetch_all_latest([source], poll_scheduler=scheduler)
+            skipped = await fetch_all_latest([source], poll_scheduler=scheduler)
+            with patch("ua_news_bot.polling.time", return_value=NOW + 10**9):
+                second = await fetch_all_latest([source], poll_scheduler=scheduler)
+
+        self.assertEqual([x.url for x in first], ["https://suspilne.media/1"])
+        self.assertEqual(skipped, [])
+        self.assertEqual(second, [])
+        self.assertTrue(source.not_modified)
+        self.assertEqual(len(requests), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from ua_news_bot.models import NewsItem, Source
+from ua_news_bot.published_messages import (
+    MEDIA_SWAPPED,
+    PendingMessage,
+    SQLitePublishedMessageStore,
+)
+
+
+class TestPublishedMessages(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "seen.sqlite3")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_pending_swaps_survive_a_restart(self) -> None:
+        item = NewsItem(
+            source=Source.SUSPILNE,
+            title="Терміново: відео",
+            url="https://suspilne.media/1",
+            published_at=datetime(2026, 1, 1, 12, 0),
+            video_urls=("https://cdn/v.mp4",),
+        )
+        message = PendingMessage(
+            item=item,
+            chat_id="@a",
+            message_id=5,
+            caption="Текст\n\nВідео",
+            caption_without_video="Текст",
+            priority=0,
+        )
+        store = SQLitePublishedMessageStore(self.db_path)
+        store.record(message)
+        store.close()
+
+        store = SQLitePublishedMessageStore(self.db_path)
+        self.assertEqual(store.pending(), [message])
+
+        store.set_media_state("@a", 5, MEDIA_SWAPPED)
+        self.assertEqual(store.pending(), [])
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+
+from ua_news_bot.send_scheduler import (
+    PRIORITY_BREAKING,
+    PRIORITY_NORMAL,
+    SendScheduler,
+    TokenBucket,
+)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_wait_time_after_burst(self) -> None:
+        bucket = TokenBucket(rate=1.0, capacity=2.0, now=0.0)
+
+        self.assertEqual(bucket.wait_time(1, now=0.0), 0.0)
+        bucket.consume(2, now=0.0)
+
+        self.assertAlmostEqual(bucket.wait_time(1, now=0.0), 1.0)
+        self.assertAlmostEqual(bucket.wait_time(1, now=0.5), 0.5)
+
+    def test_cost_above_capacity_goes_into_debt(self) -> None:
+        bucket = TokenBucket(rate=1.0, capacity=2.0, now=0.0)
+
+        self.assertEqual(bucket.wait_time(5, now=0.0), 0.0)
+        bucket.consume(5, now=0.0)
+
+        self.assertAlmostEqual(bucket.wait_time(1, now=0.0), 4.0)
+
+    def test_pause_blocks_a_full_bucket(self) -> None:
+        bucket = TokenBucket(rate=1.0, capacity=2.0, now=0.0)
+
+        bucket.pause(5.0, now=0.0)
+
+        self.assertAlmostEqual(bucket.wait_time(1, now=1.0), 4.0)
+        self.assertEqual(bucket.wait_time(2, now=5.0), 0.0)
+
+
+class TestSendScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_breaking_news_is_granted_first(self) -> None:
+        scheduler = SendScheduler(global_per_second=1000.0, chat_per_minute=1200.0, chat_burst=1)
+        order: list[str] = []
+
+        async def send(name: str) -> None:
+            order.append(name)
+
+        # Drain the burst so the next jobs have to queue up.
+        await scheduler.submit("chat", lambda: send("first"))
+
+        normal = asyncio.create_task(scheduler.submit("chat", lambda: send("normal")))
+        breaking = asyncio.create_task(
+            scheduler.submit("chat", lambda: send("breaking"), priority=PRIORITY_BREAKING)
+        )
+        await asyncio.gather(normal, breaking)
+
+        self.assertEqual(order, ["first", "breaking", "normal"])
+        self.assertEqual(scheduler.stats().jobs_sent, 3)
+        self.assertEqual(scheduler.stats().queue_depth, 0)
+
+    async def test_busy_chat_does_not_block_other_chats(self) -> None:
+        scheduler = SendScheduler(global_per_second=1000.0, chat_per_minute=2.0, chat_burst=1)
+        order: list[str] = []
+
+        async def send(name: str) -> None:
+            order.append(name)
+
+        await scheduler.submit("busy", lambda: send("busy-1"))
+        blocked = asyncio.create_task(scheduler.submit("busy", lambda: send("busy-2")))
+        await asyncio.wait_for(
+            scheduler.submit("idle", lambda: send("idle"), priority=PRIORITY_NORMAL),
+            timeout=1.0,
+        )
+
+        self.assertEqual(order, ["busy-1", "idle"])
+        blocked.cancel()
+
+    async def test_retry_after_pauses_only_that_chat(self) -> None:
+        scheduler = SendScheduler(global_per_second=1000.0, chat_per_minute=1200.0, chat_burst=5)
+        order: list[str] = []
+
+        async def send(name: str) -> None:
+            order.append(name)
+
+        # Telegram answered 429 with retry_after for "flooded".
+        scheduler.pause("flooded", 0.2)
+        flooded = asyncio.create_task(scheduler.submit("flooded", lambda: send("flooded")))
+        await asyncio.wait_for(scheduler.submit("other", lambda: send("other")), timeout=0.1)
+        self.assertEqual(order, ["other"])
+
+        await asyncio.wait_for(flooded, timeout=1.0)
+        self.assertEqual(order, ["other", "flooded"])
+        self.assertEqual(scheduler.stats().rate_limited, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
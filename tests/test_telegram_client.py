@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import httpx
+
+from ua_news_bot.telegram_client import TelegramAPIError, TelegramClient
+from ua_news_bot.telegram_file_ids import SQLiteFileIdStore, hash_bytes
+
+
+def _make_client(handler, file_ids: SQLiteFileIdStore | None = None, **kwargs) -> TelegramClient:
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return TelegramClient(
+        "TOKEN", backoff_base=0.0, http_client=http_client, file_ids=file_ids, **kwargs
+    )
+
+
+class TestTelegramClientRetries(unittest.IsolatedAsyncioTestCase):
+    async def test_429_is_retried_after_retry_after(self) -> None:
+        calls: list[int] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(1)
+            if len(calls) == 1:
+                return httpx.Response(
+                    429,
+                    json={
+                        "ok": False,
+                        "error_code": 429,
+                        "description": "Too Many Requests: retry after 0",
+                        "parameters": {"retry_after": 0},
+                    },
+                )
+            return httpx.Response(200, json={"ok": True, "result": {"message_id": 1}})
+
+        pauses: list[tuple[str | None, float]] = []
+        tg = _make_client(handler, on_retry_after=lambda *pause: pauses.append(pause))
+        await tg.send_message("@chan", "hello")
+        await tg.aclose()
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(pauses, [("@chan", 0.0)])
+
+    async def test_retry_after_above_limit_is_raised(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(
+                429,
+                json={"ok": False, "error_code": 429, "parameters": {"retry_after": 3600}},
+            )
+
+        tg = _make_client(handler)
+        with self.assertRaises(TelegramAPIError) as ctx:
+            await tg.send_message("@chan", "hello")
+        await tg.aclose()
+
+        self.assertEqual(ctx.exception.retry_after, 3600)
+        self.assertEqual(ctx.exception.status_code, 429)
+
+    async def test_ambiguous_5xx_is_not_retried_for_sends(self) -> None:
+        calls: list[int] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(1)
+            return httpx.Response(500, json={"ok": False, "error_code": 500})
+
+        tg = _make_client(handler)
+        with self.assertRaises(TelegramAPIError):
+            await tg.send_photo("@chan", b"jpeg", "caption")
+        await tg.aclose()
+
+        self.assertEqual(len(calls), 1)
+
+    async def test_gateway_error_is_retried_with_fresh_upload(self) -> None:
+        bodies: list[bytes] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            bodies.append(request.read())
+            if len(bodies) == 1:
+                return httpx.Response(502, text="<html>Bad Gateway</html>")
+            return httpx.Response(200, json={"ok": True, "result": []})
+
+        tg = _make_client(handler)
+        await tg.send_media_group("@chan", [b"one", b"two"], "caption")
+        await tg.aclose()
+
+        self.assertEqual(len(bodies), 2)
+        self.assertIn(b"two", bodies[1])
+
+    async def test_413_message_keeps_http_prefix(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(413, text="Request Entity Too Large")
+
+        tg = _make_client(handler)
+        with self.assertRaises(TelegramAPIError) as ctx:
+            await tg.send_message("@chan", "hello")
+        await tg.aclose()
+
+        self.assertIn("HTTP 413", str(ctx.exception))
+
+    async def test_local_mode_sends_video_as_file_uri(self) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            request.read()
+            requests.append(request)
+            return httpx.Response(
+                200,
+                json={"ok": True, "result": {"message_id": 1, "video": {"file_id": "vid"}}},
+            )
+
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        tg = TelegramClient(
+            "TOKEN",
+            base_url="http://127.0.0.1:8081/",
+            local_mode=True,
+            http_client=http_client,
+        )
+        with tempfile.NamedTemporaryFile(suffix=".mp4") as f:
+            f.write(b"video-bytes")
+            f.flush()
+            await tg.send_video("@chan", f.name, "caption", duration=12.6, width=1280, height=720)
+            expected_uri = Path(f.name).resolve().as_uri()
+        await tg.aclose()
+
+        self.assertEqual(str(requests[0].url), "http://127.0.0.1:8081/botTOKEN/sendVideo")
+        form = parse_qs(requests[0].content.decode())
+        self.assertEqual(form["video"], [expected_uri])
+        self.assertEqual(form["duration"], ["13"])
+        self.assertEqual((form["width"], form["height"]), (["1280"], ["720"]))
+        self.assertNotIn(b"video-bytes", requests[0].content)
+
+    async def test_edit_message_video_uploads_into_existing_message(self) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            request.read()
+            requests.append(request)
+            return httpx.Response(
+                200,
+                json={"ok": True, "result": {"message_id": 7, "video": {"file_id": "vid"}}},
+            )
+
+        tg = _make_client(handler)
+        with tempfile.NamedTemporaryFile(suffix=".mp4") as f:
+            f.write(b"video-bytes")
+            f.flush()
+            await tg.edit_message_video("@chan", 7, f.name, "caption", duration=4.2)
+        await tg.aclose()
+
+        request = requests[0]
+        self.assertTrue(str(request.url).endswith("/editMessageMedia"))
+        self.assertIn(b"video-bytes", request.content)
+        self.assertIn(b'"media": "attach://video"', request.content)
+        self.assertIn(b'"caption": "caption"', request.content)
+        self.assertIn(b'"duration": 4', request.content)
+
+
+class TestTelegramClientFileIds(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteFileIdStore(str(Path(self._tmp.name) / "test.sqlite3"))
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self._tmp.cleanup()
+
+    async def test_second_photo_send_reuses_file_id(self) -> None:
+        bodies: list[bytes] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            bodies.append(request.read())
+            return httpx.Response(
+                200,
+                json={
+                    "ok": True,
+                    "result": {
+                        "message_id": len(bodies),
+                        "photo": [{"file_id": "small"}, {"file_id": "large"}],
+                    },
+                },
+            )
+
+        tg = _make_client(handler, file_ids=self.store)
+        await tg.send_photo("@one", b"jpeg-bytes", "caption")
+        await tg.send_photo("@two", b"jpeg-bytes", "caption")
+        await tg.aclose()
+
+        self.assertIn(b"jpeg-bytes", bodies[0])
+        self.assertNotIn(b"jpeg-bytes", bodies[1])
+        self.assertIn(b"large", bodies[1])
+
+    async def test_rejected_file_id_falls_back_to_upload(self) -> None:
+        bodies: list[bytes] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = request.read()
+            bodies.append(body)
+            if b"stale" in body:
+                return httpx.Response(
+                    400,
+                    json={
+                        "ok": False,
+                        "error_code": 400,
+                        "description": "Bad Request: wrong file identifier/HTTP URL specified",
+                    },
+                )
+            return httpx.Response(
+                200,
+                json={"ok": True, "result": {"message_id": 1, "photo": [{"file_id": "fresh"}]}},
+            )
+
+        self.store.put("photo", hash_bytes(b"jpeg-bytes"), "stale")
+
+        tg = _make_client(handler, file_ids=self.store)
+        await tg.send_photo("@one", b"jpeg-bytes", "caption")
+        await tg.aclose()
+
+        self.assertEqual(len(bodies), 2)
+        self.assertEqual(self.store.get("photo", hash_bytes(b"jpeg-bytes")), "fresh")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+
+from ua_news_bot.media.media_info import MediaInfo
+from ua_news_bot.media.video_editor import (
+    CRF_PLAN,
+    SIZE_BUDGET_FILL,
+    _branding_command,
+    add_branding_to_video_file,
+    add_branding_to_video_stream,
+    plan_encode,
+    render_overlay,
+    segment_count,
+)
+
+# Stands in for ffmpeg: copies stdin to the output path (last argument).
+FAKE_FFMPEG = """#!/bin/sh
+for last; do :; done
+cat > "$last"
+"""
+
+FAILING_FFMPEG = """#!/bin/sh
+echo "moov atom not found" >&2
+exit 1
+"""
+
+# Stands in for ffmpeg in segment mode: "splits" into 3 pieces, "brands" by
+# prefixing the piece, and concatenates the pieces listed in the concat file.
+FAKE_SEGMENT_FFMPEG = f"""#!{sys.executable}
+import sys
+from pathlib import Path
+
+args = sys.argv[1:]
+out = Path(args[-1])
+if "segment" in args:
+    src = Path(args[args.index("-i") + 1]).read_bytes()
+    for idx in range(3):
+        Path(str(out) % idx).write_bytes(src[idx::3])
+elif "concat" in args:
+    listing = Path(args[args.index("-i") + 1])
+    names = [line.split("'")[1] for line in listing.read_text().splitlines()]
+    out.write_bytes(b"|".join((listing.parent / n).read_bytes() for n in names))
+else:
+    out.write_bytes(b"B" + Path(args[args.index("-i") + 1]).read_bytes())
+"""
+
+
+async def _chunks(count: int, size: int):
+    for i in range(count):
+        yield bytes([i]) * size
+
+
+class TestVideoBranding(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.logo = self.tmp / "logo.png"
+        Image.new("RGBA", (400, 200), (255, 0, 0, 255)).save(self.logo)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _script(self, name: str, body: str) -> str:
+        path = self.tmp / name
+        path.write_text(body)
+        os.chmod(path, 0o755)
+        return str(path)
+
+    async def test_stream_is_piped_into_ffmpeg(self) -> None:
+        output = await add_branding_to_video_stream(
+            _chunks(8, 4096),
+            watermark_text="Smart News UA",
+            logo_path=str(self.logo),
+            ffmpeg_bin=self._script("ffmpeg", FAKE_FFMPEG),
+        )
+        try:
+            data = Path(output).read_bytes()
+            self.assertEqual(len(data), 8 * 4096)
+            self.assertEqual(data[-1], 7)
+        finally:
+            Path(output).unlink(missing_ok=True)
+
+    async def test_ffmpeg_failure_raises_and_cleans_up(self) -> None:
+        with self.assertRaisesRegex(RuntimeError, "moov atom"):
+            await add_branding_to_video_stream(
+                _chunks(64, 65536),
+                watermark_text="",
+                logo_path=str(self.logo),
+                ffmpeg_bin=self._script("ffmpeg", FAILING_FFMPEG),
+            )
+
+    async def test_segments_are_branded_and_joined_in_order(self) -> None:
+        source = self.tmp / "in.mp4"
+        source.write_bytes(bytes(range(60)) * 300)
+        info = MediaInfo(
+            duration=90.0,
+            width=1280,
+            height=720,
+            video_codec="h264",
+            audio_codec=None,
+            bit_rate=None,
+        )
+
+        output = await add_branding_to_video_file(
+            str(source),
+            watermark_text="W",
+            logo_path=str(self.logo),
+            ffmpeg_bin=self._script("ffmpeg", FAKE_SEGMENT_FFMPEG),
+            media_info=info,
+            segments=3,
+        )
+        try:
+            pieces = Path(output).read_bytes().split(b"|")
+            self.assertEqual(len(pieces), 3)
+            self.assertTrue(all(piece.startswith(b"B") for piece in pieces))
+            self.assertEqual(pieces[1][1:], source.read_bytes()[1::3])
+        finally:
+            Path(output).unlink(missing_ok=True)
+
+
+class TestRenderOverlay(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.logo = self.tmp / "logo.png"
+        Image.new("RGBA", (400, 200), (255, 0, 0, 255)).save(self.logo)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _render(self, width: int, height: int, text: str = "Smart News UA"):
+        return render_overlay(
+            width,
+            height,
+            text,
+            self.logo,
+            self.tmp / "missing-font.otf",
+            "top-left",
+            0.5,
+            0.1,
+            0.022,
+            32,
+            cache_dir=self.tmp / "overlays",
+        )
+
+    def test_logo_is_scaled_faded_and_placed(self) -> None:
+        overlay = self._render(1280, 720, text="")
+
+        self.assertEqual((overlay.x, overlay.y), (20, 20))
+        with Image.open(overlay.path) as image:
+            self.assertEqual(image.size, (40, 20))
+            self.assertEqual(image.getpixel((5, 5)), (255, 0, 0, 127))
+
+    def test_text_spans_to_the_bottom_right_and_is_cached(self) -> None:
+        overlay = self._render(1280, 720)
+        with Image.open(overlay.path) as image:
+            # Logo at the top-left, text box ends margin - border from the corner.
+            self.assertEqual(overlay.x + image.width, 1280 - 32 + 6 + 1)
+            self.assertEqual(overlay.y + image.height, 720 - 32 + 6 + 1)
+
+        mtime = overlay.path.stat().st_mtime_ns
+        self.assertEqual(self._render(1280, 720), overlay)
+        self.assertEqual(overlay.path.stat().st_mtime_ns, mtime)
+        self.assertNotEqual(self._render(1920, 1080).path, overlay.path)
+
+
+class TestPlanEncode(unittest.TestCase):
+    def test_bitrates_fit_the_budget(self) -> None:
+        max_bytes = 45 * 1024 * 1024
+        plan = plan_encode(duration=120.0, has_audio=True, max_bytes=max_bytes)
+
+        expected_bytes = (plan.video_kbps + plan.audio_kbps) * 1000 / 8 * 120.0
+        self.assertLessEqual(expected_bytes, max_bytes * SIZE_BUDGET_FILL)
+        self.assertGreater(expected_bytes, max_bytes * SIZE_BUDGET_FILL * 0.99)
+        self.assertEqual(plan.audio_kbps, 128)
+        self.assertEqual(plan.max_height, 1080)
+
+    def test_tight_budget_lowers_audio_and_resolution(self) -> None:
+        plan = plan_encode(duration=1200.0, has_audio=True, max_bytes=45 * 1024 * 1024)
+
+        self.assertEqual(plan.audio_kbps, 64)
+        self.assertEqual(plan.max_height, 360)
+
+    def test_unknown_duration_keeps_constant_quality(self) -> None:
+        self.assertEqual(plan_encode(None, True, 45 * 1024 * 1024), CRF_PLAN)
+        self.assertEqual(plan_encode(60.0, True, None), CRF_PLAN)
+
+    def test_segment_count_skips_short_clips(self) -> None:
+        self.assertEqual(segment_count(20.0, 8), 1)
+        self.assertEqual(segment_count(50.0, 8), 3)
+        self.assertEqual(segment_count(600.0, 8), 8)
+        self.assertEqual(segment_count(None, 8), 1)
+
+    def test_scaling_follows_source_height(self) -> None:
+        self.assertIsNone(plan_encode(120.0, True, 45 * 1024 * 1024, source_height=720).max_height)
+        self.assertEqual(plan_encode(None, True, None, source_height=2160).max_height, 1080)
+
+    def test_command_uses_target_bitrate_and_scale(self) -> None:
+        plan = plan_encode(duration=600.0, has_audio=True, max_bytes=45 * 1024 * 1024)
+        command = _branding_command(
+            ffmpeg_bin="ffmpeg",
+            input_arg="in.mp4",
+            logo_file=Path("logo.png"),
+            filter_complex="[0:v][1:v]overlay[v]",
+            has_audio=True,
+            output_path="out.mp4",
+            plan=plan,
+        )
+
+        self.assertIn(f"{plan.video_kbps}k", command)
+        self.assertIn("[vout]", command)
+        self.assertEqual(command[-1], "out.mp4")
+
+
+if __name__ == "__main__":
+    unittest.main()
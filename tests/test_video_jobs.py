@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from ua_news_bot.media.video_jobs import (
+    FfmpegProgress,
+    ProcessControls,
+    VideoJobManager,
+    VideoJobStalled,
+    run_ffmpeg_process,
+)
+
+PROGRESS_BLOCK = "frame=50\nfps=25.0\nout_time_us={us}\nspeed=2.0x\nprogress={state}\n"
+
+
+class TestFfmpegProgress(unittest.TestCase):
+    def test_parses_blocks_and_eta(self) -> None:
+        progress = FfmpegProgress()
+        completed = [
+            progress.feed(line)
+            for line in PROGRESS_BLOCK.format(us=4_000_000, state="continue").splitlines()
+        ]
+
+        self.assertEqual(completed, [False, False, False, False, True])
+        self.assertAlmostEqual(progress.out_time, 4.0)
+        self.assertEqual(progress.speed, 2.0)
+        self.assertAlmostEqual(progress.eta(10.0), 3.0)
+        self.assertFalse(progress.done)
+
+
+class TestRunFfmpegProcess(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _script(self, body: str) -> str:
+        path = self.tmp / "ffmpeg"
+        path.write_text("#!/bin/sh\n" + body)
+        os.chmod(path, 0o755)
+        return str(path)
+
+    async def test_reports_final_progress(self) -> None:
+        ffmpeg = self._script(
+            f"printf '{PROGRESS_BLOCK.format(us=1_000_000, state='continue')}'\n"
+            f"printf '{PROGRESS_BLOCK.format(us=2_000_000, state='end')}'\n"
+        )
+        progress = await run_ffmpeg_process([ffmpeg, "-i", "in.mp4", "out.mp4"])
+
+        self.assertTrue(progress.done)
+        self.assertAlmostEqual(progress.out_time, 2.0)
+
+    async def test_stalled_process_is_killed(self) -> None:
+        pid_file = self.tmp / "pid"
+        ffmpeg = self._script(f"echo $$ > {pid_file}\nexec sleep 30\n")
+
+        with self.assertRaises(VideoJobStalled):
+            await run_ffmpeg_process(
+                [ffmpeg, "out.mp4"],
+                controls=ProcessControls(stall_timeout=0.3),
+            )
+
+        with self.assertRaises(ProcessLookupError):
+            os.kill(int(pid_file.read_text()), 0)
+
+    async def test_cancelled_process_is_killed(self) -> None:
+        pid_file = self.tmp / "pid"
+        ffmpeg = self._script(f"echo $$ > {pid_file}\nexec sleep 30\n")
+
+        task = asyncio.create_task(run_ffmpeg_process([ffmpeg, "out.mp4"]))
+        while not pid_file.exists() or not pid_file.read_text().strip():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        with self.assertRaises(ProcessLookupError):
+            os.kill(int(pid_file.read_text()), 0)
+
+    async def test_stdin_is_fed_and_its_errors_are_raised(self) -> None:
+        output = self.tmp / "out.bin"
+        ffmpeg = self._script(f"cat > {output}\n")
+
+        async def chunks(fail: bool):
+            yield b"a" * 1000
+            if fail:
+                raise ValueError("download too large")
+            yield b"b" * 1000
+
+        await run_ffmpeg_process([ffmpeg, "pipe:0"], stdin=chunks(fail=False))
+        self.assertEqual(output.stat().st_size, 2000)
+
+        with self.assertRaisesRegex(ValueError, "too large"):
+            await run_ffmpeg_process([ffmpeg, "pipe:0"], stdin=chunks(fail=True))
+
+    async def test_stalled_stdin_feed_is_killed(self) -> None:
+        async def chunks():
+            yield b"a"
+            await asyncio.sleep(30)
+
+        with self.assertRaises(VideoJobStalled):
+            await run_ffmpeg_process(
+                [self._script("cat > /dev/null\n"), "pipe:0"],
+                stdin=chunks(),
+                controls=ProcessControls(stall_timeout=0.3),
+            )
+
+    async def test_error_exit_raises_with_stderr(self) -> None:
+        ffmpeg = self._script("echo 'Invalid data found' >&2\nexit 1\n")
+
+        with self.assertRaisesRegex(RuntimeError, "Invalid data found"):
+            await run_ffmpeg_process([ffmpeg, "out.mp4"])
+
+
+class TestVideoJobManager(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrency_is_capped(self) -> None:
+        manager = VideoJobManager(max_concurrent=2)
+        running = 0
+        peak = 0
+
+        async def job(idx: int) -> None:
+            nonlocal running, peak
+            async with manager.job(f"job {idx}"):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(job(i) for i in range(5)))
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(manager.stats()["done"], 5)
+
+    async def test_foreground_job_preempts_background_and_goes_first(self) -> None:
+        manager = VideoJobManager(max_concurrent=1)
+        order: list[str] = []
+        started = asyncio.Event()
+
+        async def job(label: str, background: bool) -> None:
+            async with manager.job(label, background=background):
+                order.append(label)
+                started.set()
+                await asyncio.sleep(0.05)
+
+        prefetch = asyncio.create_task(job("prefetch", True))
+        await started.wait()
+        queued = asyncio.create_task(job("queued prefetch", True))
+        await asyncio.sleep(0)
+        await job("breaking", False)
+
+        with self.assertRaises(asyncio.CancelledError):
+            await prefetch
+        await queued
+
+        self.assertEqual(order, ["prefetch", "breaking", "queued prefetch"])
+        self.assertEqual(manager.stats()["preempted"], 1)
+        self.assertEqual(manager.stats()["done"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
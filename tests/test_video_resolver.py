@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from functools import partial
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+
+from ua_news_bot.media.video_resolver import (
+    PageScanCache,
+    clear_page_cache,
+    fetch_page_html,
+    resolve_video_for_item,
+    scan_page,
+)
+
+PAGE = """<html><head>
+<meta property="og:image" content="https://cdn.example/cover.jpg">
+<meta name="twitter:player" content="https://player.example/embed/1">
+<meta property="og:video" content="https://cdn.example/clip.mp4">
+</head><body><article>
+<p>See https://youtu.be/abcdef123 for more.</p>
+<iframe width="560" src="https://www.youtube.com/embed/XYZ123456?rel=0"></iframe>
+</article></body></html>"""
+
+
+def _patched_client(handler):
+    return patch(
+        "ua_news_bot.media.video_resolver.httpx.AsyncClient",
+        partial(httpx.AsyncClient, transport=httpx.MockTransport(handler)),
+    )
+
+
+class TestScanPage(unittest.TestCase):
+    def test_collects_candidates_in_one_pass(self) -> None:
+        scan = scan_page(PAGE)
+
+        self.assertEqual(scan.og_image, "https://cdn.example/cover.jpg")
+        self.assertEqual(scan.candidates["og_video"], "https://cdn.example/clip.mp4")
+        self.assertEqual(scan.candidates["youtube_id"], "abcdef123")
+        # The YouTube embed wins over og:video, as before.
+        video = scan.best_video()
+        self.assertEqual(video.kind, "youtube")
+        self.assertEqual(video.url, "https://www.youtube.com/watch?v=XYZ123456")
+
+    def test_unresolvable_candidates_fall_through(self) -> None:
+        video = scan_page(
+            '<meta name="twitter:player" content="https://player.example/embed/1">'
+            "<p>https://youtu.be/abcdef123</p>"
+        ).best_video()
+
+        self.assertEqual(video.url, "https://www.youtube.com/watch?v=abcdef123")
+        self.assertIsNone(scan_page("<html><p>no media</p></html>").best_video())
+
+
+class TestPageFetch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        clear_page_cache()
+
+    async def test_stops_reading_after_the_article(self) -> None:
+        sent = []
+
+        async def body():
+            for chunk in ("<head></head><article>video", "</arti", "cle><footer>", "x" * 5000):
+                sent.append(chunk)
+                yield chunk.encode()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, headers={"content-type": "text/html"}, content=body())
+
+        with _patched_client(handler):
+            html = await fetch_page_html("https://news.example/a")
+
+        self.assertIn("</article>", html)
+        self.assertNotIn("x" * 5000, html)
+        self.assertEqual(len(sent), 3)
+
+    async def test_concurrent_and_repeated_lookups_fetch_once(self) -> None:
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request.url)
+            return httpx.Response(200, headers={"content-type": "text/html"}, text=PAGE)
+
+        cache = PageScanCache()
+        with _patched_client(handler):
+            first, second = await asyncio.gather(
+                cache.scan("https://news.example/a"), cache.scan("https://news.example/a")
+            )
+            third = await cache.scan("https://news.example/a")
+
+        self.assertEqual(len(requests), 1)
+        self.assertIs(first, second)
+        self.assertIs(first, third)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    async def test_rss_video_url_skips_the_page(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise AssertionError("page must not be fetched")
+
+        item = SimpleNamespace(url="https://news.example/a", video_urls=("https://cdn/x.mp4",))
+        with _patched_client(handler):
+            video = await resolve_video_for_item(item)
+
+        self.assertEqual(video.kind, "direct")
+
+
+if __name__ == "__main__":
+    unittest.main()
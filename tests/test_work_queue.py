@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from ua_news_bot.models import NewsItem, Source
+from ua_news_bot.work_queue import (
+    STATE_ENHANCED,
+    STATE_FAILED,
+    STATE_FETCHED,
+    STATE_MEDIA_READY,
+    STATE_SENT,
+    SQLiteWorkQueue,
+)
+
+
+def _item(url: str) -> NewsItem:
+    return NewsItem(
+        source=Source.SUSPILNE,
+        title="Заголовок",
+        url=url,
+        published_at=datetime(2026, 1, 2, 3, 4, 5),
+        summary="Текст",
+        image_urls=("https://cdn/a.jpg",),
+    )
+
+
+class TestSQLiteWorkQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "seen.sqlite3")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_item_resumes_from_last_stage_after_reopen(self) -> None:
+        queue = SQLiteWorkQueue(self.db_path)
+        self.assertTrue(queue.enqueue(_item("https://x/1")))
+        self.assertFalse(queue.enqueue(_item("https://x/1")))
+        queue.enqueue(_item("https://x/2"))
+
+        queue.set_enhanced("https://x/1", "AI текст")
+        queue.set_media_ready("https://x/1", {'["k"]': "/tmp/v.mp4"})
+        queue.begin_send("https://x/1", "@a")
+        queue.mark_delivered("https://x/1", "@a")
+        queue.begin_send("https://x/1", "@b")
+        queue.close()
+
+        reopened = SQLiteWorkQueue(self.db_path)
+        first, second = reopened.pending()
+        self.assertEqual(first.item, _item("https://x/1"))
+        self.assertEqual(first.state, STATE_MEDIA_READY)
+        self.assertEqual(first.ai_text, "AI текст")
+        self.assertEqual(first.artifacts, {'["k"]': "/tmp/v.mp4"})
+        self.assertEqual(first.delivered, {"@a"})
+        self.assertEqual(first.in_flight, "@b")
+        self.assertEqual(second.state, STATE_FETCHED)
+
+        reopened.mark_delivered("https://x/1", "@b")
+        reopened.finish("https://x/1", STATE_SENT)
+        self.assertEqual([w.item.url for w in reopened.pending()], ["https://x/2"])
+        self.assertIsNone(reopened.get("https://x/1").in_flight)
+        self.assertEqual(reopened.stats(), {STATE_FETCHED: 1, STATE_SENT: 1})
+        reopened.close()
+
+    def test_gives_up_after_max_attempts(self) -> None:
+        queue = SQLiteWorkQueue(self.db_path, max_attempts=2)
+        queue.enqueue(_item("https://x/1"))
+        queue.set_enhanced("https://x/1", None)
+
+        self.assertFalse(queue.record_failure("https://x/1", "HTTPError: 500"))
+        self.assertEqual(queue.get("https://x/1").state, STATE_ENHANCED)
+        self.assertTrue(queue.record_failure("https://x/1", "HTTPError: 502"))
+
+        work = queue.get("https://x/1")
+        self.assertEqual(work.state, STATE_FAILED)
+        self.assertEqual(work.attempts, 2)
+        self.assertEqual(work.last_error, "HTTPError: 502")
+        self.assertEqual(queue.pending(), [])
+        queue.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import unittest
+
+from ua_news_bot.media.ytdlp_downloader import _video_key, format_for_budget
+
+MB = 1024 * 1024
+
+
+class TestFormatForBudget(unittest.TestCase):
+    def test_unknown_duration_caps_at_1080p(self) -> None:
+        selector = format_for_budget(None, 50 * MB, 200 * MB)
+
+        self.assertIn("[height<=1080]", selector)
+        self.assertIn("[filesize<?200M]", selector)
+        self.assertTrue(selector.endswith("/b"))
+
+    def test_long_clip_gets_lower_height(self) -> None:
+        # 20 minutes in 50 MB leaves ~200 kbps of video: the smallest rung.
+        selector = format_for_budget(1200, 50 * MB, 200 * MB)
+
+        self.assertIn("[height<=360]", selector)
+        self.assertNotIn("[height<=1080]", selector)
+
+
+class TestVideoKey(unittest.TestCase):
+    def test_youtube_watch_url_uses_video_id(self) -> None:
+        self.assertEqual(_video_key("https://www.youtube.com/watch?v=abc123&t=5"), "abc123")
+        self.assertEqual(
+            _video_key("https://player.vimeo.com/video/42"), "https://player.vimeo.com/video/42"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()